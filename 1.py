@@ -2,12 +2,23 @@ import gymnasium as gym
 from gymnasium import spaces
 import networkx as nx
 import numpy as np
-import os
-from stable_baselines3 import PPO
+from moduls.env_compiler import compile_kitchen, optimal_return, policy_return
+from moduls.vec_env import VecKitchenEnv
+from moduls.planner import macro_graph
+from moduls.tabular import make_model, load_model, model_exists
 
 class AdvancedKitchenEnv(gym.Env):
-    def __init__(self):
+    # Сюда TrajectoryRecorder собирает переходы: индекс состояния и действие подряд
+    trace = None
+
+    def __init__(self, macro=False):
+        """
+        macro=False — ходим по одному ребру, прыжок через узел стоит -5.
+        macro=True — действие "идти к узлу" проходит весь кратчайший путь за один шаг
+        и сразу списывает его стоимость (путь — в info["path"])
+        """
         super().__init__()
+        self.macro = macro
 
         # --- ЛОКАЦИИ (УЗЛЫ) ---
         self.ZAKAZ = 0      # Где берем чек
@@ -28,6 +39,8 @@ class AdvancedKitchenEnv(gym.Env):
         self.graph.add_edge(self.ZAKAZ, self.STOLIK, weight=5) # Доп. путь
 
         self.num_nodes = 6
+        if macro:
+            self.graph = macro_graph(self.graph, self.num_nodes)
         self.max_recipe_steps = 6 # 0:ничего, 1:заказ, 2:картошка, 3:мытая, 4:резаная, 5:жареная, 6:отдано
 
         # Наблюдение: [позиция, текущий_этап, предмет_в_руках]
@@ -41,6 +54,25 @@ class AdvancedKitchenEnv(gym.Env):
         self.action_space = spaces.Discrete(7)
         self.ACTION_INTERACT = 6
 
+        # --- РЕЦЕПТ: (узел, награда) для каждого этапа, последний отдаёт заказ ---
+        # 1: заказ, 2: картошка (в руки), 3: мытая, 4: резаная, 5: жареная, 6: отдано
+        recipe = [
+            (self.ZAKAZ, 10),
+            (self.MESHOK, 10),
+            (self.RAKOVINA, 10),
+            (self.STOL, 10),
+            (self.PLITA, 10),
+            (self.STOLIK, 50),
+        ]
+        stages = [
+            {"step": k, "action": self.ACTION_INTERACT, "node": node, "reward": -0.1 + bonus,
+             "take": node == self.MESHOK, "done": k == len(recipe) - 1}
+            for k, (node, bonus) in enumerate(recipe)
+        ]
+        # Ошибки: -5 за попытку пройти сквозь стену, -2 за взаимодействие не там или не тогда
+        self.tables = compile_kitchen(self.graph, self.num_nodes, self.max_recipe_steps,
+                                      self.action_space.n, stages, wall_penalty=5, fail_penalty=2)
+
         self.max_steps = 100
         self.reset()
 
@@ -58,55 +90,24 @@ class AdvancedKitchenEnv(gym.Env):
     def step(self, action):
         action = int(np.asarray(action).item())
         self.current_step += 1
-        reward = -0.1
-        terminated = False
-        truncated = False
-
-        # --- ДВИЖЕНИЕ ---
-        if action < self.num_nodes:
-            if action == self.current_node:
-                reward -= 0.1
-            elif self.graph.has_edge(self.current_node, action):
-                reward -= self.graph[self.current_node][action]["weight"]
-                self.current_node = action
-            else:
-                reward -= 5 # Попытка пройти сквозь стену
-
-        # --- ВЗАИМОДЕЙСТВИЕ (ACTION 6) ---
-        elif action == self.ACTION_INTERACT:
-            # 1. Взять заказ
-            if self.recipe_step == 0 and self.current_node == self.ZAKAZ:
-                self.recipe_step = 1
-                reward += 10
-            # 2. Взять картошку (нужен заказ)
-            elif self.recipe_step == 1 and self.current_node == self.MESHOK:
-                self.recipe_step = 2
-                self.has_item = 1
-                reward += 10
-            # 3. Помыть картошку
-            elif self.recipe_step == 2 and self.current_node == self.RAKOVINA:
-                self.recipe_step = 3
-                reward += 10
-            # 4. Порезать картошку
-            elif self.recipe_step == 3 and self.current_node == self.STOL:
-                self.recipe_step = 4
-                reward += 10
-            # 5. Пожарить
-            elif self.recipe_step == 4 and self.current_node == self.PLITA:
-                self.recipe_step = 5
-                reward += 10
-            # 6. Отдать заказ
-            elif self.recipe_step == 5 and self.current_node == self.STOLIK:
-                self.recipe_step = 6
-                reward += 50
-                terminated = True
-            else:
-                reward -= 2 # Ошибка взаимодействия (не то место или время)
-
-        if self.current_step >= self.max_steps:
-            truncated = True
-
-        return self._get_obs(), reward, terminated, truncated, {}
+
+        s = self.tables.encode(self.current_node, self.recipe_step, self.has_item)
+        trace = self.trace
+        if trace is not None:
+            trace.append(s)
+            trace.append(action)
+        reward = self.tables.reward[s, action]
+        terminated = bool(self.tables.terminated[s, action])
+        start = self.current_node
+        self.current_node, self.recipe_step, self.has_item = (int(v) for v in self.tables.obs[self.tables.next_state[s, action]])
+
+        truncated = self.current_step >= self.max_steps
+
+        info = {}
+        if self.macro and self.current_node != start:
+            path = self.graph[start][self.current_node]["path"]
+            info["path"] = path if path[0] == start else path[::-1]
+        return self._get_obs(), reward, terminated, truncated, info
 
     def render(self):
         locs = ["Заказ", "Мешок", "Раковина", "Стол", "Плита", "Столик"]
@@ -120,13 +121,16 @@ MODEL_PATH = "potato_pro_model"
 
 if __name__ == "__main__":
     env = AdvancedKitchenEnv()
+    # Обучаем сразу на пачке кухонь, демонстрация — на обычной среде
+    train_env = VecKitchenEnv(AdvancedKitchenEnv, n_envs=8)
 
-    if os.path.exists(MODEL_PATH + ".zip"):
+    if model_exists(MODEL_PATH):
         print("Загрузка обученного повара...")
-        model = PPO.load(MODEL_PATH, env=env)
+        model = load_model(MODEL_PATH, env=train_env)
     else:
-        # Увеличим ent_coef, так как цепочка длинная и нужно больше исследований
-        model = PPO("MlpPolicy", env, verbose=1, learning_rate=1e-3, ent_coef=0.02)
+        # Маленькая кухня решается Q-таблицей; если PPO — увеличим ent_coef,
+        # так как цепочка длинная и нужно больше исследований
+        model = make_model(train_env, learning_rate=1e-3, ent_coef=0.02)
 
     print("Обучение (это может занять больше времени из-за сложности)...")
     model.learn(total_timesteps=50000) # Длинная цепочка требует больше шагов
@@ -139,4 +143,10 @@ if __name__ == "__main__":
         action, _ = model.predict(obs, deterministic=True)
         obs, reward, term, trunc, _ = env.step(action)
         env.render()
-        done = term or trunc
\ No newline at end of file
+        done = term or trunc
+
+    # Сравнение с оптимальной политикой (точный расчёт по таблицам)
+    start = env.tables.encode(*env.reset()[0])
+    best = optimal_return(env.tables, start, env.max_steps)
+    agent = policy_return(env.tables, lambda o: model.predict(o, deterministic=True)[0], start, env.max_steps)
+    print(f"Оптимум: {best:.1f} | Агент: {agent:.1f}")
\ No newline at end of file
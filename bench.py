@@ -0,0 +1,358 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pytmx
+
+from moduls.kitchen_map import KitchenMap, distance_matrix
+from moduls.vec_env import VecKitchenEnv
+from moduls.grid_env import GridKitchenEnv, LiveLayout, MapLayout
+from moduls.multi_agent import MultiKitchenEnv
+from moduls.trajectory import TrajectoryRecorder, VecTrajectoryRecorder
+from moduls.game_path import use_game_modules
+
+use_game_modules()
+from sim import KitchenSim, SimLevel
+
+# ===============================
+# БЕНЧМАРК СРЕД И ЗАГРУЗКИ КАРТ
+# ===============================
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MAPS_DIR = os.path.join(ROOT, "game", "maps")
+RECORDER_BUDGET = 0.05  # допустимые накладные расходы записи траекторий, доля
+
+
+def load_script(name, filename):
+    """1.py нельзя импортировать обычным import из-за имени файла"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(fn, repeat):
+    """Лучшее время из нескольких прогонов, чтобы убрать шум"""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def overhead(bare, recorded, repeat):
+    """
+    Во сколько recorded медленнее bare: медиана отношений соседних коротких
+    прогонов (порядок чередуется). Лучшее время из прогонов врозь дает здесь
+    разброс в десятки процентов даже для одной и той же среды, медиана пар — доли процента
+    """
+    runs = [("bare", bare), ("recorded", recorded)]
+    ratios, best = [], float("inf")
+    for k in range(repeat):
+        times = {}
+        for name, fn in (runs if k % 2 else runs[::-1]):
+            t = time.perf_counter()
+            fn()
+            times[name] = time.perf_counter() - t
+        ratios.append(times["recorded"] / times["bare"])
+        best = min(best, times["recorded"])
+    return float(np.median(ratios)) - 1, best
+
+
+# --- Случаи бенчмарка: каждый возвращает словарь метрик ---
+def bench_scalar_env(env_cls, steps, seed):
+    env = env_cls()
+    env.reset(seed=seed)
+    actions = np.random.default_rng(seed).integers(env.action_space.n, size=steps)
+
+    def run_steps():
+        env.reset(seed=seed)
+        for a in actions:
+            _, _, term, trunc, _ = env.step(int(a))
+            if term or trunc:
+                env.reset()
+
+    def run_resets():
+        for _ in range(steps // 10):
+            env.reset()
+
+    return {
+        "steps_per_sec": steps / timed(run_steps, 3),
+        "resets_per_sec": (steps // 10) / timed(run_resets, 3),
+    }
+
+
+def bench_vec_env(env_cls, steps, seed, n_envs=64):
+    env = VecKitchenEnv(env_cls, n_envs=n_envs)
+    actions = np.random.default_rng(seed).integers(env.action_space.n, size=(steps // n_envs, n_envs))
+
+    def run_steps():
+        env.reset()
+        for a in actions:
+            env.step(a)
+
+    return {"steps_per_sec": actions.size / timed(run_steps, 3)}
+
+
+def bench_scalar_recorder(env_cls, steps, seed, repeat=100):
+    """
+    Накладные расходы TrajectoryRecorder: та же среда с записью и без.
+    Прогон — не меньше четырех блоков записи, чтобы в каждый попадали сбросы блока на диск
+    """
+    with tempfile.TemporaryDirectory() as path:
+        envs = [env_cls(), TrajectoryRecorder(env_cls(), path)]
+        size = max(steps // 10, 4 * envs[1].block)
+        actions = np.random.default_rng(seed).integers(envs[0].action_space.n, size=size).tolist()
+        runs = []
+        for env in envs:
+            env.reset(seed=seed)
+
+            def run(env=env):
+                step, reset = env.step, env.reset
+                for a in actions:
+                    _, _, term, trunc, _ = step(a)
+                    if term or trunc:
+                        reset()
+            runs.append(run)
+        extra, best = overhead(*runs, repeat)
+        envs[1].close()
+    return {"steps_per_sec": len(actions) / best, "overhead": extra}
+
+
+def bench_vec_recorder(env_cls, steps, seed, n_envs, repeat=100):
+    """
+    Накладные расходы VecTrajectoryRecorder на VecKitchenEnv. Прогон — целое число
+    блоков записи: иначе медиана пар выбирает прогоны без сброса блока на диск
+    """
+    with tempfile.TemporaryDirectory() as path:
+        envs = [VecKitchenEnv(env_cls, n_envs=n_envs), VecTrajectoryRecorder(VecKitchenEnv(env_cls, n_envs=n_envs), path)]
+        block = envs[1].block
+        size = max(steps // 10 // n_envs // block, 1) * block
+        actions = np.random.default_rng(seed).integers(envs[0].action_space.n, size=(size, n_envs))
+        runs = []
+        for env in envs:
+            env.reset()
+
+            def run(env=env):
+                step = env.step
+                for a in actions:
+                    step(a)
+            runs.append(run)
+        extra, best = overhead(*runs, repeat)
+        envs[1].close()
+    return {"steps_per_sec": actions.size / best, "overhead": extra}
+
+
+def bench_headless_sim(map_name, steps, seed):
+    sim = KitchenSim.headless(map_name, seed)
+    actions = np.random.default_rng(seed).integers(len(KitchenSim.ACTIONS), size=steps)
+
+    def run_steps():
+        for a in actions:
+            sim.step(KitchenSim.ACTIONS[a])
+
+    return {"steps_per_sec": steps / timed(run_steps, 3)}
+
+
+def bench_multi_agent(map_name, num_agents, steps, seed):
+    env = MultiKitchenEnv(map_name, num_agents=num_agents)
+    actions = np.random.default_rng(seed).integers(env.ACTION_INTERACT + 1, size=(steps, num_agents))
+
+    def run_steps():
+        env.reset(seed=seed)
+        for a in actions:
+            env.step_arrays(a)
+
+    return {"agent_steps_per_sec": actions.size / timed(run_steps, 3)}
+
+
+def random_kitchen(size, seed, wall_density=0.1):
+    """Случайная кухня: редкие стены и три станции, все связаны между собой"""
+    rng = np.random.default_rng(seed)
+    while True:
+        matrix = np.where(rng.random((size, size)) < wall_density, 9, 0)
+        cells = rng.choice(size * size, size=3, replace=False)
+        matrix.flat[cells] = [1, 2, 3]
+        try:
+            KitchenMap(matrix)
+            return matrix
+        except ValueError:
+            continue
+
+
+def bench_kitchen_map(size, seed):
+    matrix = random_kitchen(size, seed)
+    return {"build_s": timed(lambda: KitchenMap(matrix), 3)}
+
+
+def bench_distance_matrix(size, stations, seed):
+    rng = np.random.default_rng(seed)
+    walkable = rng.random((size, size)) >= 0.1
+    positions = [tuple(p) for p in np.argwhere(walkable)[rng.choice(walkable.sum(), stations, replace=False)]]
+    return {"build_s": timed(lambda: distance_matrix(walkable, positions), 3)}
+
+
+def bench_layout_updates(map_name, seed, edits=200):
+    """Пролитое на случайном тайле и уборка: локальный ремонт против полной пересборки"""
+    layout = LiveLayout.load(map_name)
+    env = GridKitchenEnv(map_name, "fried", layout=layout)
+    free = np.argwhere(~layout.level.blocked)
+    cells = free[np.random.default_rng(seed).choice(len(free), edits)]
+
+    def run_edits():
+        for y, x in cells:
+            env.update_layout(layout.block_cell(x, y))
+        for y, x in cells:
+            env.update_layout(layout.unblock_cell(x, y))
+
+    return {"edits_per_sec": 2 * edits / timed(run_edits, 3),
+            "rebuild_s": timed(lambda: MapLayout.build(layout.level, layout.spawn), 3)}
+
+
+def bench_tmx_load(map_name):
+    path = os.path.join(MAPS_DIR, f"{map_name}.tmx")
+
+    def cold():
+        # Полный путь без кеша: разбор TMX, растеризация сетки, запись кеша
+        level = SimLevel()
+        level.map_name = map_name
+        level.tmx_data = pytmx.TiledMap(path)
+        level._load_objects(None)
+
+    return {
+        "parse_s": timed(lambda: pytmx.TiledMap(path), 3),
+        "cold_s": timed(cold, 3),
+        "cached_s": timed(lambda: SimLevel().load_map(map_name), 3),
+    }
+
+
+def build_cases(steps, seed, quick):
+    maps = sorted(f[:-4] for f in os.listdir(MAPS_DIR) if f.endswith(".tmx"))
+    if quick:
+        maps = maps[:1]
+    kitchen_env = load_script("logic", "logic.py").KitchenEnv
+    advanced_env = load_script("potato", "1.py").AdvancedKitchenEnv
+
+    cases = {
+        "scalar/KitchenEnv": lambda: bench_scalar_env(kitchen_env, steps, seed),
+        "scalar/AdvancedKitchenEnv": lambda: bench_scalar_env(advanced_env, steps, seed),
+        "scalar/GridKitchenEnv": lambda: bench_scalar_env(GridKitchenEnv, steps, seed),
+        "vec/KitchenEnv": lambda: bench_vec_env(kitchen_env, steps * 10, seed),
+        "vec/AdvancedKitchenEnv": lambda: bench_vec_env(advanced_env, steps * 10, seed),
+        "vec/GridKitchenEnv": lambda: bench_vec_env(GridKitchenEnv, steps * 10, seed),
+        "record/KitchenEnv": lambda: bench_scalar_recorder(kitchen_env, steps, seed),
+        "record/AdvancedKitchenEnv": lambda: bench_scalar_recorder(advanced_env, steps, seed),
+        "record/GridKitchenEnv": lambda: bench_scalar_recorder(GridKitchenEnv, steps, seed),
+        "record/vec/AdvancedKitchenEnv/1": lambda: bench_vec_recorder(advanced_env, steps, seed, 1),
+        "record/vec/AdvancedKitchenEnv/64": lambda: bench_vec_recorder(advanced_env, steps * 10, seed, 64),
+    }
+    for m in maps:
+        cases[f"sim/{m}"] = lambda m=m: bench_headless_sim(m, steps, seed)
+        cases[f"tmx/{m}"] = lambda m=m: bench_tmx_load(m)
+        cases[f"layout/{m}"] = lambda m=m: bench_layout_updates(m, seed, 50 if quick else 200)
+    for k in ([4, 32] if quick else [4, 16, 64]):
+        cases[f"multi/{maps[0]}/{k}"] = lambda k=k: bench_multi_agent(maps[0], k, steps // 10, seed)
+    for size in ([32, 128] if quick else [32, 64, 128, 256]):
+        cases[f"kitchen_map/{size}x{size}"] = lambda size=size: bench_kitchen_map(size, seed)
+    for stations in ([4, 16] if quick else [4, 8, 16, 32, 64]):
+        cases[f"distances/128x128/{stations}"] = lambda s=stations: bench_distance_matrix(128, s, seed)
+    return cases
+
+
+def peak_memory_mb(fn):
+    """Пик памяти Python-аллокаций за один прогон случая"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def run(cases, only=None, memory=True):
+    results = {}
+    for name, case in cases.items():
+        if only and not any(o in name for o in only):
+            continue
+        metrics = case()
+        if memory:
+            metrics["peak_mb"] = peak_memory_mb(case)
+        results[name] = metrics
+        print(f"{name:32s} " + "  ".join(f"{k}={v:.4g}" for k, v in metrics.items()))
+    return results
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_sec")
+
+
+def compare(results, baseline, threshold):
+    """Метрики, которые ухудшились больше чем на threshold (доля)"""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            # Накладные расходы — малая доля, ее сверяем с бюджетом, а не с прошлым прогоном
+            if not old or metric == "overhead":
+                continue
+            change = (old - value) / old if higher_is_better(metric) else (value - old) / old
+            if change > threshold:
+                regressions.append((name, metric, old, value, change))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк сред, карт и симуляции")
+    parser.add_argument("--steps", type=int, default=20000, help="шагов на случай для скалярных сред")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="меньше карт и размеров")
+    parser.add_argument("--only", nargs="+", help="только случаи с этими подстроками в имени")
+    parser.add_argument("--no-memory", action="store_true", help="не измерять пик памяти")
+    parser.add_argument("--out", default="bench_results.json", help="куда сохранить результаты")
+    parser.add_argument("--compare", help="JSON прошлого прогона для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое ухудшение, доля")
+    parser.add_argument("--recorder-budget", type=float, default=RECORDER_BUDGET,
+                        help="допустимые накладные расходы записи траекторий, доля")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(build_cases(args.steps, args.seed, args.quick), args.only, not args.no_memory)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "steps": args.steps,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"--- Результаты сохранены в '{args.out}' ---")
+
+    over_budget = [(name, m["overhead"]) for name, m in results.items() if m.get("overhead", 0) > args.recorder_budget]
+    for name, overhead in over_budget:
+        print(f"ЗАПИСЬ ДОРОЖЕ БЮДЖЕТА {name}: {overhead:+.1%} (бюджет {args.recorder_budget:.0%})")
+    if over_budget:
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, old, value, change in regressions:
+            print(f"РЕГРЕССИЯ {name} {metric}: {old:.4g} -> {value:.4g} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"Регрессий нет (порог {args.threshold:.0%})")
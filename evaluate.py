@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+from moduls.evaluation import sweep, build_report, print_report, all_maps, all_orders
+
+# ===============================
+# ОЦЕНКА МОДЕЛИ НА ВСЕХ КАРТАХ И РЕЦЕПТАХ
+# ===============================
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Параллельная оценка модели по всем картам и рецептам")
+    parser.add_argument("--model", default="grid_kitchen_model", help="сохраненная модель PPO")
+    parser.add_argument("--maps", nargs="+", default=["all"], help="карты (all — все из game/maps)")
+    parser.add_argument("--orders", nargs="+", default=["all"], help="заказы (all — все блюда)")
+    parser.add_argument("--episodes", type=int, default=100, help="эпизодов на пару карта/заказ")
+    parser.add_argument("--chunk", type=int, default=25, help="эпизодов в одной задаче пула")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="жадная политика (эпизоды одной клетки тогда одинаковы)")
+    parser.add_argument("--train-maps", nargs="+", default=["map_1", "map_2", "map_3"],
+                        help="карты обучения: их номера идут в наблюдение модели из train.py")
+    parser.add_argument("--train-orders", nargs="+", default=["fried", "baked"], help="заказы обучения (или all)")
+    parser.add_argument("--results", default="eval_results.jsonl", help="сырые результаты, по ним прогон продолжается")
+    parser.add_argument("--report", default="eval_report.json")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    maps = all_maps() if args.maps == ["all"] else args.maps
+    orders = all_orders() if args.orders == ["all"] else args.orders
+    train_orders = all_orders() if args.train_orders == ["all"] else args.train_orders
+
+    cells, done = sweep(args.model, args.results, maps, orders, args.episodes, args.chunk, args.seed,
+                        args.workers, args.deterministic, args.train_maps, train_orders)
+    report = build_report(cells, done)
+    print_report(report)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"--- Отчет сохранен в '{args.report}' ---")
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import pygame
+import pytmx
+from pytmx.util_pygame import handle_transformation
+from settings import *
+
+
+class TileRequest:
+    """Тайл, который pytmx попросил у загрузчика; картинка появится при упаковке атласа"""
+    __slots__ = ("path", "rect", "flags", "colorkey")
+
+    def __init__(self, path, rect, flags, colorkey):
+        self.path = path
+        self.rect = rect
+        self.flags = flags
+        self.colorkey = colorkey
+
+
+class AssetManager:
+    """
+    Общий пул картинок игры.
+
+    Источники различаются по хешу содержимого, а не по пути: один и тот же PNG,
+    подключенный двумя тайлсетами или разными картами, декодируется один раз.
+    С листа вырезаются только тайлы, которые реально есть на карте, они
+    упаковываются полками в страницы атласа, а сам лист сразу отпускается.
+    Масштабированные копии (предметы в руках и т.п.) тоже кешируются.
+    """
+
+    def __init__(self, page_width=ATLAS_PAGE_WIDTH):
+        self.page_width = page_width
+        self.pages = []  # страницы атласа, по одной на каждую загрузку карты с новыми тайлами
+        self.tiles = {}  # (хеш, rect, flags, colorkey) -> кусок атласа
+        self.images = {}  # (хеш, размер) -> целая картинка
+        self._keys = {}  # путь -> (mtime, size, хеш)
+        self.decoded = 0  # сколько раз декодировали PNG (для проверки дедупликации)
+
+    def source_key(self, path):
+        """Хеш содержимого файла; пересчитывается, только если файл изменился"""
+        path = os.path.realpath(path)
+        st = os.stat(path)
+        known = self._keys.get(path)
+        if known and known[:2] == (st.st_mtime_ns, st.st_size):
+            return known[2]
+        with open(path, "rb") as f:
+            key = hashlib.sha1(f.read()).hexdigest()
+        self._keys[path] = (st.st_mtime_ns, st.st_size, key)
+        return key
+
+    def _decode(self, path):
+        self.decoded += 1
+        return pygame.image.load(path)
+
+    def _convert(self, surf):
+        # Без окна (headless) convert невозможен, оставляем как есть
+        return surf.convert_alpha() if pygame.display.get_surface() else surf
+
+    # --- Карты ---
+    def tmx_loader(self, filename, colorkey, **kwargs):
+        """Загрузчик картинок для pytmx: ничего не декодирует, только запоминает запросы"""
+        def load_image(rect=None, flags=None):
+            return TileRequest(filename, tuple(rect) if rect else None, flags, colorkey)
+        return load_image
+
+    def load_tmx(self, path):
+        """TiledMap, у которого все тайлы — куски общего атласа"""
+        tmx = pytmx.TiledMap(path, image_loader=self.tmx_loader)
+        requests = [(i, r) for i, r in enumerate(tmx.images) if isinstance(r, TileRequest)]
+
+        # Запросы группируем по содержимому листа: каждый лист декодируется не больше одного раза
+        by_source = {}
+        for i, req in requests:
+            by_source.setdefault(self.source_key(req.path), []).append((i, req))
+        cut = {}
+        for key, items in by_source.items():
+            missing = [req for _, req in items if self._tile_key(key, req) not in self.tiles]
+            if missing:
+                sheet = self._decode(missing[0].path)
+                for req in missing:
+                    cut.setdefault(self._tile_key(key, req), self._cut(sheet, req))
+        # Новые тайлы карты — на свою страницу; листы после этого больше не нужны
+        self.tiles.update(zip(cut, self._pack(list(cut.values()))))
+        for i, req in requests:
+            tmx.images[i] = self.tiles[self._tile_key(self.source_key(req.path), req)]
+        return tmx
+
+    @staticmethod
+    def _tile_key(key, req):
+        flags = tuple(req.flags) if req.flags else None
+        return key, req.rect, flags, req.colorkey
+
+    @staticmethod
+    def _cut(sheet, req):
+        tile = sheet.subsurface(req.rect) if req.rect else sheet
+        if req.flags:
+            tile = handle_transformation(tile, req.flags)
+        if req.colorkey:
+            tile = tile.copy()
+            tile.set_colorkey(pygame.Color(f"#{req.colorkey}"))
+        return tile
+
+    def _pack(self, tiles):
+        """
+        Полочная упаковка в новую страницу шириной page_width: тайлы по убыванию
+        высоты кладутся слева направо, не влез — новая полка. Высота страницы —
+        ровно по полкам, так что память атласа — это только пиксели тайлов.
+        """
+        width = self.page_width
+        order = sorted(range(len(tiles)), key=lambda i: -tiles[i].get_height())
+        spots = [None] * len(tiles)
+        x = y = shelf_h = 0
+        for i in order:
+            w, h = tiles[i].get_size()
+            if w > width:
+                continue  # Шире страницы — живет отдельной поверхностью
+            if x + w > width:
+                x, y, shelf_h = 0, y + shelf_h, 0
+            spots[i] = (x, y)
+            x, shelf_h = x + w, max(shelf_h, h)
+
+        page = None
+        if y + shelf_h:
+            page = pygame.Surface((width, y + shelf_h), pygame.SRCALPHA)
+            page.fill((0, 0, 0, 0))
+            page = self._convert(page)
+            self.pages.append(page)
+        packed = []
+        for tile, spot in zip(tiles, spots):
+            if spot is None:
+                packed.append(self._convert(tile.copy()))
+                continue
+            page.blit(tile, spot)
+            packed.append(page.subsurface((spot, tile.get_size())))
+        return packed
+
+    # --- Отдельные картинки ---
+    def image(self, path, size=None):
+        """Целая картинка (с альфой), при size — масштабированная копия; обе кешируются"""
+        key = self.source_key(path)
+        if (key, None) not in self.images:
+            self.images[(key, None)] = self._convert(self._decode(path))
+        if size is None:
+            return self.images[(key, None)]
+        size = tuple(size)
+        if (key, size) not in self.images:
+            self.images[(key, size)] = pygame.transform.scale(self.images[(key, None)], size)
+        return self.images[(key, size)]
+
+    def memory_bytes(self):
+        """Сколько пикселей держит пул (страницы атласа, отдельные тайлы и картинки)"""
+        pages = sum(p.get_width() * p.get_height() * 4 for p in self.pages)
+        loose = sum(t.get_width() * t.get_height() * 4 for t in self.tiles.values() if t.get_parent() is None)
+        images = sum(s.get_width() * s.get_height() * 4 for s in self.images.values())
+        return pages + loose + images
+
+
+assets = AssetManager()
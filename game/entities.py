@@ -43,8 +43,7 @@ class Player:
             self.cell_x = new_x
             self.cell_y = new_y
 
-    def draw(self, screen, tile_size):
-        current_time = pygame.time.get_ticks()
+    def draw(self, screen, tile_size, current_time):
         px = self.cell_x * tile_size
         py = self.cell_y * tile_size
         
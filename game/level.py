@@ -1,59 +1,100 @@
+import hashlib
 import pygame
 import pytmx
-from pytmx.util_pygame import load_pygame
-import os
+import numpy as np
 from settings import *
+from sim import SimLevel
+from map_cache import map_cache, tmx_sources
+from assets import assets
 
-class LevelManager:
+class LevelManager(SimLevel):
     def __init__(self):
-        self.tmx_data = None
-        self.tile_size = 16
-        self.collision_rects = []
-        self.interactive_objects = []
-        self.map_name = ""
-
-    def get_available_maps(self):
-        maps_dir = os.path.join(BASE_DIR, "maps")
-        if not os.path.exists(maps_dir):
-            os.makedirs(maps_dir)
-            return []
-        return [f.replace(".tmx", "") for f in os.listdir(maps_dir) if f.endswith(".tmx")]
+        super().__init__()
+        # Запеченные тайловые слои: список (прямоугольник на экране, поверхность)
+        self.static_chunks = []
 
     def load_map(self, map_name, player):
         self.map_name = map_name
-        tmx_path = os.path.join(BASE_DIR, "maps", f"{map_name}.tmx")
-        
+        self.static_chunks = []
         try:
-            self.tmx_data = load_pygame(tmx_path)
-            self.tile_size = self.tmx_data.tilewidth
-            self.collision_rects = []
-            self.interactive_objects = []
-
-            for obj in self.tmx_data.objects:
-                rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height)
-                if obj.name:
-                    self.interactive_objects.append({"name": obj.name, "rect": rect})
-                if obj.name not in ["player", "order"]:
-                     self.collision_rects.append(rect)
-                if obj.name == "player":
-                    player.set_pos(int(obj.x // self.tile_size), int(obj.y // self.tile_size))
+            # Если все артефакты карты в кеше, TMX и тайлсеты не трогаем вовсе
+            if self._load_cached(player) and self._load_static_cached():
+                return True
+            # Тайлы карты — куски общего атласа: листы декодируются один раз и только ради нужных тайлов
+            self.tmx_data = assets.load_tmx(self.map_path(map_name))
+            self._load_objects(player)
+            self._bake_static()
+            self._save_static()
             return True
         except Exception as e:
             print(f"Ошибка загрузки карты: {e}")
             return False
 
-    def can_move(self, cell_x, cell_y):
-        test_rect = pygame.Rect(cell_x * self.tile_size, cell_y * self.tile_size, self.tile_size, self.tile_size)
-        for rect in self.collision_rects:
-            if test_rect.colliderect(rect):
-                return False
+    def _static_key(self):
+        """Запеченные слои зависят и от картинок тайлсетов: их хеши входят в ключ"""
+        h = hashlib.sha1()
+        for source in tmx_sources(self.map_path(self.map_name)):
+            h.update(assets.source_key(source).encode())
+        return f"static{STATIC_CHUNK}.{h.hexdigest()[:16]}"
+
+    def _save_static(self):
+        arrays, rects = {}, []
+        for i, (rect, surf) in enumerate(self.static_chunks):
+            pixels = pygame.image.tobytes(surf, "RGB")
+            arrays[f"chunk{i}"] = np.frombuffer(pixels, dtype=np.uint8).reshape(rect.height, rect.width, 3)
+            rects.append(tuple(rect))
+        map_cache.save(self.map_path(self.map_name), self._static_key(), arrays, {"rects": rects})
+
+    def _load_static_cached(self):
+        cached = map_cache.load(self.map_path(self.map_name), self._static_key())
+        if cached is None:
+            return False
+        arrays, meta = cached
+        self.static_chunks = []
+        for i, r in enumerate(meta["rects"]):
+            rect = pygame.Rect(r)
+            surf = pygame.image.frombuffer(arrays[f"chunk{i}"], rect.size, "RGB").convert()
+            self.static_chunks.append((rect, surf))
         return True
 
-    def draw(self, screen):
-        if not self.tmx_data: return
+    def _bake_static(self):
+        """Запекаем тайловые слои в чанки один раз при загрузке карты"""
+        ts, size = self.tile_size, STATIC_CHUNK
+        tiles = []
+        map_w, map_h = self.tmx_data.width * ts, self.tmx_data.height * ts
         for layer in self.tmx_data.visible_layers:
             if isinstance(layer, pytmx.TiledTileLayer):
                 for x, y, gid in layer:
                     tile = self.tmx_data.get_tile_image_by_gid(gid)
                     if tile:
-                        screen.blit(tile, (x * self.tile_size, y * self.tile_size))
\ No newline at end of file
+                        rect = tile.get_rect(topleft=(x * ts, y * ts))
+                        tiles.append((tile, rect))
+                        # Большие тайлы могут вылезать за край карты
+                        map_w, map_h = max(map_w, rect.right), max(map_h, rect.bottom)
+
+        chunks = {}
+        for ky in range(-(-map_h // size)):
+            for kx in range(-(-map_w // size)):
+                surf = pygame.Surface((min(size, map_w - kx * size), min(size, map_h - ky * size))).convert()
+                surf.fill(BLACK)
+                chunks[(kx, ky)] = surf
+
+        # Порядок слоев сохраняется: тайлы идут в том же порядке, что и раньше в draw
+        for tile, rect in tiles:
+            for ky in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                for kx in range(rect.left // size, (rect.right - 1) // size + 1):
+                    chunks[(kx, ky)].blit(tile, (rect.x - kx * size, rect.y - ky * size))
+
+        self.static_chunks = [(pygame.Rect(kx * size, ky * size, *surf.get_size()), surf)
+                              for (kx, ky), surf in chunks.items()]
+
+    def draw(self, screen):
+        if not self.static_chunks: return
+        self.redraw_rect(screen, screen.get_clip())
+
+    def redraw_rect(self, screen, area):
+        """Восстанавливаем статический фон в области (для dirty-rect обновлений)"""
+        for rect, surf in self.static_chunks:
+            clipped = rect.clip(area)
+            if clipped.width and clipped.height:
+                screen.blit(surf, clipped, clipped.move(-rect.x, -rect.y))
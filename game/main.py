@@ -1,9 +1,24 @@
+import os
 import pygame
 from settings import *
 from level import LevelManager
 from entities import Player
 from mechanics import KitchenManager
 from ui import UIManager
+from sim import KitchenSim, SimClock, FixedStepLoop
+from profiler import Profiler, profile_path
+
+def start_ai_chef(sim):
+    """ИИ-повар: модель грузится один раз в сервис предсказаний"""
+    if not os.path.exists(AI_MODEL_PATH):
+        return None
+    from moduls.inference import PolicyServer
+    from moduls.ai_chef import AIChef
+    server = PolicyServer(AI_MODEL_PATH).start()
+    # Модель из train.py видит еще номер заказа и карты
+    extra = server.model.observation_space.shape[0] > 3
+    return AIChef(sim, server, AI_ORDERS if extra else None, AI_MAPS if extra else None,
+                  server.model.action_space.n)
 
 def main():
     pygame.init()
@@ -15,46 +30,147 @@ def main():
     player = Player()
     kitchen_manager = KitchenManager()
     ui_manager = UIManager()
+    # Вся логика идет через симуляцию, окно только рисует ее состояние.
+    # Время игры идет тиками FixedStepLoop, а не по часам pygame
+    sim = KitchenSim(level_manager, player, kitchen_manager, SimClock())
+    sim.update()
+    loop = FixedStepLoop(sim)
+
+    def sim_popup(text, rect, duration=2000):
+        # Сообщения о событиях кухни живут по часам симуляции, а не pygame
+        ui_manager.show_popup(text, rect, duration, sim.clock.now())
+
+    speed = TIME_SCALES.index(1)
+    max_speed = False
+    last_redraw = 0
+    # Что сейчас на экране: запеченные слои карты и прямоугольники для стирания
+    shown_chunks = None
+    dirty = []
+    ai_chef = None
+    # Тайминги участков кадра пишутся всегда, F3 только показывает их на панели
+    profiler = Profiler()
+    show_profile = False
 
     # Загружаем первую доступную карту
     maps = level_manager.get_available_maps()
     if maps: level_manager.load_map(maps[0], player)
 
     while True:
-        dt = clock.tick(FPS)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); return
+        profiler.next_frame()
+        with profiler.span("tick"):
+            dt = clock.tick() if max_speed else clock.tick(FPS)
+        with profiler.span("sim"):
+            if max_speed:
+                loop.run_for(1000 / FPS)
+            else:
+                loop.frame(dt)
+        # ИИ-повар сам останавливается на заказе или карте, которых модель не знает
+        if ai_chef and ai_chef.stopped:
+            ai_chef.policy.stop()
+            ui_manager.show_popup(ai_chef.stopped, pygame.Rect(player.cell_x * level_manager.tile_size,
+                                                               player.cell_y * level_manager.tile_size,
+                                                               level_manager.tile_size, level_manager.tile_size))
+            ai_chef = None
+            loop.agents = []
+        with profiler.span("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    if ai_chef: ai_chef.policy.stop()
+                    if profiler.cprofile: profiler.toggle_cprofile(profile_path("cprofile", "prof"))
+                    pygame.quit(); return
 
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                ui_manager.handle_click(event.pos, level_manager, player, kitchen_manager)
+                if event.type in [pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED]:
+                    shown_chunks = None
+
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    ui_manager.handle_click(event.pos, level_manager, player, kitchen_manager)
 
-            if not (pygame.time.get_ticks() < player.freeze_until):
                 if event.type == pygame.KEYDOWN:
                     dx, dy = 0, 0
                     if event.key == pygame.K_w: dy = -1
                     elif event.key == pygame.K_s: dy = 1
                     elif event.key == pygame.K_a: dx = -1
                     elif event.key == pygame.K_d: dx = 1
-                    
+
+                    # Ввод применяется в начале следующего тика симуляции
                     if dx != 0 or dy != 0:
-                        player.move(dx, dy, level_manager)
+                        loop.queue(sim.move, dx, dy)
 
                     if event.key in [pygame.K_e, pygame.K_f]:
-                        kitchen_manager.handle_interaction(player, level_manager, event.key, ui_manager)
-
-        screen.fill(BLACK)
-        level_manager.draw(screen)
-        player.draw(screen, level_manager.tile_size)
-        
-        if player.held_item:
-            img = kitchen_manager.item_images.get(player.held_item.image_key)
-            if img: screen.blit(img, (player.cell_x * level_manager.tile_size + 4, player.cell_y * level_manager.tile_size - 4))
-
-        ui_manager.draw_ui(screen, player, kitchen_manager, level_manager)
-        ui_manager.draw_popups(screen)
-        ui_manager.draw_timer(screen, player, level_manager.tile_size)
-        pygame.display.flip()
+                        loop.queue(sim.interact, event.key, sim_popup)
+
+                    player_rect = pygame.Rect(player.cell_x * level_manager.tile_size, player.cell_y * level_manager.tile_size,
+                                              level_manager.tile_size, level_manager.tile_size)
+                    if event.key == pygame.K_p:
+                        if ai_chef:
+                            ai_chef.policy.stop()
+                            ai_chef = None
+                            ui_manager.show_popup("ИИ-повар выключен", player_rect)
+                        else:
+                            ai_chef = start_ai_chef(sim)
+                            ui_manager.show_popup("ИИ-повар включен" if ai_chef else "Нет модели ИИ", player_rect)
+                        loop.agents = [ai_chef] if ai_chef else []
+
+                    if event.key in [pygame.K_MINUS, pygame.K_EQUALS]:
+                        speed = min(max(speed + (1 if event.key == pygame.K_EQUALS else -1), 0), len(TIME_SCALES) - 1)
+                        loop.time_scale = TIME_SCALES[speed]
+                        ui_manager.show_popup(f"Скорость: x{loop.time_scale:g}", player_rect)
+                    elif event.key == pygame.K_F6:
+                        max_speed = not max_speed
+                        ui_manager.show_popup("Максимальная скорость" if max_speed else f"Скорость: x{loop.time_scale:g}",
+                                              player_rect)
+
+                    if event.key == pygame.K_F3:
+                        show_profile = not show_profile
+                    elif event.key == pygame.K_F4:
+                        path = profiler.export_trace(profile_path("trace", "json"))
+                        ui_manager.show_popup(f"Trace: {os.path.basename(path)}", player_rect)
+                    elif event.key == pygame.K_F5:
+                        path = profiler.toggle_cprofile(profile_path("cprofile", "prof"))
+                        ui_manager.show_popup(f"cProfile: {os.path.basename(path)}" if path else "cProfile: запись",
+                                              player_rect)
+
+        # На максимальной скорости экран только изредка, чтобы окно оставалось живым
+        if max_speed:
+            if pygame.time.get_ticks() - last_redraw < MAX_SPEED_REDRAW_MS:
+                continue
+            last_redraw = pygame.time.get_ticks()
+
+        ts = level_manager.tile_size
+        # Полная перерисовка — только при смене карты, после паузы отрисовки и по запросу окна;
+        # иначе стираем старые прямоугольники повара/сообщений и обновляем только их
+        full = max_speed or level_manager.static_chunks is not shown_chunks
+        shown_chunks = level_manager.static_chunks
+        with profiler.span("level"):
+            if full:
+                screen.fill(BLACK)
+                level_manager.draw(screen)
+            else:
+                for rect in dirty:
+                    screen.fill(BLACK, rect)
+                    level_manager.redraw_rect(screen, rect)
+        erased, dirty = dirty, []
+        with profiler.span("player"):
+            player.draw(screen, ts, sim.clock.now())
+            # Предмет в руках рисуется со сдвигом вверх — захватываем его в прямоугольник
+            dirty.append(pygame.Rect(player.cell_x * ts, player.cell_y * ts, ts, ts))
+            if player.held_item:
+                img = kitchen_manager.item_images.get(player.held_item.image_key)
+                if img: dirty.append(screen.blit(img, (player.cell_x * ts + 4, player.cell_y * ts - 4)))
+
+        with profiler.span("ui"):
+            panel_changed = ui_manager.draw_ui(screen, player, kitchen_manager, level_manager,
+                                               profiler if show_profile else None)
+        with profiler.span("popups"):
+            dirty.append(ui_manager.draw_popups(screen, sim.clock.now()))
+        with profiler.span("timer"):
+            dirty.append(ui_manager.draw_timer(screen, player, ts, sim.clock.now()))
+        dirty = [r for r in dirty if r]
+        with profiler.span("flip"):
+            if full:
+                pygame.display.flip()
+            else:
+                pygame.display.update(erased + dirty + ([ui_manager.panel.get_rect(x=GAME_WIDTH)] if panel_changed else []))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
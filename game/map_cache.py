@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+from settings import *
+
+CACHE_DIR = os.path.join(BASE_DIR, ".map_cache")
+# Меняем при изменении формата, чтобы старые артефакты не подхватывались
+CACHE_VERSION = 2
+
+
+def file_hash(path):
+    """Ключ кеша — хеш содержимого TMX файла"""
+    h = hashlib.sha1(f"v{CACHE_VERSION}".encode())
+    with open(path, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def tmx_sources(path):
+    """
+    Файлы, от которых зависят пиксели карты: внешние .tsx и все картинки
+    тайлсетов (пути внутри .tsx — относительно самого .tsx). Разбираем только XML.
+    """
+    sources = []
+
+    def collect(xml_path):
+        base = os.path.dirname(xml_path)
+        root = ET.parse(xml_path).getroot()
+        for node in root.iter():
+            source = node.get("source")
+            if node.tag == "tileset" and source:
+                tsx = os.path.normpath(os.path.join(base, source))
+                sources.append(tsx)
+                collect(tsx)
+            elif node.tag == "image" and source:
+                sources.append(os.path.normpath(os.path.join(base, source)))
+
+    collect(path)
+    return sources
+
+
+class MapCache:
+    """
+    Скомпилированные артефакты карт на диске: <хеш>/<имя>.<ключ>.npy + <имя>.json.
+    Массивы открываются через mmap, поэтому загрузка почти бесплатная.
+    """
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def load(self, path, name):
+        """Возвращает (arrays, meta) или None, если артефакта нет"""
+        entry = os.path.join(self.cache_dir, file_hash(path))
+        meta_path = os.path.join(entry, f"{name}.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {key: np.load(os.path.join(entry, f"{name}.{key}.npy"), mmap_mode="r")
+                      for key in meta["arrays"]}
+            return arrays, meta["meta"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path, name, arrays, meta):
+        """Пишем во временную папку и переносим файлы: json последним, он признак готовности"""
+        entry = os.path.join(self.cache_dir, file_hash(path))
+        os.makedirs(entry, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            for key, arr in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.{key}.npy"), np.ascontiguousarray(arr))
+            with open(os.path.join(tmp, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump({"arrays": list(arrays), "meta": meta}, f, ensure_ascii=False)
+            for key in arrays:
+                os.replace(os.path.join(tmp, f"{name}.{key}.npy"), os.path.join(entry, f"{name}.{key}.npy"))
+            os.replace(os.path.join(tmp, f"{name}.json"), os.path.join(entry, f"{name}.json"))
+        except OSError as e:
+            print(f"Не удалось сохранить кеш карты: {e}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+map_cache = MapCache()
@@ -0,0 +1,143 @@
+import json
+import random
+import numpy as np
+
+HOUR_MS = 3600 * 1000
+
+
+class PoissonArrivals:
+    """Заказы приходят случайно: в среднем per_hour штук в час, блюдо выбирается равновероятно"""
+    def __init__(self, orders, per_hour=60, rng=None):
+        self.orders = list(orders)
+        self.rate = per_hour / HOUR_MS  # заказов в мс
+        self.rng = rng or random.Random()
+        self.time = 0
+
+    def next(self):
+        self.time += self.rng.expovariate(self.rate)
+        return self.time, self.rng.choice(self.orders)
+
+
+class TraceArrivals:
+    """Заказы из записанного потока: [(время_мс, заказ), ...] по возрастанию времени"""
+    def __init__(self, events):
+        self.events = sorted((float(t), order) for t, order in events)
+        self.index = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def next(self):
+        if self.index >= len(self.events):
+            return float("inf"), None
+        event = self.events[self.index]
+        self.index += 1
+        return event
+
+
+class Ticket:
+    def __init__(self, ticket_id, order, created, deadline):
+        self.id = ticket_id
+        self.order = order
+        self.created = created
+        self.deadline = deadline
+        self.claimed = False
+
+
+class OrderStream:
+    """
+    Поток заказов с ограниченной доской: пришедший заказ встает в очередь,
+    а если доска полна — теряется (переполнение). Заказ, который никто не начал
+    готовить до дедлайна, снимается с доски (просрочен) и освобождает место;
+    взятый в работу (claim) доживает до сдачи и считается опоздавшим.
+    Считает пропускную способность и время тикета (от прихода заказа до сдачи).
+    Общий для игры (KitchenLogic) и RL-сред.
+    """
+    def __init__(self, arrivals, capacity=8, deadline_ms=120000):
+        self.arrivals = arrivals
+        self.capacity = capacity
+        self.deadline_ms = deadline_ms
+        self.open = []
+        self.start = None
+        self.now = 0
+        self.arrived = 0
+        self.dropped = 0
+        self.late = 0
+        self.expired = 0
+        self.ticket_times = []
+        self._next_id = 0
+        self._pending = arrivals.next()
+
+    def update(self, now):
+        """Принимаем все заказы, пришедшие к моменту now, и снимаем просроченные"""
+        if self.start is None:
+            self.start = now
+        self.now = now
+        while self._pending[0] <= now - self.start:
+            t, order = self._pending
+            created = self.start + t
+            # Просроченные до прихода нового заказа уже не занимают доску
+            self._expire(created)
+            self.arrived += 1
+            if len(self.open) >= self.capacity:
+                self.dropped += 1
+            else:
+                self.open.append(Ticket(self._next_id, order, created, created + self.deadline_ms))
+                self._next_id += 1
+            self._pending = self.arrivals.next()
+        self._expire(now)
+
+    def _expire(self, now):
+        """Снимает с доски не взятые в работу заказы с дедлайном раньше now"""
+        if not any(t.deadline < now and not t.claimed for t in self.open):
+            return
+        keep = [t for t in self.open if t.claimed or t.deadline >= now]
+        self.expired += len(self.open) - len(keep)
+        self.open = keep
+
+    def head(self):
+        """Самый старый несданный заказ"""
+        return self.open[0] if self.open else None
+
+    def claim(self):
+        """Самый старый заказ, который еще никто не готовит"""
+        ticket = next((t for t in self.open if not t.claimed), None)
+        if ticket:
+            ticket.claimed = True
+        return ticket
+
+    def find(self, order):
+        """Самый старый открытый заказ на это блюдо"""
+        return next((t for t in self.open if t.order == order), None)
+
+    def serve(self, ticket, now):
+        self.open.remove(ticket)
+        self.ticket_times.append(now - ticket.created)
+        if now > ticket.deadline:
+            self.late += 1
+
+    def metrics(self):
+        """
+        Времена тикетов — только по сданным заказам; просроченные идут отдельно
+        и в late_rate как опоздавшие, открытые после дедлайна — в overdue_open
+        """
+        served = len(self.ticket_times)
+        hours = max(self.now - (self.start or 0), 1) / HOUR_MS
+        times = np.array(self.ticket_times, dtype=np.float64) / 1000
+        p50, p95, p99 = np.percentile(times, [50, 95, 99]) if served else (0.0, 0.0, 0.0)
+        return {
+            "arrived": self.arrived,
+            "served": served,
+            "open": len(self.open),
+            "orders_per_hour": served / hours,
+            "ticket_p50_s": float(p50),
+            "ticket_p95_s": float(p95),
+            "ticket_p99_s": float(p99),
+            "overflow_rate": self.dropped / max(self.arrived, 1),
+            "expired": self.expired,
+            "expired_rate": self.expired / max(self.arrived, 1),
+            "overdue_open": sum(t.deadline < self.now for t in self.open),
+            "late_rate": (self.late + self.expired) / max(served + self.expired, 1),
+        }
@@ -0,0 +1,114 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+import numpy as np
+from settings import *
+
+
+class Span:
+    """Замер одного участка кадра: with profiler.span("ui"): ..."""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+
+class Profiler:
+    """
+    Именованные участки кадра. По каждому участку — кольцо из window последних
+    замеров (мс) для скользящих p50/p95/max, плюс общий журнал событий последних
+    кадров, который выгружается в Chrome trace (chrome://tracing, Perfetto).
+    Отдельно по клавише включается cProfile на весь цикл игры.
+    """
+
+    def __init__(self, window=PROFILE_WINDOW, trace_events=PROFILE_TRACE_EVENTS):
+        self.window = window
+        self.series = {}  # участок -> [кольцо замеров, сколько всего записано]
+        self.events = deque(maxlen=trace_events)
+        self.origin = time.perf_counter()
+        self.frame_start = None
+        self.frames = 0
+        self.pid = os.getpid()
+        self.cprofile = None
+        self._rows = []
+        self._rows_frame = -1
+
+    def span(self, name):
+        return Span(self, name)
+
+    def record(self, name, start, end):
+        ms = (end - start) * 1000
+        entry = self.series.get(name)
+        if entry is None:
+            entry = self.series[name] = [np.zeros(self.window), 0]
+        entry[0][entry[1] % self.window] = ms
+        entry[1] += 1
+        # Chrome trace хранит время в микросекундах от начала записи
+        self.events.append((name, (start - self.origin) * 1e6, ms * 1000, threading.get_ident()))
+
+    def next_frame(self):
+        """Граница кадров: весь прошедший цикл записывается участком frame"""
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.record("frame", self.frame_start, now)
+            self.frames += 1
+        self.frame_start = now
+
+    def stats(self, name):
+        """Скользящие (p50, p95, max) участка в мс"""
+        samples, count = self.series[name]
+        samples = samples[:min(count, self.window)]
+        p50, p95 = np.percentile(samples, [50, 95])
+        return p50, p95, samples.max()
+
+    def overlay_rows(self, every=30):
+        """Строки для панели (участок, p50, p95, max); пересчет раз в every кадров, чтобы цифры читались"""
+        if self._rows_frame < 0 or self.frames - self._rows_frame >= every:
+            self._rows_frame = self.frames
+            names = sorted(self.series, key=lambda n: (n != "frame", n))
+            self._rows = [(name, f"{p50:.2f}", f"{p95:.2f}", f"{peak:.1f}")
+                           for name in names for p50, p95, peak in [self.stats(name)]]
+        return self._rows
+
+    # --- Выгрузка ---
+    def export_trace(self, path):
+        """Последние события в формате Chrome trace (JSON), запись атомарная"""
+        events = [{"name": name, "ph": "X", "ts": round(ts, 1), "dur": round(dur, 1),
+                   "pid": self.pid, "tid": tid} for name, ts, dur, tid in self.events]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp, path)
+        return path
+
+    def toggle_cprofile(self, path):
+        """Включает cProfile; повторный вызов останавливает и сохраняет его в path"""
+        if self.cprofile is None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+            return None
+        self.cprofile.disable()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.cprofile.dump_stats(path)
+        print(f"--- cProfile: {path} ---")
+        pstats.Stats(self.cprofile).sort_stats("cumulative").print_stats(15)
+        self.cprofile = None
+        return path
+
+
+def profile_path(kind, ext):
+    """Файл в PROFILE_DIR с отметкой времени: trace_20240101_120000.json"""
+    return os.path.join(PROFILE_DIR, f"{kind}_{time.strftime('%Y%m%d_%H%M%S')}.{ext}")
@@ -1,4 +1,11 @@
+import sys
 from entities import Item
+from settings import *
+
+# Список блюд лежит в moduls/recipes.py (общий с RL-средами)
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+from moduls.recipes import RECIPES
 
 # Описание процессов: Инструмент -> (Исходное состояние -> (Новое состояние, Название, Ключ_картинки, Время_сек))
 PROCESSES = {
@@ -16,9 +23,206 @@ PROCESSES = {
     }
 }
 
+# Заказы на картошку из PROCESSES: конечное состояние -> название
+POTATO_ORDERS = {"fried": "Чипсы", "baked": "Печеная картошка"}
+
+# Глагол шага рецепта -> станция на карте
+VERB_STATIONS = {
+    "take": "fridge",
+    "wash": "sink", "clean": "sink",
+    "cut": "table", "slice": "table", "roll": "table", "marinate": "table", "skewer": "table",
+    "mix": "table", "spread": "table", "add": "table", "place": "table", "combine": "table",
+    "blend": "table", "pour": "table", "froth": "table",
+    "cook": "gas-stove", "boil": "gas-stove", "brew": "gas-stove",
+    "toast": "oven", "bake": "oven",
+}
+# Время работы станции, мс
+STATION_TIMES = {"fridge": 0, "sink": 3000, "table": 3000, "gas-stove": 4000, "oven": 5000}
+# Шаги, которые соединяют несколько ингредиентов
+COMBINE_VERBS = {"mix", "spread", "add", "place", "combine", "pour"}
+# Слова, которые относятся ко всем ингредиентам сразу
+GENERIC_WORDS = {"ingredient", "vegetable", "fruit", "plate", "bowl", "glass"}
+# То, что готовится в духовке, а не на плите
+OVEN_WORDS = {"pizza", "lasagna"}
+STOP_WORDS = {"on", "in", "with", "and", "into", "the", "a"}
+
+
+def _norm(word):
+    return word[:-1] if word.endswith("s") else word
+
+
+class RecipeStep:
+    def __init__(self, index, text, station, time, deps):
+        self.index = index
+        self.text = text
+        self.station = station
+        self.time = time
+        self.deps = deps  # индексы шагов, которые должны быть сделаны раньше
+
+
+class Dish:
+    """
+    Блюдо как граф зависимостей шагов. Порядок steps — допустимый
+    топологический порядок; по нему строится линейный автомат для игры.
+    """
+    def __init__(self, name, steps, final_deps):
+        self.name = name
+        self.steps = steps
+        self.final_deps = final_deps
+
+    def state(self, k):
+        return f"{self.name}#{k}"
+
+    @property
+    def final_state(self):
+        return self.state(len(self.steps))
+
+    def levels(self):
+        """Группы шагов, которые можно делать параллельно (по глубине в графе)"""
+        depth = []
+        for step in self.steps:
+            depth.append(1 + max((depth[d] for d in step.deps), default=-1))
+        groups = [[] for _ in range(max(depth, default=-1) + 1)]
+        for step, d in zip(self.steps, depth):
+            groups[d].append(step)
+        return groups
+
+    def critical_path_time(self):
+        """Минимальное время готовки при неограниченном числе поваров"""
+        finish = []
+        for step in self.steps:
+            finish.append(step.time + max((finish[d] for d in step.deps), default=0))
+        return max(finish, default=0)
+
+
+def parse_dish(recipe):
+    """Разбираем строки шагов в граф: у каждого ингредиента своя цепочка"""
+    steps = []
+    chains = []  # [токены ингредиентов, последний шаг]
+
+    for index, text in enumerate(recipe["steps"]):
+        words = text.split()
+        verb = words[0]
+        tokens = {_norm(w) for w in words[1:] if w not in STOP_WORDS}
+        station = VERB_STATIONS.get(verb, "table")
+        if verb == "cook" and tokens & OVEN_WORDS:
+            station = "oven"
+
+        if verb == "take":
+            chains.append([tokens, index])
+            steps.append(RecipeStep(index, text, station, STATION_TIMES[station], []))
+            continue
+
+        mentioned = [c for c in chains if c[0] & tokens]
+        if verb in COMBINE_VERBS:
+            used = mentioned if len(mentioned) > 1 or len(chains) < 2 else list(chains)
+            used = used or list(chains)
+        elif mentioned:
+            used = mentioned
+        elif tokens & GENERIC_WORDS:
+            used = list(chains)
+        else:
+            used = chains[-1:]
+
+        deps = sorted(c[1] for c in used)
+        steps.append(RecipeStep(index, text, station, STATION_TIMES[station], deps))
+
+        # Задействованные цепочки сливаются в одну
+        merged = set(tokens)
+        for c in used:
+            merged |= c[0]
+            chains.remove(c)
+        chains.append([merged, index])
+
+    return Dish(recipe["name"], steps, sorted(c[1] for c in chains))
+
+
+class RecipeEngine:
+    """
+    Все блюда, собранные в таблицу (станция, состояние предмета) -> результат.
+    Строится один раз при загрузке, поиск за O(1).
+    """
+    def __init__(self, processes, dishes):
+        self.dishes = {d.name: d for d in dishes}
+        self.orders = dict(POTATO_ORDERS)
+        self.lookup = {}
+        for tool, table in processes.items():
+            for state, result in table.items():
+                self.lookup[(tool, state)] = result
+
+        for dish in dishes:
+            self.orders[dish.final_state] = dish.name
+            n = len(dish.steps)
+            # Первый шаг (взять из холодильника) выполняется выдачей предмета
+            for k, step in enumerate(dish.steps[1:], start=1):
+                self.lookup[(step.station, dish.state(k))] = {
+                    "next_state": dish.state(k + 1),
+                    "name": dish.name if k + 1 == n else f"{dish.name} ({k + 1}/{n})",
+                    "image": "dish",
+                    "time": step.time,
+                }
+
+    def get(self, tool_name, item_state):
+        return self.lookup.get((tool_name, item_state))
+
+    def _dish_for(self, order):
+        return next((d for d in self.dishes.values() if d.final_state == order or d.name == order), None)
+
+    def start_item(self, order):
+        """Предмет, который холодильник выдает под заказ"""
+        dish = self._dish_for(order)
+        if dish is None:
+            return Item("potato", "Картошка", "potato", "raw")
+        n = len(dish.steps)
+        return Item(dish.name, f"{dish.name} (1/{n})", "dish", dish.state(1))
+
+    def station_chain(self, order):
+        """Станции по порядку от холодильника до сдачи заказа"""
+        dish = self._dish_for(order)
+        if dish is not None:
+            return [step.station for step in dish.steps] + ["order"]
+
+        chains = {"raw": []}
+        queue = ["raw"]
+        while queue:
+            state = queue.pop(0)
+            for tool, table in PROCESSES.items():
+                if state in table:
+                    nxt = table[state]["next_state"]
+                    if nxt not in chains:
+                        chains[nxt] = chains[state] + [tool]
+                        queue.append(nxt)
+        if order not in chains:
+            raise ValueError(f"Нельзя приготовить: {order}")
+        return ["fridge"] + chains[order] + ["order"]
+
+    def held_image(self, order, stage):
+        """Картинка предмета в руках после stage шагов station_chain (первый шаг — холодильник)"""
+        if self._dish_for(order) is not None:
+            return "dish"
+        image, state = "potato", "raw"
+        for tool in self.station_chain(order)[1:stage]:
+            result = PROCESSES[tool][state]
+            image, state = result["image"], result["next_state"]
+        return image
+
+    def stage_times(self, order):
+        """Время работы станции (мс) для каждого шага station_chain"""
+        dish = self._dish_for(order)
+        if dish is not None:
+            return [step.time for step in dish.steps] + [0]
+
+        times, state = [0], "raw"
+        for tool in self.station_chain(order)[1:-1]:
+            result = PROCESSES[tool][state]
+            times.append(result["time"])
+            state = result["next_state"]
+        return times + [0]
+
+
+ENGINE = RecipeEngine(PROCESSES, [parse_dish(r) for r in RECIPES])
+
+
 def get_recipe_result(tool_name, item_state):
     """Возвращает параметры трансформации или None, если действие невозможно"""
-    tool = PROCESSES.get(tool_name)
-    if tool and item_state in tool:
-        return tool[item_state]
-    return None
\ No newline at end of file
+    return ENGINE.get(tool_name, item_state)
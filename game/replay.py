@@ -0,0 +1,301 @@
+import argparse
+import copy
+import sys
+import numpy as np
+import pygame
+from settings import *
+
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+from moduls.trajectory import ShardWriter, TrajectoryReader, obs_columns
+from moduls.grid_env import station_access
+from level import LevelManager
+from entities import Player
+from mechanics import KitchenManager
+from sim import KitchenSim
+from recipes import ENGINE
+
+# Сосед клетки -> куда смотреть, чтобы видеть его
+DIRECTIONS = {(0, -1): "up", (0, 1): "down", (-1, 0): "left", (1, 0): "right"}
+KEYFRAME = 256  # шагов между снимками симуляции для перемотки
+HELD_MARKER = "held"  # предмет неизвестен — рисуем отметку вместо картинки
+
+
+class StateReplay:
+    """
+    Запись графовой среды (GridKitchenEnv и др.): в наблюдении уже есть узел,
+    этап и предмет, поэтому любой кадр читается напрямую — перемотка за O(1).
+    Повар рисуется на клетке у станции своего узла. Предмет в руках — по заказу
+    из записи и этапу; если заказ неизвестен, рисуется нейтральная отметка.
+    """
+    def __init__(self, reader, level, env=0, order=None):
+        self.reader = reader
+        self.env = env
+        self.order = order
+        self.n = reader.num_envs
+        spawn = level.spawn or (0, 0)
+        # Узел -> (клетка x, y, направление взгляда)
+        self.spots = [(spawn[0], spawn[1], "down")]
+        for _, obj, cells in station_access(level, spawn):
+            if not cells:
+                self.spots.append(self.spots[0])
+                continue
+            y, x = (int(v) for v in cells[0])
+            facing = next((f for (dx, dy), f in DIRECTIONS.items()
+                           if level._in_grid(x + dx, y + dy) and level.object_grid[y + dy, x + dx] == obj), "down")
+            self.spots.append((x, y, facing))
+        self.score = None
+
+    def __len__(self):
+        return len(self.reader) // self.n
+
+    def _held(self, stage):
+        if self.order is None:
+            return HELD_MARKER
+        try:
+            return ENGINE.held_image(self.order, stage)
+        except (ValueError, KeyError):
+            return HELD_MARKER
+
+    def frame(self, i):
+        row = i * self.n + self.env
+        obs = self.reader.rows("obs", row, row + 1)[0]
+        reward = float(self.reader.rows("reward", row, row + 1)[0])
+        done = int(self.reader.rows("done", row, row + 1)[0])
+        node = int(obs[0])
+        x, y, facing = self.spots[node] if node < len(self.spots) else self.spots[0]
+        return {
+            "x": x, "y": y, "facing": facing, "frozen": False,
+            "held": self._held(int(obs[1])) if len(obs) > 2 and obs[2] else None,
+            "lines": [f"Узел: {node}", f"Этап: {int(obs[1])}", f"Награда: {reward:+.1f}",
+                      "Конец эпизода" if done else ""],
+        }
+
+
+class SimReplay:
+    """
+    Запись действий KitchenSim: кадры получаются повторной симуляцией.
+    Каждые KEYFRAME шагов сохраняется снимок, перемотка — от ближайшего снимка.
+    """
+    def __init__(self, reader, map_name, seed=0, tick_ms=100):
+        self.reader = reader
+        self.sim = KitchenSim.headless(map_name, seed, tick_ms)
+        self.position = 0
+        self.keyframes = {0: self._snapshot()}
+
+    def __len__(self):
+        # Кадр i — состояние после i действий, последний кадр — после всех
+        return len(self.reader) + 1
+
+    def _snapshot(self):
+        player, kitchen = self.sim.player, self.sim.kitchen
+        return {
+            "player": (player.cell_x, player.cell_y, player.facing, player.freeze_until, copy.copy(player.held_item)),
+            "kitchen": (kitchen.score, kitchen.current_order, kitchen.rng.getstate(), copy.deepcopy(kitchen.stream)),
+            "time": self.sim.clock.now(),
+        }
+
+    def _restore(self, index):
+        snap = self.keyframes[index]
+        player, kitchen = self.sim.player, self.sim.kitchen
+        player.cell_x, player.cell_y, player.facing, player.freeze_until, held = snap["player"]
+        player.held_item = copy.copy(held)
+        kitchen.score, kitchen.current_order, rng_state, stream = snap["kitchen"]
+        kitchen.rng.setstate(rng_state)
+        kitchen.stream = copy.deepcopy(stream)
+        self.sim.clock.time = snap["time"]
+        self.position = index
+
+    def frame(self, i):
+        nearest = max(k for k in self.keyframes if k <= i)
+        if i < self.position or nearest > self.position:
+            self._restore(nearest)
+        if self.position < i:
+            actions = self.reader.rows("action", self.position, i)
+            for a in actions:
+                self.sim.step(KitchenSim.ACTIONS[a])
+                self.position += 1
+                if self.position % KEYFRAME == 0 and self.position not in self.keyframes:
+                    self.keyframes[self.position] = self._snapshot()
+
+        player, kitchen = self.sim.player, self.sim.kitchen
+        return {
+            "x": player.cell_x, "y": player.cell_y, "facing": player.facing, "frozen": self.sim.is_frozen(),
+            "held": player.held_item.image_key if player.held_item else None,
+            "lines": [f"Счет: {kitchen.score}", f"Заказ: {kitchen.get_order_name()}",
+                      f"Время: {self.sim.clock.now() / 1000:.1f} с"],
+        }
+
+
+def record_sim(path, map_name, actions, seed=0, tick_ms=100):
+    """Прогоняем действия (номера KitchenSim.ACTIONS) в headless-игре и пишем запись для реплея"""
+    sim = KitchenSim.headless(map_name, seed, tick_ms)
+    writer = ShardWriter(path, meta={"kind": "sim", "map": map_name, "seed": seed, "tick_ms": tick_ms})
+    writer.allocate(obs_columns(np.zeros(3, dtype=np.int32)))
+    for a in actions:
+        b, i, score = writer.buffers, writer.count, sim.kitchen.score
+        b["obs"][i, 0] = (sim.player.cell_x, sim.player.cell_y, sim.player.held_item is not None)
+        sim.step(KitchenSim.ACTIONS[a])
+        b["action"][i, 0] = a
+        b["reward"][i, 0] = sim.kitchen.score - score
+        writer.count = i + 1
+        if writer.count == writer.chunk_steps:
+            writer.flush(1)
+    writer.close(1)
+
+
+class ReplayViewer:
+    """
+    Проигрывание записи с любой скоростью. Симуляция и отрисовка развязаны:
+    за кадр экрана проходит столько шагов, сколько требует скорость (лишние
+    кадры пропускаются), а на экране обновляются только грязные прямоугольники.
+    """
+    SPEEDS = [1, 2, 5, 10, 20, 50, 100]
+
+    def __init__(self, screen, level, replay, steps_per_sec=10):
+        self.screen = screen
+        self.level = level
+        self.replay = replay
+        self.steps_per_sec = steps_per_sec
+        self.speed_index = 0
+        self.position = 0.0
+        self.playing = True
+        self.player = Player()
+        self.kitchen = KitchenManager()
+        self.font = pygame.font.SysFont(None, 24)
+        self.panel = pygame.Rect(GAME_WIDTH, 0, UI_WIDTH, HEIGHT)
+        self.bar = pygame.Rect(GAME_WIDTH + 10, HEIGHT - 40, UI_WIDTH - 20, 16)
+        self.player_rect = None
+        self.shown = None
+
+    @property
+    def speed(self):
+        return self.SPEEDS[self.speed_index]
+
+    def seek(self, step):
+        self.position = float(min(max(step, 0), max(len(self.replay) - 1, 0)))
+
+    def handle(self, event):
+        if event.type == pygame.KEYDOWN:
+            jump = self.steps_per_sec * 10
+            if event.key == pygame.K_SPACE: self.playing = not self.playing
+            elif event.key == pygame.K_RIGHT: self.seek(self.position + (jump if self.playing else 1))
+            elif event.key == pygame.K_LEFT: self.seek(self.position - (jump if self.playing else 1))
+            elif event.key == pygame.K_UP: self.speed_index = min(self.speed_index + 1, len(self.SPEEDS) - 1)
+            elif event.key == pygame.K_DOWN: self.speed_index = max(self.speed_index - 1, 0)
+            elif event.key == pygame.K_HOME: self.seek(0)
+            elif event.key == pygame.K_END: self.seek(len(self.replay) - 1)
+        if event.type == pygame.MOUSEBUTTONDOWN and self.bar.collidepoint(event.pos):
+            self.seek((event.pos[0] - self.bar.x) / self.bar.width * len(self.replay))
+
+    def update(self, dt):
+        if self.playing:
+            self.seek(self.position + dt / 1000 * self.steps_per_sec * self.speed)
+            if self.position >= len(self.replay) - 1:
+                self.playing = False
+
+    def _draw_panel(self, frame, step):
+        pygame.draw.rect(self.screen, GRAY, self.panel)
+        lines = [f"Реплей: {self.level.map_name}", f"Кадр: {step + 1} / {len(self.replay)}",
+                 f"Скорость: {self.speed}x" + ("" if self.playing else " (пауза)"), ""] + frame["lines"]
+        for k, text in enumerate(lines):
+            if text:
+                self.screen.blit(self.font.render(text, True, WHITE), (GAME_WIDTH + 20, 20 + k * 26))
+        pygame.draw.rect(self.screen, LIGHT_GRAY, self.bar)
+        done = self.bar.copy()
+        done.width = int(self.bar.width * (step + 1) / max(len(self.replay), 1))
+        pygame.draw.rect(self.screen, GREEN, done)
+
+    def render(self):
+        """Рисуем только если кадр изменился; возвращает список грязных прямоугольников"""
+        step = int(self.position)
+        state = (step, self.speed_index, self.playing)
+        if state == self.shown:
+            return []
+        self.shown = state
+        if not len(self.replay):
+            self._draw_panel({"lines": ["Запись пуста"]}, -1)
+            return [self.panel]
+        frame = self.replay.frame(step)
+        ts = self.level.tile_size
+
+        dirty = []
+        if self.player_rect:
+            # Стираем повара: восстанавливаем фон карты под ним
+            self.screen.fill(BLACK, self.player_rect)
+            self.level.redraw_rect(self.screen, self.player_rect)
+            dirty.append(self.player_rect)
+
+        self.player.set_pos(frame["x"], frame["y"])
+        self.player.facing = frame["facing"]
+        self.player.freeze_until = 1 if frame["frozen"] else 0
+        self.player.draw(self.screen, ts, 0)
+        # Предмет рисуется со сдвигом вверх — захватываем его в прямоугольник
+        self.player_rect = pygame.Rect(frame["x"] * ts, frame["y"] * ts - 4, max(ts, 24), ts + 4)
+        if frame["held"]:
+            img = self.kitchen.item_images.get(frame["held"])
+            if img: self.screen.blit(img, (frame["x"] * ts + 4, frame["y"] * ts - 4))
+            else: pygame.draw.circle(self.screen, YELLOW, (frame["x"] * ts + 14, frame["y"] * ts + 6), 6)
+        dirty.append(self.player_rect)
+
+        self._draw_panel(frame, step)
+        dirty.append(self.panel)
+        return dirty
+
+    def run(self):
+        clock = pygame.time.Clock()
+        self.screen.fill(BLACK)
+        self.level.draw(self.screen)
+        pygame.display.flip()
+        while True:
+            dt = clock.tick(FPS)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                self.handle(event)
+            self.update(dt)
+            dirty = self.render()
+            if dirty:
+                pygame.display.update(dirty)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Просмотр записанных эпизодов на карте игры")
+    parser.add_argument("path", help="папка с записью (moduls/trajectory.py)")
+    parser.add_argument("--map", help="карта, если ее нет в записи")
+    parser.add_argument("--env", type=int, default=0, help="какую кухню пакетной записи показывать")
+    parser.add_argument("--speed", type=int, default=1, choices=ReplayViewer.SPEEDS)
+    parser.add_argument("--demo", type=int, default=0,
+                        help="записать столько случайных действий headless-игры в path и показать")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.demo:
+        actions = np.random.default_rng(0).integers(len(KitchenSim.ACTIONS), size=args.demo)
+        record_sim(args.path, args.map or "map_1", actions, seed=0)
+
+    reader = TrajectoryReader(args.path)
+    meta = reader.meta
+    map_name = args.map or meta.get("map", "map_1")
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Kitchen Chef: Replay")
+    level = LevelManager()
+    if not level.load_map(map_name, Player()):
+        return
+
+    if meta.get("kind") == "sim":
+        replay = SimReplay(reader, map_name, meta.get("seed", 0), meta.get("tick_ms", 100))
+    else:
+        replay = StateReplay(reader, level, args.env, meta.get("order"))
+    viewer = ReplayViewer(screen, level, replay)
+    viewer.speed_index = ReplayViewer.SPEEDS.index(args.speed)
+    viewer.run()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,30 @@ UI_WIDTH = 220
 WIDTH = GAME_WIDTH + UI_WIDTH
 HEIGHT = GAME_HEIGHT
 FPS = 60
+# Симуляция идет фиксированными тиками независимо от FPS (sim.FixedStepLoop)
+SIM_RATE = 60  # тиков в секунду времени игры
+SIM_MAX_STEPS = 32  # не больше тиков за кадр, остальное отставание сбрасывается
+TIME_SCALES = [0.25, 0.5, 1, 2, 4, 8]  # клавиши -/= ; F6 — максимальная скорость без отрисовки
+MAX_SPEED_REDRAW_MS = 500  # в режиме максимальной скорости экран обновляется раз в столько мс
 TILE_SIZE = 16  # Базовый размер, будет переопределен картой
+STATIC_CHUNK = 512  # Размер чанка (px) для запеченных статических слоев
+TEXT_CACHE_SIZE = 256  # Готовых поверхностей текста в LRU-кеше UI
+ATLAS_PAGE_WIDTH = 512  # Ширина страницы атласа тайлов (px), высота — по содержимому
 
 # Пути
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+# ИИ-повар (клавиша P): модель из train.py и списки, на которых она училась
+AI_MODEL_PATH = os.path.join(ROOT_DIR, "grid_kitchen_model.zip")
+AI_ORDERS = ["fried", "baked"]
+AI_MAPS = ["map_1", "map_2", "map_3"]
+
+# Профилирование кадра: F3 — панель таймингов, F4 — Chrome trace, F5 — cProfile вкл/выкл
+PROFILE_DIR = os.path.join(ROOT_DIR, "profiles")
+PROFILE_WINDOW = 240  # кадров для скользящих процентилей
+PROFILE_TRACE_EVENTS = 20000  # событий в журнале для Chrome trace
 
 # Цвета
 WHITE = (255, 255, 255)
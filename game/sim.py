@@ -0,0 +1,465 @@
+import pygame
+import pytmx
+import random
+import time
+import os
+import numpy as np
+from entities import Player
+from settings import *
+from recipes import ENGINE, get_recipe_result
+from map_cache import map_cache
+
+
+class SimClock:
+    """Симулированное время в мс: идёт только когда его двигают"""
+    def __init__(self, start=0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def advance(self, ms):
+        self.time += ms
+
+
+class PygameClock:
+    """Реальное время игры"""
+    def now(self):
+        return pygame.time.get_ticks()
+
+
+class SimLevel:
+    """Карта без графики: стены, интерактивные объекты и сетка тайлов"""
+    def __init__(self):
+        self.tmx_data = None
+        self.tile_size = 16
+        self.collision_rects = []
+        self.interactive_objects = []
+        self.map_name = ""
+        # Сетка по тайлам: занятость и номер объекта в interactive_objects (-1 — пусто)
+        self.blocked = np.zeros((0, 0), dtype=bool)
+        self.object_grid = np.full((0, 0), -1, dtype=np.int32)
+        self.map_size = (0, 0)
+        self.spawn = None
+        self._maps = []
+        self._maps_mtime = None
+
+    def get_available_maps(self):
+        maps_dir = os.path.join(BASE_DIR, "maps")
+        if not os.path.exists(maps_dir):
+            os.makedirs(maps_dir)
+            return []
+        # Перечитываем папку только если она изменилась
+        mtime = os.stat(maps_dir).st_mtime_ns
+        if mtime != self._maps_mtime:
+            self._maps_mtime = mtime
+            self._maps = sorted(f.replace(".tmx", "") for f in os.listdir(maps_dir) if f.endswith(".tmx"))
+        return list(self._maps)
+
+    def map_path(self, map_name):
+        return os.path.join(BASE_DIR, "maps", f"{map_name}.tmx")
+
+    def load_map(self, map_name, player=None):
+        """Загрузка карты без картинок тайлсетов (не нужен дисплей)"""
+        self.map_name = map_name
+        try:
+            if not self._load_cached(player):
+                self.tmx_data = pytmx.TiledMap(self.map_path(map_name))
+                self._load_objects(player)
+            return True
+        except Exception as e:
+            print(f"Ошибка загрузки карты: {e}")
+            return False
+
+    def _load_objects(self, player):
+        self.tile_size = self.tmx_data.tilewidth
+        self.map_size = (self.tmx_data.width, self.tmx_data.height)
+        self.collision_rects = []
+        self.interactive_objects = []
+        self.spawn = None
+
+        for obj in self.tmx_data.objects:
+            rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height)
+            if obj.name:
+                self.interactive_objects.append({"name": obj.name, "rect": rect})
+            if obj.name not in ["player", "order"]:
+                 self.collision_rects.append(rect)
+            if obj.name == "player":
+                self.spawn = (int(obj.x // self.tile_size), int(obj.y // self.tile_size))
+        self._build_grid()
+        self._place_player(player)
+
+        map_cache.save(self.map_path(self.map_name), "level", {
+            "blocked": self.blocked,
+            "object_grid": self.object_grid,
+            "object_rects": np.array([tuple(o["rect"]) for o in self.interactive_objects], dtype=np.int32).reshape(-1, 4),
+            "collision_rects": np.array([tuple(r) for r in self.collision_rects], dtype=np.int32).reshape(-1, 4),
+        }, {
+            "tile_size": self.tile_size,
+            "map_size": self.map_size,
+            "object_names": [o["name"] for o in self.interactive_objects],
+            "spawn": self.spawn,
+        })
+
+    def _load_cached(self, player):
+        """Стены, сетка и объекты из кеша по хешу файла карты"""
+        cached = map_cache.load(self.map_path(self.map_name), "level")
+        if cached is None:
+            return False
+        arrays, meta = cached
+        self.tmx_data = None
+        self.tile_size = meta["tile_size"]
+        self.map_size = tuple(meta["map_size"])
+        self.spawn = tuple(meta["spawn"]) if meta["spawn"] else None
+        self.blocked = arrays["blocked"]
+        self.object_grid = arrays["object_grid"]
+        self.interactive_objects = [{"name": name, "rect": pygame.Rect(*map(int, r))}
+                                    for name, r in zip(meta["object_names"], arrays["object_rects"])]
+        self.collision_rects = [pygame.Rect(*map(int, r)) for r in arrays["collision_rects"]]
+        self._place_player(player)
+        return True
+
+    def _place_player(self, player):
+        if player and self.spawn:
+            player.set_pos(*self.spawn)
+
+    def _build_grid(self):
+        """Растеризуем объекты карты в сетку тайлов для поиска за O(1)"""
+        ts = self.tile_size
+        w, h = self.map_size
+        self.blocked = np.zeros((h, w), dtype=bool)
+        self.object_grid = np.full((h, w), -1, dtype=np.int32)
+
+        # Стена занимает все тайлы, с которыми пересекается прямоугольник
+        for rect in self.collision_rects:
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+            x0, y0 = max(rect.left // ts, 0), max(rect.top // ts, 0)
+            x1, y1 = max(-(-rect.right // ts), 0), max(-(-rect.bottom // ts), 0)
+            self.blocked[y0:y1, x0:x1] = True
+
+        for i in range(len(self.interactive_objects)):
+            self._paint_object(i)
+
+    # --- Изменение карты на ходу: правим только затронутые тайлы ---
+    def _writable(self):
+        """Сетки из кеша открыты через mmap только на чтение: копируем перед первой правкой"""
+        if not self.blocked.flags.writeable:
+            self.blocked = np.array(self.blocked)
+        if not self.object_grid.flags.writeable:
+            self.object_grid = np.array(self.object_grid)
+
+    def _rect_tiles(self, rect):
+        ts = self.tile_size
+        x0, y0 = max(rect.left // ts, 0), max(rect.top // ts, 0)
+        x1, y1 = min(-(-rect.right // ts), self.map_size[0]), min(-(-rect.bottom // ts), self.map_size[1])
+        return [(y, x) for y in range(y0, y1) for x in range(x0, x1)]
+
+    def set_blocked(self, cell_x, cell_y, blocked=True):
+        """Препятствие на тайле (пролитое, ящик) или его уборка; True — если что-то поменялось"""
+        if not self._in_grid(cell_x, cell_y) or self.blocked[cell_y, cell_x] == blocked:
+            return False
+        self._writable()
+        self.blocked[cell_y, cell_x] = blocked
+        return True
+
+    def move_object(self, index, cell_x, cell_y):
+        """
+        Переносим интерактивный объект так, чтобы его левый верхний угол встал на тайл.
+        Возвращает (освободившиеся тайлы, занятые тайлы) в виде (y, x).
+        """
+        self._writable()
+        obj = self.interactive_objects[index]
+        old = obj["rect"]
+        new = old.copy()
+        new.topleft = (cell_x * self.tile_size, cell_y * self.tile_size)
+        solid = obj["name"] not in ["player", "order"]
+        own = set(self._rect_tiles(old))
+        if solid and any(self.blocked[c] and c not in own for c in self._rect_tiles(new)):
+            raise ValueError(f"Место занято: {obj['name']} на ({cell_x}, {cell_y})")
+
+        freed, taken = [], []
+        if solid:
+            k = self.collision_rects.index(old) if old in self.collision_rects else None
+            if k is not None:
+                self.collision_rects.pop(k)
+            for y, x in self._rect_tiles(old):
+                # Тайл мог быть накрыт еще и другой стеной
+                tile = pygame.Rect(x * self.tile_size, y * self.tile_size, self.tile_size, self.tile_size)
+                if self.blocked[y, x] and tile.collidelist(self.collision_rects) == -1:
+                    self.blocked[y, x] = False
+                    freed.append((y, x))
+            self.collision_rects.append(new)
+            for y, x in self._rect_tiles(new):
+                if not self.blocked[y, x]:
+                    self.blocked[y, x] = True
+                    taken.append((y, x))
+        obj["rect"] = new
+
+        # Владение тайлами: старые тайлы могут перейти объекту, который был под этим
+        self.object_grid[self.object_grid == index] = -1
+        for j, other in enumerate(self.interactive_objects):
+            if j == index or other["rect"].colliderect(old):
+                self._paint_object(j)
+
+        # Тайл, освобожденный и тут же занятый снова, не изменился
+        return [c for c in freed if c not in taken], [c for c in taken if c not in freed]
+
+    def _paint_object(self, index):
+        """Объект принадлежит тайлу, если накрывает его центр; первый в списке побеждает"""
+        rect, ts = self.interactive_objects[index]["rect"], self.tile_size
+        half = ts // 2
+        x0, y0 = max(-(-(rect.left - half) // ts), 0), max(-(-(rect.top - half) // ts), 0)
+        x1, y1 = max((rect.right - 1 - half) // ts + 1, 0), max((rect.bottom - 1 - half) // ts + 1, 0)
+        area = self.object_grid[y0:y1, x0:x1]
+        area[(area < 0) | (area > index)] = index
+
+    def _in_grid(self, cell_x, cell_y):
+        h, w = self.blocked.shape
+        return 0 <= cell_x < w and 0 <= cell_y < h
+
+    def can_move(self, cell_x, cell_y):
+        if self._in_grid(cell_x, cell_y):
+            return not self.blocked[cell_y, cell_x]
+        # За пределами карты — обычная проверка по прямоугольникам
+        test_rect = pygame.Rect(cell_x * self.tile_size, cell_y * self.tile_size, self.tile_size, self.tile_size)
+        return test_rect.collidelist(self.collision_rects) == -1
+
+    def get_object_at(self, cell_x, cell_y):
+        """Интерактивный объект, накрывающий центр тайла, или None"""
+        if self._in_grid(cell_x, cell_y):
+            i = self.object_grid[cell_y, cell_x]
+            return self.interactive_objects[i] if i >= 0 else None
+        ts = self.tile_size
+        check_pos = (cell_x * ts + ts // 2, cell_y * ts + ts // 2)
+        return next((o for o in self.interactive_objects if o["rect"].collidepoint(check_pos)), None)
+
+
+class KitchenLogic:
+    """Правила кухни: заказы, счет и обработка продуктов на станциях"""
+    def __init__(self, rng=None, stream=None):
+        self.rng = rng or random.Random()
+        # Поток заказов (orders.OrderStream); без него — один случайный заказ за раз
+        self.stream = stream
+        self.score = 0
+        # Все заказы из движка рецептов: картошка из PROCESSES и блюда из moduls/recipes.py
+        self.possible_orders = dict(ENGINE.orders)
+        self.current_order = None
+        self.generate_new_order()
+
+    def generate_new_order(self):
+        if self.stream:
+            # В режиме потока на табло самый старый несданный заказ
+            head = self.stream.head()
+            self.current_order = head.order if head else None
+        else:
+            self.current_order = self.rng.choice(list(self.possible_orders.keys()))
+
+    def update(self, now):
+        """Принимаем заказы, пришедшие к моменту now"""
+        if self.stream:
+            self.stream.update(now)
+            self.generate_new_order()
+
+    def _accept(self, state, now):
+        """Подходит ли блюдо к заказу (в режиме потока — к любому открытому)"""
+        if not self.stream:
+            return state == self.current_order
+        ticket = self.stream.find(state)
+        if ticket:
+            self.stream.serve(ticket, now)
+        return ticket is not None
+
+    def get_order_name(self):
+        return self.possible_orders.get(self.current_order, "---")
+
+    def interact(self, player, level, key_pressed, now, notify):
+        """notify(text, rect, duration) — куда отправлять всплывающие сообщения"""
+        target_x, target_y = player.cell_x, player.cell_y
+        if player.facing == "up": target_y -= 1
+        elif player.facing == "down": target_y += 1
+        elif player.facing == "left": target_x -= 1
+        elif player.facing == "right": target_x += 1
+
+        target_obj = level.get_object_at(target_x, target_y)
+
+        if not target_obj: return
+
+        name, rect, held = target_obj["name"], target_obj["rect"], player.held_item
+
+        # Сдача заказа
+        if name == "order" and key_pressed == pygame.K_e:
+            if held:
+                if self._accept(held.state, now):
+                    self.score += 10
+                    notify("ВЕРНО! +10", rect)
+                    player.held_item = None
+                    self.generate_new_order()
+                else:
+                    # Теперь счет может уходить в минус
+                    self.score -= 25
+                    notify("ОШИБКА! -25", rect)
+                    player.held_item = None
+            return
+
+        # Холодильник: выдает основу под текущий заказ, потом докладывает ингредиенты
+        if name == "fridge" and key_pressed == pygame.K_e:
+            if not held:
+                player.held_item = ENGINE.start_item(self.current_order)
+                notify("Взято", rect)
+                return
+            if not get_recipe_result(name, held.state):
+                return
+
+        # Универсальная обработка через recipes.py
+        if held:
+            recipe = get_recipe_result(name, held.state)
+            if recipe:
+                if name == "oven" and key_pressed != pygame.K_f:
+                    notify("Нажми F для печи", rect)
+                    return
+
+                player.freeze_until = now + recipe["time"]
+                held.state = recipe["next_state"]
+                held.display_name = recipe["name"]
+                held.image_key = recipe["image"]
+                if recipe["time"]:
+                    notify("Готовим...", rect, recipe["time"])
+                else:
+                    notify("Взято", rect)
+            else:
+                notify("Не подходит", rect)
+
+
+class KitchenSim:
+    """
+    Игра без окна: карта, повар и кухня на внедренных часах.
+    Фронтенд pygame только рисует это состояние.
+    """
+    MOVES = {"up": (0, -1), "down": (0, 1), "left": (-1, 0), "right": (1, 0)}
+    KEYS = {"use": pygame.K_e, "use_alt": pygame.K_f}
+    ACTIONS = ["up", "down", "left", "right", "use", "use_alt", "wait"]
+
+    def __init__(self, level, player, kitchen, clock, tick_ms=100):
+        self.level = level
+        self.player = player
+        self.kitchen = kitchen
+        self.clock = clock
+        self.tick_ms = tick_ms
+        self.events = []
+
+    @classmethod
+    def headless(cls, map_name, seed=None, tick_ms=100, stream=None):
+        level = SimLevel()
+        player = Player()
+        if not level.load_map(map_name, player):
+            raise ValueError(f"Карта не загружена: {map_name}")
+        sim = cls(level, player, KitchenLogic(random.Random(seed), stream), SimClock(), tick_ms)
+        sim.update()
+        return sim
+
+    def is_frozen(self):
+        return self.clock.now() < self.player.freeze_until
+
+    def notify(self, text, rect, duration=2000):
+        self.events.append({"text": text, "rect": rect, "time": self.clock.now(), "duration": duration})
+
+    def move(self, dx, dy):
+        if not self.is_frozen():
+            self.player.move(dx, dy, self.level)
+
+    def update(self):
+        self.kitchen.update(self.clock.now())
+
+    def interact(self, key_pressed, notify=None):
+        if not self.is_frozen():
+            self.kitchen.interact(self.player, self.level, key_pressed, self.clock.now(), notify or self.notify)
+
+    def step(self, action):
+        """
+        Одно действие: сначала дожидаемся конца готовки (время просто
+        перематывается), затем действуем, затем проходит один тик.
+        Возвращает события (всплывающие сообщения) этого шага.
+        """
+        self.events = []
+        if self.is_frozen():
+            self.clock.advance(self.player.freeze_until - self.clock.now())
+            self.update()
+
+        if action in self.MOVES:
+            self.move(*self.MOVES[action])
+        elif action in self.KEYS:
+            self.interact(self.KEYS[action])
+
+        self.clock.advance(self.tick_ms)
+        self.update()
+        return self.events
+
+
+class FixedStepLoop:
+    """
+    Симуляция фиксированными тиками, отдельно от отрисовки.
+    Реальное время кадра (умноженное на time_scale) копится в аккумуляторе
+    и тратится целыми тиками по step_ms времени симуляции, поэтому
+    результат не зависит от FPS. Ввод копится в очереди и применяется
+    в начале ближайшего тика, агенты (ИИ-повар) ходят тоже внутри тиков.
+    """
+    def __init__(self, sim, rate=SIM_RATE, time_scale=1.0, max_steps=SIM_MAX_STEPS):
+        self.sim = sim
+        self.rate = rate
+        self.step_ms = 1000 / rate
+        self.time_scale = time_scale
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.inputs = []
+        self.agents = []
+        self.ticks = 0
+        self.origin = sim.clock.now()
+
+    def queue(self, fn, *args):
+        """Отложенный ввод: fn(*args) выполнится в начале следующего тика"""
+        self.inputs.append((fn, args))
+
+    def tick(self):
+        inputs, self.inputs = self.inputs, []
+        for fn, args in inputs:
+            fn(*args)
+        for agent in self.agents:
+            agent.update(self.sim.clock.now())
+        # Время тика считаем от счетчика, а не суммой step_ms, чтобы не копилась ошибка округления
+        self.ticks += 1
+        self.sim.clock.advance(self.origin + self.ticks * 1000 / self.rate - self.sim.clock.now())
+        self.sim.update()
+
+    def frame(self, real_ms):
+        """
+        Прошло real_ms реального времени: делаем положенные тики, но не больше
+        max_steps за кадр — если симуляция не успевает, лишний долг сбрасывается,
+        а не копится (иначе каждый следующий кадр будет еще длиннее).
+        """
+        self.accumulator += real_ms * self.time_scale
+        steps = 0
+        while self.accumulator >= self.step_ms and steps < self.max_steps:
+            self.tick()
+            self.accumulator -= self.step_ms
+            steps += 1
+        if steps == self.max_steps:
+            self.accumulator = min(self.accumulator, self.step_ms)
+        return steps
+
+    def run_for(self, budget_ms):
+        """Режим максимальной скорости: тики без ожидания, пока не кончится budget_ms реального времени"""
+        end = time.perf_counter() + budget_ms / 1000
+        steps = 0
+        while time.perf_counter() < end:
+            self.tick()
+            steps += 1
+        self.accumulator = 0.0
+        return steps
+
+    def run_sim(self, sim_ms):
+        """Без окна и реального времени: ровно столько тиков, сколько помещается в sim_ms"""
+        steps = int(sim_ms * self.rate / 1000 + 1e-9)
+        for _ in range(steps):
+            self.tick()
+        return steps
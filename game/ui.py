@@ -1,11 +1,41 @@
 import pygame
+from collections import OrderedDict
 from settings import *
 
+class TextCache:
+    """
+    Готовые поверхности текста по ключу (шрифт, текст, цвет, фон).
+    Строки UI почти не меняются между кадрами, font.render зовется только для новых;
+    самые давние вытесняются, когда записей больше maxsize.
+    """
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, bg=None):
+        key = (font, text, color, bg)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, True, color, bg)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surf
+
+
 class UIManager:
     def __init__(self):
         self.font = pygame.font.SysFont(None, 24)
         self.header_font = pygame.font.SysFont(None, 28)
-        self.active_popup = {"text": "", "rect": None, "end_time": 0}
+        self.small_font = pygame.font.SysFont(None, 18)
+        self.text = TextCache()
+        self.active_popup = {"text": "", "rect": None, "end_time": 0, "sim": False}
         
         # UI элементы
         self.reload_button = pygame.Rect(GAME_WIDTH + 20, 500, 180, 40)
@@ -13,41 +43,84 @@ class UIManager:
         self.dropdown_open = False
         self.map_list = []
 
-    def show_popup(self, text, rect, duration=2000):
-        self.active_popup = {"text": text, "rect": rect, "end_time": pygame.time.get_ticks() + duration}
+        # Панель рисуется в свою поверхность и перерисовывается только при смене состояния
+        self.panel = None
+        self.panel_state = None
+
+    def show_popup(self, text, rect, duration=2000, now=None):
+        """
+        now — время симуляции, если сообщение о событии симуляции: тогда и гаснет оно
+        по времени симуляции (x8, максимальная скорость). Без now — по реальному времени
+        """
+        sim = now is not None
+        start = now if sim else pygame.time.get_ticks()
+        self.active_popup = {"text": text, "rect": rect, "end_time": start + duration, "sim": sim}
+
+    def draw_ui(self, screen, player, kitchen_manager, level_manager, profiler=None):
+        """Возвращает True, если панель перерисована (ее прямоугольник надо обновить на экране)"""
+        held = player.held_item
+        if self.dropdown_open:
+            self.map_list = level_manager.get_available_maps()
+        state = (kitchen_manager.score, kitchen_manager.current_order, held.display_name if held else None,
+                 level_manager.map_name, self.dropdown_open, tuple(self.map_list) if self.dropdown_open else None,
+                 (tuple(profiler.overlay_rows()), profiler.cprofile is not None) if profiler else None)
+        changed = state != self.panel_state or self.panel is None
+        if changed:
+            self.panel_state = state
+            self._draw_panel(player, kitchen_manager, level_manager, profiler)
+        screen.blit(self.panel, (GAME_WIDTH, 0))
+        return changed
 
-    def draw_ui(self, screen, player, kitchen_manager, level_manager):
-        pygame.draw.rect(screen, GRAY, (GAME_WIDTH, 0, UI_WIDTH, HEIGHT))
+    def _draw_panel(self, player, kitchen_manager, level_manager, profiler):
+        if self.panel is None:
+            self.panel = pygame.Surface((UI_WIDTH, HEIGHT)).convert()
+        panel, text = self.panel, self.text.render
+        # Прямоугольники кнопок заданы в координатах экрана, панель начинается с GAME_WIDTH
+        dropdown = self.dropdown_rect.move(-GAME_WIDTH, 0)
+        button = self.reload_button.move(-GAME_WIDTH, 0)
+        panel.fill(GRAY)
         
         # Счет и Заказ
-        screen.blit(self.header_font.render(f"Счет: {kitchen_manager.score}", True, GREEN), (GAME_WIDTH + 20, 100))
-        pygame.draw.rect(screen, ORANGE, (GAME_WIDTH + 10, 140, 200, 70), border_radius=5)
-        screen.blit(self.font.render("НУЖНО ПРИГОТОВИТЬ:", True, BLACK), (GAME_WIDTH + 20, 150))
-        screen.blit(self.header_font.render(kitchen_manager.get_order_name(), True, BLACK), (GAME_WIDTH + 20, 175))
+        panel.blit(text(self.header_font, f"Счет: {kitchen_manager.score}", GREEN), (20, 100))
+        pygame.draw.rect(panel, ORANGE, (10, 140, 200, 70), border_radius=5)
+        panel.blit(text(self.font, "НУЖНО ПРИГОТОВИТЬ:", BLACK), (20, 150))
+        panel.blit(text(self.header_font, kitchen_manager.get_order_name(), BLACK), (20, 175))
 
         # Инвентарь
         held = player.held_item
         color = YELLOW if held else LIGHT_GRAY
-        screen.blit(self.font.render(f"В руках: {held.display_name if held else 'Пусто'}", True, color), (GAME_WIDTH + 20, 240))
+        panel.blit(text(self.font, f"В руках: {held.display_name if held else 'Пусто'}", color), (20, 240))
+
+        if profiler:
+            self.draw_profile(panel, profiler)
 
         # Выпадающий список карт
-        pygame.draw.rect(screen, WHITE, self.dropdown_rect)
-        pygame.draw.rect(screen, BLACK, self.dropdown_rect, 2)
+        pygame.draw.rect(panel, WHITE, dropdown)
+        pygame.draw.rect(panel, BLACK, dropdown, 2)
         curr_map = level_manager.map_name if level_manager.map_name else "Выбери карту"
-        screen.blit(self.font.render(curr_map, True, BLACK), (self.dropdown_rect.x + 5, self.dropdown_rect.y + 8))
+        panel.blit(text(self.font, curr_map, BLACK), (dropdown.x + 5, dropdown.y + 8))
 
         if self.dropdown_open:
-            self.map_list = level_manager.get_available_maps()
             for i, m_name in enumerate(self.map_list):
-                item_rect = pygame.Rect(self.dropdown_rect.x, self.dropdown_rect.bottom + (i * 30), self.dropdown_rect.width, 30)
-                pygame.draw.rect(screen, LIGHT_GRAY, item_rect)
-                pygame.draw.rect(screen, BLACK, item_rect, 1)
-                screen.blit(self.font.render(m_name, True, BLACK), (item_rect.x + 5, item_rect.y + 5))
+                item_rect = pygame.Rect(dropdown.x, dropdown.bottom + (i * 30), dropdown.width, 30)
+                pygame.draw.rect(panel, LIGHT_GRAY, item_rect)
+                pygame.draw.rect(panel, BLACK, item_rect, 1)
+                panel.blit(text(self.font, m_name, BLACK), (item_rect.x + 5, item_rect.y + 5))
 
         # Кнопка рестарта
-        pygame.draw.rect(screen, (80, 120, 80), self.reload_button)
-        txt = self.font.render("Сбросить прогресс", True, WHITE)
-        screen.blit(txt, txt.get_rect(center=self.reload_button.center))
+        pygame.draw.rect(panel, (80, 120, 80), button)
+        txt = text(self.font, "Сбросить прогресс", WHITE)
+        panel.blit(txt, txt.get_rect(center=button.center))
+
+    def draw_profile(self, panel, profiler):
+        """Тайминги участков кадра (мс) между инвентарем и кнопкой рестарта, по колонкам"""
+        rows = [("участок", "p50", "p95", "max")] + profiler.overlay_rows()[:14]
+        for i, row in enumerate(rows):
+            y = 270 + i * 14
+            for value, x in zip(row, (10, 95, 140, 185)):
+                panel.blit(self.text.render(self.small_font, value, LIGHT_GRAY if i == 0 else WHITE), (x, y))
+        if profiler.cprofile:
+            panel.blit(self.text.render(self.small_font, "cProfile: идет запись (F5)", RED), (10, 270 + len(rows) * 14))
 
     def handle_click(self, pos, level_manager, player, kitchen_manager):
         # Клик по выпадающему списку
@@ -69,15 +142,18 @@ class UIManager:
             player.held_item = None
             kitchen_manager.generate_new_order()
 
-    def draw_popups(self, screen):
-        curr = pygame.time.get_ticks()
+    def draw_popups(self, screen, now=None):
+        """now — время симуляции (для сообщений из show_popup с now). Возвращает прямоугольник сообщения или None"""
+        curr = now if self.active_popup["sim"] and now is not None else pygame.time.get_ticks()
         if self.active_popup["text"] and curr < self.active_popup["end_time"]:
-            txt = self.font.render(self.active_popup["text"], True, WHITE, BLACK)
+            txt = self.text.render(self.font, self.active_popup["text"], WHITE, BLACK)
             r = txt.get_rect(centerx=self.active_popup["rect"].centerx, bottom=self.active_popup["rect"].top - 5)
             screen.blit(txt, r)
+            return r
 
-    def draw_timer(self, screen, player, ts):
-        if pygame.time.get_ticks() < player.freeze_until:
-            left = (player.freeze_until - pygame.time.get_ticks()) / 1000
-            t = self.header_font.render(f"{left:.1f}s", True, RED)
-            screen.blit(t, (player.cell_x * ts, player.cell_y * ts - 20))
\ No newline at end of file
+    def draw_timer(self, screen, player, ts, now):
+        """Сколько еще готовить; now — время симуляции, в нем же задан freeze_until. Возвращает прямоугольник или None"""
+        if now < player.freeze_until:
+            left = (player.freeze_until - now) / 1000
+            t = self.text.render(self.header_font, f"{left:.1f}s", RED)
+            return screen.blit(t, (player.cell_x * ts, player.cell_y * ts - 20))
\ No newline at end of file
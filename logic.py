@@ -2,11 +2,14 @@ import gymnasium as gym
 from gymnasium import spaces
 import networkx as nx
 import numpy as np
-import os
-from stable_baselines3 import PPO
+from moduls.env_compiler import compile_kitchen, optimal_return, policy_return
+from moduls.vec_env import VecKitchenEnv
+from moduls.tabular import make_model, load_model, model_exists
 
 class KitchenEnv(gym.Env):
     metadata = {"render_modes": ["human"]}
+    # Сюда TrajectoryRecorder собирает переходы: индекс состояния и действие подряд
+    trace = None
 
     def __init__(self):
         super().__init__()
@@ -30,6 +33,15 @@ class KitchenEnv(gym.Env):
         self.ACTION_TAKE, self.ACTION_COOK, self.ACTION_WASH = 3, 4, 5
         self.action_space = spaces.Discrete(6)
 
+        # Рецепт: взять на столе -> пожарить на плите -> помыть в мойке
+        stages = [
+            {"step": 0, "action": self.ACTION_TAKE, "node": self.STOL, "reward": 15, "take": True},
+            {"step": 1, "action": self.ACTION_COOK, "node": self.PLITA, "reward": 15, "needs_item": True},
+            {"step": 2, "action": self.ACTION_WASH, "node": self.MOYKA, "reward": 50, "needs_item": True, "done": True},
+        ]
+        self.tables = compile_kitchen(self.graph, self.num_nodes, self.max_recipe_steps,
+                                      self.action_space.n, stages, wall_penalty=2, fail_penalty=1)
+
         self.max_steps = 50
         self.reset()
 
@@ -44,40 +56,18 @@ class KitchenEnv(gym.Env):
     def step(self, action):
         # Исправление ошибки unhashable type (numpy to int)
         action = int(np.asarray(action).item())
-        
         self.current_step += 1
-        reward = -0.1
-        terminated = False
-        truncated = False
-
-        # Движение
-        if action < self.num_nodes:
-            if action == self.current_node:
-                reward -= 0.1
-            elif self.graph.has_edge(self.current_node, action):
-                reward -= self.graph[self.current_node][action]["weight"]
-                self.current_node = action
-            else:
-                reward -= 2
-
-        # Действия
-        elif action == self.ACTION_TAKE:
-            if self.recipe_step == 0 and self.current_node == self.STOL:
-                self.has_item, self.recipe_step, reward = 1, 1, 15
-            else: reward -= 1
-
-        elif action == self.ACTION_COOK:
-            if self.recipe_step == 1 and self.current_node == self.PLITA and self.has_item == 1:
-                self.recipe_step, reward = 2, 15
-            else: reward -= 1
-
-        elif action == self.ACTION_WASH:
-            if self.recipe_step == 2 and self.current_node == self.MOYKA and self.has_item == 1:
-                self.recipe_step, reward, terminated = 3, 50, True
-            else: reward -= 1
-
-        if self.current_step >= self.max_steps:
-            truncated = True
+
+        s = self.tables.encode(self.current_node, self.recipe_step, self.has_item)
+        trace = self.trace
+        if trace is not None:
+            trace.append(s)
+            trace.append(action)
+        reward = self.tables.reward[s, action]
+        terminated = bool(self.tables.terminated[s, action])
+        self.current_node, self.recipe_step, self.has_item = (int(v) for v in self.tables.obs[self.tables.next_state[s, action]])
+
+        truncated = self.current_step >= self.max_steps
 
         return self._get_obs(), reward, terminated, truncated, {}
 
@@ -95,14 +85,17 @@ MODEL_PATH = "kitchen_model"
 
 if __name__ == "__main__":
     env = KitchenEnv()
+    # Обучаем сразу на пачке кухонь, демонстрация — на обычной среде
+    train_env = VecKitchenEnv(KitchenEnv, n_envs=8)
 
     # Проверяем, есть ли уже сохраненный агент
-    if os.path.exists(MODEL_PATH + ".zip"):
+    if model_exists(MODEL_PATH):
         print(f"--- Найдена сохраненная модель '{MODEL_PATH}'. Загружаем и продолжаем обучение... ---")
-        model = PPO.load(MODEL_PATH, env=env)
+        model = load_model(MODEL_PATH, env=train_env)
     else:
         print("--- Сохраненной модели нет. Начинаем обучение с нуля... ---")
-        model = PPO("MlpPolicy", env, verbose=1, learning_rate=1e-3)
+        # Кухня маленькая — Q-таблица, на большой make_model сам возьмет PPO
+        model = make_model(train_env, learning_rate=1e-3)
 
     # Обучаем (можно запускать этот скрипт много раз, он будет развиваться)
     print("Обучение...")
@@ -110,7 +103,7 @@ if __name__ == "__main__":
     
     # СОХРАНЯЕМ прогресс
     model.save(MODEL_PATH)
-    print(f"--- Модель сохранена в '{MODEL_PATH}.zip' ---")
+    print(f"--- Модель сохранена в '{MODEL_PATH}' ---")
 
     # Демонстрация
     print("\n--- Тест текущего навыка агента ---")
@@ -120,4 +113,10 @@ if __name__ == "__main__":
         action, _ = model.predict(obs, deterministic=True)
         obs, reward, term, trunc, _ = env.step(action)
         env.render()
-        done = term or trunc
\ No newline at end of file
+        done = term or trunc
+
+    # Сравнение с оптимальной политикой (точный расчёт по таблицам)
+    start = env.tables.encode(*env.reset()[0])
+    best = optimal_return(env.tables, start, env.max_steps)
+    agent = policy_return(env.tables, lambda o: model.predict(o, deterministic=True)[0], start, env.max_steps)
+    print(f"Оптимум: {best:.1f} | Агент: {agent:.1f}")
\ No newline at end of file
@@ -0,0 +1,133 @@
+import numpy as np
+import pygame
+
+from moduls.grid_env import station_access
+from moduls.kitchen_map import bfs_grid
+
+# Сосед клетки -> куда смотреть, чтобы видеть его
+DIRECTIONS = {(0, -1): "up", (0, 1): "down", (-1, 0): "left", (1, 0): "right"}
+
+
+class AIChef:
+    """
+    Повар под управлением модели в настоящей игре.
+    Модель обучена на графе станций (GridKitchenEnv / RandomKitchenEnv):
+    действие "идти к узлу" превращается в шаги по тайлам, "взаимодействие" —
+    в нажатие E (F для печи). policy — что угодно с predict(obs), обычно PolicyServer.
+    num_actions — размер пространства действий модели (если узлы дополнены до общего числа).
+    Заказ или карта не из списков модели не подменяются: повар останавливается,
+    а причина остается в stopped (игра показывает ее и выключает повара).
+    """
+
+    def __init__(self, sim, policy, orders=None, maps=None, num_actions=None, step_ms=150):
+        self.sim = sim
+        self.policy = policy
+        self.num_actions = num_actions
+        # Списки заказов и карт, на которых училась RandomKitchenEnv (номера идут в наблюдение)
+        self.orders = orders
+        self.maps = maps
+        self.step_ms = step_ms
+        self.map_name = None
+        self.stopped = None
+
+    def reset(self):
+        level = self.sim.level
+        self.map_name = level.map_name
+        # Узлы в том же порядке, что и в MapLayout: точка появления, потом станции
+        player = self.sim.player
+        stations = station_access(level, (player.cell_x, player.cell_y))
+        self.names = ["player"] + [name for name, _, _ in stations]
+        self.objects = [None] + [i for _, i, _ in stations]
+        self.access = [[(player.cell_y, player.cell_x)]] + [cells for _, _, cells in stations]
+        self.ACTION_INTERACT = (self.num_actions or len(self.access) + 1) - 1
+        self.node = 0
+        self.recipe_step = 0
+        self.target = None
+        self.field = None
+        self.next_time = 0
+
+    @property
+    def walkable(self):
+        # Карта может меняться на ходу (LiveLayout), поэтому стены читаем каждый раз
+        return ~self.sim.level.blocked
+
+    def unsupported(self):
+        """Почему модель не может вести текущий заказ на текущей карте (None — может)"""
+        if self.orders is None:
+            return None
+        order = self.sim.kitchen.current_order
+        if order not in self.orders:
+            return f"Модель не обучена на заказе {order}"
+        if self.sim.level.map_name not in self.maps:
+            return f"Модель не обучена на карте {self.sim.level.map_name}"
+        return None
+
+    def _obs(self):
+        obs = [self.node, self.recipe_step, int(self.sim.player.held_item is not None)]
+        if self.orders is not None:
+            reason = self.unsupported()
+            if reason:
+                raise ValueError(reason)
+            obs.append(self.orders.index(self.sim.kitchen.current_order))
+            obs.append(self.maps.index(self.map_name))
+        return np.array(obs, dtype=np.int32)
+
+    def _walk(self):
+        """Один шаг вниз по полю расстояний до цели; False — уже пришли"""
+        player = self.sim.player
+        here = self.field[player.cell_y, player.cell_x] if self.walkable[player.cell_y, player.cell_x] else -1
+        if here == 0:
+            return False
+        best, step = here if here > 0 else np.inf, None
+        for dx, dy in DIRECTIONS:
+            x, y = player.cell_x + dx, player.cell_y + dy
+            if self.sim.level._in_grid(x, y) and 0 <= self.field[y, x] < best:
+                best, step = self.field[y, x], (dx, dy)
+        if step is None:
+            return False
+        self.sim.move(*step)
+        return True
+
+    def _face_station(self):
+        player, obj = self.sim.player, self.objects[self.node]
+        for (dx, dy), facing in DIRECTIONS.items():
+            x, y = player.cell_x + dx, player.cell_y + dy
+            if self.sim.level._in_grid(x, y) and self.sim.level.object_grid[y, x] == obj:
+                player.facing = facing
+                return
+
+    def _interact(self):
+        player = self.sim.player
+        before = (player.held_item, player.held_item and player.held_item.state)
+        key = pygame.K_f if self.names[self.node] == "oven" else pygame.K_e
+        self.sim.interact(key)
+        held = player.held_item
+        if held is None:
+            self.recipe_step = 0
+        elif (held, held.state) != before:
+            self.recipe_step += 1
+
+    def update(self, now):
+        """Вызывается каждый кадр; действует не чаще раза в step_ms"""
+        if self.stopped:
+            return
+        if self.sim.level.map_name != self.map_name:
+            self.reset()
+        self.stopped = self.unsupported()
+        if self.stopped or self.sim.is_frozen() or now < self.next_time:
+            return
+        self.next_time = now + self.step_ms
+
+        if self.field is not None:
+            if self._walk():
+                return
+            self.node, self.field = self.target, None
+            self._face_station()
+
+        action = int(np.asarray(self.policy.predict(self._obs())).item())
+        if action < len(self.access):
+            if action != self.node:
+                self.target = action
+                self.field = bfs_grid(self.walkable, self.access[action])
+        elif action == self.ACTION_INTERACT:
+            self._interact()
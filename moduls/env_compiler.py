@@ -0,0 +1,215 @@
+import numpy as np
+import networkx as nx
+
+
+def encode_state(node, recipe_step, has_item, num_steps):
+    """
+    Кодируем (позиция, этап, предмет) в один индекс состояния
+    """
+    return (node * num_steps + recipe_step) * 2 + has_item
+
+
+class KitchenTables:
+    """
+    Скомпилированная кухня: next_state[s, a], reward[s, a], terminated[s, a]
+    """
+
+    def __init__(self, next_state, reward, terminated, num_nodes, num_steps, stages=None):
+        self.next_state = next_state
+        self.reward = reward
+        self.terminated = terminated
+        self.num_nodes = num_nodes
+        self.num_steps = num_steps
+        # Этапы рецепта, из которых собраны таблицы (нужны планировщику)
+        self.stages = stages
+        # Штрафы ходов, с которыми собраны таблицы (нужны update_moves)
+        self.move_costs = None
+        # Кого предупредить до того, как update_moves перепишет таблицы (запись траекторий)
+        self.listeners = []
+
+        # Декодирование индекса состояния обратно в наблюдение
+        states = np.arange(next_state.shape[0])
+        self.obs = np.stack([
+            states // (num_steps * 2),
+            (states // 2) % num_steps,
+            states % 2,
+        ], axis=1).astype(np.int32)
+
+    @property
+    def num_states(self):
+        return self.next_state.shape[0]
+
+    @property
+    def num_actions(self):
+        return self.next_state.shape[1]
+
+    def encode(self, node, recipe_step, has_item):
+        return encode_state(node, recipe_step, has_item, self.num_steps)
+
+
+def edge_weight_matrix(graph, num_nodes):
+    """
+    Плотная матрица весов рёбер, NaN — ребра нет
+    """
+    return nx.to_numpy_array(graph, nodelist=range(num_nodes), nonedge=np.nan, weight="weight")
+
+
+def compile_kitchen(graph, num_nodes, max_recipe_steps, num_actions, stages,
+                    step_cost=0.1, stay_penalty=0.1, wall_penalty=2, fail_penalty=1):
+    """
+    Превращаем граф кухни и рецепт в плотные таблицы переходов.
+
+    Действия 0..num_nodes-1 — движение к узлу, остальные — взаимодействия.
+    Каждый этап рецепта — словарь:
+        step       — на каком этапе рецепта срабатывает
+        action     — каким действием
+        node       — в каком узле (или список узлов)
+        reward     — итоговая награда за шаг
+        take       — после этапа в руках предмет
+        needs_item — этап требует предмет в руках
+        done       — этап завершает эпизод
+    """
+    num_steps = max_recipe_steps + 1
+    num_states = num_nodes * num_steps * 2
+
+    states = np.arange(num_states)
+    next_state = np.repeat(states[:, None], num_actions, axis=1)
+    reward = np.empty((num_states, num_actions), dtype=np.float64)
+    terminated = np.zeros((num_states, num_actions), dtype=bool)
+
+    # --- ДВИЖЕНИЕ ---
+    weights = edge_weight_matrix(graph, num_nodes)
+    move_costs = {"step_cost": step_cost, "stay_penalty": stay_penalty, "wall_penalty": wall_penalty}
+    for a in range(num_nodes):
+        _fill_moves(next_state, reward, weights, a, states, num_steps, **move_costs)
+
+    # --- ВЗАИМОДЕЙСТВИЕ ---
+    reward[:, num_nodes:] = -step_cost - fail_penalty
+    _fill_stages(next_state, reward, terminated, stages, states, num_steps)
+
+    tables = KitchenTables(next_state, reward, terminated, num_nodes, num_steps, stages)
+    tables.move_costs = move_costs
+    return tables
+
+
+def _fill_stages(next_state, reward, terminated, stages, states, num_steps):
+    """Этапы рецепта; node этапа — один узел или список узлов, где он выполняется"""
+    node_s = states // (num_steps * 2)
+    step_s = (states // 2) % num_steps
+    item_s = states % 2
+    for stage in stages:
+        mask = (step_s == stage["step"]) & np.isin(node_s, stage["node"])
+        if stage.get("needs_item"):
+            mask &= item_s == 1
+        item = 1 if stage.get("take") else item_s[mask]
+        a = stage["action"]
+        next_state[mask, a] = encode_state(node_s[mask], stage["step"] + 1, item, num_steps)
+        reward[mask, a] = stage["reward"]
+        terminated[mask, a] = stage.get("done", False)
+
+
+# Шаги по тайлам: вверх, вниз, влево, вправо
+TILE_MOVES = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def compile_tile_kitchen(walkable, num_nodes, max_recipe_steps, stages, move_cost=0.1, bump_penalty=0.1,
+                         fail_penalty=1):
+    """
+    Таблицы для движения по тайлам карты (без макро-действий).
+    Узел — тайл y * ширина + x (лишние узлы после h * w — вне карты, оттуда не уйти).
+    Действия 0-3 — шаг по TILE_MOVES, 4 — взаимодействие; node этапа — список тайлов,
+    стоя на которых повар достает до станции. Шаг стоит move_cost, удар в стену — еще bump_penalty.
+    """
+    height, width = walkable.shape
+    num_steps = max_recipe_steps + 1
+    num_states = num_nodes * num_steps * 2
+    num_actions = len(TILE_MOVES) + 1
+
+    states = np.arange(num_states)
+    node_s = states // (num_steps * 2)
+    step_s = (states // 2) % num_steps
+    item_s = states % 2
+    y, x = node_s // width, node_s % width
+    on_map = node_s < height * width
+
+    next_state = np.repeat(states[:, None], num_actions, axis=1)
+    reward = np.empty((num_states, num_actions), dtype=np.float64)
+    terminated = np.zeros((num_states, num_actions), dtype=bool)
+
+    for a, (dy, dx) in enumerate(TILE_MOVES):
+        ny, nx = y + dy, x + dx
+        ok = on_map & (ny >= 0) & (ny < height) & (nx >= 0) & (nx < width)
+        ok[ok] = walkable[ny[ok], nx[ok]]
+        reward[:, a] = np.where(ok, -move_cost, -move_cost - bump_penalty)
+        next_state[ok, a] = encode_state(ny[ok] * width + nx[ok], step_s[ok], item_s[ok], num_steps)
+
+    reward[:, -1] = -move_cost - fail_penalty
+    _fill_stages(next_state, reward, terminated, stages, states, num_steps)
+    return KitchenTables(next_state, reward, terminated, num_nodes, num_steps, stages)
+
+
+def _fill_moves(next_state, reward, weights, a, states, num_steps, step_cost, stay_penalty, wall_penalty):
+    """Столбец действия "идти к узлу a" для состояний states"""
+    node_s = states // (num_steps * 2)
+    w = weights[node_s, a]
+    stay = node_s == a
+    edge = ~np.isnan(w) & ~stay
+    reward[states, a] = np.where(stay, -step_cost - stay_penalty,
+                                 np.where(edge, -step_cost - np.nan_to_num(w), -step_cost - wall_penalty))
+    next_state[states, a] = np.where(edge, encode_state(a, (states // 2) % num_steps, states % 2, num_steps), states)
+
+
+def update_moves(tables, graph, nodes):
+    """
+    Граф поменялся только у ребер узлов nodes: переписываем столбцы ходов
+    к этим узлам и строки состояний в них, остальные таблицы не трогаем
+    """
+    for listener in tables.listeners:
+        listener()
+    nodes = np.asarray(sorted(nodes), dtype=np.int64)
+    weights = edge_weight_matrix(graph, tables.num_nodes)
+    states = np.arange(tables.num_states)
+    rows = states[np.isin(tables.obs[:, 0], nodes)]
+    for a in range(tables.num_nodes):
+        _fill_moves(tables.next_state, tables.reward, weights, a, states if a in nodes else rows,
+                    tables.num_steps, **tables.move_costs)
+
+
+def value_iteration(tables, horizon):
+    """
+    Точное динамическое программирование по шагам эпизода.
+    Возвращает V[h, s] — лучший возврат за h оставшихся шагов
+    и policy[h, s] — оптимальное действие.
+    """
+    values = np.zeros((horizon + 1, tables.num_states))
+    policy = np.zeros((horizon + 1, tables.num_states), dtype=np.int64)
+    alive = ~tables.terminated
+
+    for h in range(1, horizon + 1):
+        q = tables.reward + alive * values[h - 1][tables.next_state]
+        policy[h] = q.argmax(axis=1)
+        values[h] = q.max(axis=1)
+
+    return values, policy
+
+
+def optimal_return(tables, start_state, horizon):
+    """
+    Эталонный оптимальный возврат из стартового состояния
+    """
+    values, _ = value_iteration(tables, horizon)
+    return values[horizon, start_state]
+
+
+def policy_return(tables, policy, start_state, horizon):
+    """
+    Возврат детерминированной политики (функция obs -> действие) по таблицам
+    """
+    s, total = start_state, 0.0
+    for _ in range(horizon):
+        a = int(np.asarray(policy(tables.obs[s])).item())
+        total += tables.reward[s, a]
+        if tables.terminated[s, a]:
+            break
+        s = tables.next_state[s, a]
+    return total
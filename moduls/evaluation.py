@@ -0,0 +1,273 @@
+import json
+import os
+import zlib
+import multiprocessing as mp
+import numpy as np
+import networkx as nx
+from stable_baselines3 import PPO
+from stable_baselines3.common.utils import set_random_seed
+
+from moduls.grid_env import GridKitchenEnv, load_layout, ENGINE, GAME_DIR
+from moduls.env_compiler import optimal_return
+from moduls.planner import expert_actions
+
+
+def all_maps():
+    """Все карты из game/maps"""
+    return sorted(f[:-4] for f in os.listdir(os.path.join(GAME_DIR, "maps")) if f.endswith(".tmx"))
+
+
+def all_orders():
+    """Все заказы движка рецептов: картошка и блюда из moduls/recipes.py"""
+    return list(ENGINE.orders)
+
+
+def model_spaces(model):
+    """Размеры, до которых дополнены пространства модели, и есть ли в наблюдении номера заказа и карты"""
+    nvec = model.observation_space.nvec
+    return {"num_nodes": int(model.action_space.n) - 1, "max_recipe_steps": int(nvec[1]) - 1,
+            "ids": len(nvec) == 5}
+
+
+def make_cell_env(map_name, order, spaces, train_maps=(), train_orders=()):
+    """
+    Среда клетки (карта, заказ) в пространствах модели. None — модель
+    не может играть на этой карте (больше узлов или этапов, чем при обучении)
+    или видит номера заказа и карты, а этих заказа или карты не было в обучении
+    """
+    if spaces["ids"] and (map_name not in train_maps or order not in train_orders):
+        return None
+    if len(load_layout(map_name).names) > spaces["num_nodes"]:
+        return None
+    if len(ENGINE.station_chain(order)) > spaces["max_recipe_steps"]:
+        return None
+    return GridKitchenEnv(map_name, order, num_nodes=spaces["num_nodes"],
+                          max_recipe_steps=spaces["max_recipe_steps"])
+
+
+def optimum(env):
+    """Длина и возврат оптимального маршрута; None — заказ на этой карте не выполнить"""
+    env.reset()
+    try:
+        steps = len(expert_actions(env))
+    except ValueError:
+        return None
+    start = env.tables.encode(0, 0, 0)
+    return {"steps": steps, "return": float(optimal_return(env.tables, start, env.max_steps))}
+
+
+# --- Воркер пула: модель грузится один раз на процесс ---
+_worker = {}
+
+
+def _init_worker(model_path, deterministic, train_maps, train_orders):
+    import torch
+    # Параллелизм — процессами, потоки torch только мешают друг другу
+    torch.set_num_threads(1)
+    model = PPO.load(model_path, device="cpu")
+    _worker.update(model=model, spaces=model_spaces(model), deterministic=deterministic,
+                   maps=list(train_maps), orders=list(train_orders), cells={})
+
+
+def _cell(map_name, order):
+    cells = _worker["cells"]
+    if (map_name, order) not in cells:
+        maps, orders = _worker["maps"], _worker["orders"]
+        env = make_cell_env(map_name, order, _worker["spaces"], maps, orders)
+        # Матрица смежности: ход без ребра (или на месте) — потраченное действие
+        adjacency = nx.to_numpy_array(env.graph, nodelist=range(env.num_nodes), weight=None) > 0
+        # Номера есть только у клеток из обучения, остальные sweep помечает unsupported
+        ids = [orders.index(order), maps.index(map_name)] if _worker["spaces"]["ids"] else [0, 0]
+        cells[(map_name, order)] = (env, adjacency, np.array(ids, dtype=np.int32))
+    return cells[(map_name, order)]
+
+
+def run_chunk(task):
+    """
+    Пачка эпизодов одной клетки: все эпизоды идут в ногу по таблицам среды,
+    модель спрашивается один раз за шаг на всю пачку
+    """
+    map_name, order, chunk, seed, episodes = task
+    env, adjacency, ids = _cell(map_name, order)
+    model, tables = _worker["model"], env.tables
+    set_random_seed(seed)
+
+    state = np.full(episodes, tables.encode(0, 0, 0), dtype=np.int64)
+    alive = np.ones(episodes, dtype=bool)
+    success = np.zeros(episodes, dtype=bool)
+    steps = np.zeros(episodes, dtype=np.int64)
+    wasted = np.zeros(episodes, dtype=np.int64)
+    returns = np.zeros(episodes)
+
+    for _ in range(env.max_steps):
+        idx = np.flatnonzero(alive)
+        if not idx.size:
+            break
+        s = state[idx]
+        obs = tables.obs[s]
+        if _worker["spaces"]["ids"]:
+            obs = np.hstack([obs, np.broadcast_to(ids, (len(idx), 2))])
+        actions, _ = model.predict(obs, deterministic=_worker["deterministic"])
+        actions = np.asarray(actions, dtype=np.int64).reshape(len(idx))
+
+        move = actions < env.num_nodes
+        wasted[idx[move]] += ~adjacency[tables.obs[s[move], 0], actions[move]]
+        returns[idx] += tables.reward[s, actions]
+        done = tables.terminated[s, actions]
+        state[idx] = tables.next_state[s, actions]
+        steps[idx] += 1
+        success[idx[done]] = True
+        alive[idx[done]] = False
+
+    return {"map": map_name, "order": order, "chunk": chunk, "seed": seed,
+            "success": success.astype(int).tolist(), "steps": steps.tolist(),
+            "wasted": wasted.tolist(), "returns": returns.round(4).tolist()}
+
+
+# --- Прогон с продолжением ---
+def load_results(path, config):
+    """Уже посчитанные пачки из файла результатов (JSONL, первая строка — настройки прогона)"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    if not lines:
+        return done
+    saved = json.loads(lines[0])
+    if saved != config:
+        raise ValueError(f"{path} посчитан с другими настройками: {saved}")
+    for line in lines[1:]:
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            # Строка, оборванная при падении, — пересчитаем эту пачку
+            continue
+        done[(row["map"], row["order"], row["chunk"])] = row
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def sweep(model_path, results_path, maps, orders, episodes=100, chunk=25, seed=0, workers=None,
+          deterministic=False, train_maps=(), train_orders=(), log=print):
+    """
+    Разбиваем клетки (карта, заказ) на пачки по chunk эпизодов и раздаем пулу.
+    Каждая готовая пачка сразу дописывается в results_path, поэтому
+    прерванный прогон продолжается с того же места. Возвращает (клетки, пачки).
+    """
+    model = PPO.load(model_path, device="cpu")
+    spaces = model_spaces(model)
+    config = {"model": os.path.abspath(model_path), "episodes": episodes, "chunk": chunk, "seed": seed,
+              "deterministic": deterministic, "train_maps": list(train_maps), "train_orders": list(train_orders)}
+    done = load_results(results_path, config)
+
+    cells, tasks = [], []
+    for map_name in maps:
+        for order in orders:
+            env = make_cell_env(map_name, order, spaces, train_maps, train_orders)
+            best = optimum(env) if env is not None else None
+            status = "unsupported" if env is None else "impossible" if best is None else "ok"
+            cells.append({"map": map_name, "order": order, "status": status, "optimal": best})
+            if status != "ok":
+                continue
+            for k, start in enumerate(range(0, episodes, chunk)):
+                if (map_name, order, k) not in done:
+                    # Сид пачки зависит только от клетки и номера пачки, не от порядка выполнения
+                    chunk_seed = (seed * 1000003 + zlib.crc32(f"{map_name}/{order}".encode()) + k) % 2 ** 32
+                    tasks.append((map_name, order, k, chunk_seed, min(chunk, episodes - start)))
+
+    log(f"Клеток: {len(cells)}, пачек к расчету: {len(tasks)}, уже готово: {len(done)}")
+    if tasks:
+        new = not done and not (os.path.exists(results_path) and os.path.getsize(results_path))
+        with open(results_path, "w" if new else "a", encoding="utf-8") as out:
+            if new:
+                out.write(json.dumps(config) + "\n")
+            elif not _ends_with_newline(results_path):
+                out.write("\n")
+            with mp.Pool(workers, _init_worker, (model_path, deterministic, train_maps, train_orders)) as pool:
+                for i, row in enumerate(pool.imap_unordered(run_chunk, tasks), 1):
+                    out.write(json.dumps(row) + "\n")
+                    out.flush()
+                    done[(row["map"], row["order"], row["chunk"])] = row
+                    if i % 50 == 0 or i == len(tasks):
+                        log(f"  пачек: {i}/{len(tasks)}")
+    return cells, done
+
+
+# --- Отчет ---
+def summarize(rows, optimal=None):
+    success = np.concatenate([r["success"] for r in rows]).astype(bool)
+    steps = np.concatenate([r["steps"] for r in rows])
+    wasted = np.concatenate([r["wasted"] for r in rows])
+    returns = np.concatenate([r["returns"] for r in rows])
+    solved = steps[success]
+    summary = {
+        "episodes": int(success.size),
+        "success_rate": float(success.mean()),
+        "steps_mean": float(solved.mean()) if solved.size else None,
+        "steps_p50": float(np.percentile(solved, 50)) if solved.size else None,
+        "steps_p95": float(np.percentile(solved, 95)) if solved.size else None,
+        "wasted_moves_mean": float(wasted.mean()),
+    }
+    if optimal is not None:
+        summary["optimal_steps"] = optimal["steps"]
+        summary["step_gap_mean"] = float(solved.mean() - optimal["steps"]) if solved.size else None
+        summary["return_gap_mean"] = float(optimal["return"] - returns.mean())
+    return summary
+
+
+def build_report(cells, done):
+    """Сводка по клеткам, по картам, по заказам и общая"""
+    by_cell = {}
+    for row in done.values():
+        by_cell.setdefault((row["map"], row["order"]), []).append(row)
+
+    report = {"cells": [], "maps": {}, "orders": {}, "skipped": []}
+    by_map, by_order, gaps, everything = {}, {}, [], []
+    for cell in cells:
+        key = (cell["map"], cell["order"])
+        if cell["status"] != "ok" or key not in by_cell:
+            report["skipped"].append({"map": cell["map"], "order": cell["order"], "status": cell["status"]})
+            continue
+        rows = sorted(by_cell[key], key=lambda r: r["chunk"])
+        summary = summarize(rows, cell["optimal"])
+        report["cells"].append({"map": cell["map"], "order": cell["order"], **summary})
+        by_map.setdefault(cell["map"], []).extend(rows)
+        by_order.setdefault(cell["order"], []).extend(rows)
+        everything.extend(rows)
+        if summary["step_gap_mean"] is not None:
+            gaps.append(summary["step_gap_mean"])
+
+    report["maps"] = {name: summarize(rows) for name, rows in by_map.items()}
+    report["orders"] = {name: summarize(rows) for name, rows in by_order.items()}
+    if everything:
+        report["total"] = summarize(everything)
+        report["total"]["step_gap_mean"] = float(np.mean(gaps)) if gaps else None
+    return report
+
+
+def print_report(report):
+    def fmt(v):
+        return "—" if v is None else f"{v:.1f}"
+
+    print(f"{'карта':<8} {'заказ':<24} {'успех':>6} {'шаги':>6} {'p50':>6} {'p95':>6} "
+          f"{'опт.':>5} {'зазор':>6} {'мимо':>6}")
+    for c in report["cells"]:
+        print(f"{c['map']:<8} {c['order'][:24]:<24} {c['success_rate']:>6.0%} {fmt(c['steps_mean']):>6} "
+              f"{fmt(c['steps_p50']):>6} {fmt(c['steps_p95']):>6} {c['optimal_steps']:>5} "
+              f"{fmt(c['step_gap_mean']):>6} {c['wasted_moves_mean']:>6.2f}")
+    for name, s in report["maps"].items():
+        print(f"Карта {name}: успех {s['success_rate']:.1%}, шагов {fmt(s['steps_mean'])}, "
+              f"мимо ребер {s['wasted_moves_mean']:.2f}")
+    if report["skipped"]:
+        print(f"Пропущено клеток: {len(report['skipped'])} (невыполнимы на карте, не по размеру модели или ее заказ/карта не из обучения)")
+    if "total" in report:
+        t = report["total"]
+        print(f"Всего: {t['episodes']} эпизодов | успех {t['success_rate']:.1%} | шаги {fmt(t['steps_mean'])} "
+              f"(p50 {fmt(t['steps_p50'])}, p95 {fmt(t['steps_p95'])}) | зазор до оптимума {fmt(t['step_gap_mean'])} | "
+              f"мимо ребер {t['wasted_moves_mean']:.2f}")
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Модули игры импортируют друг друга как скрипты из папки game
+GAME_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "game")
+
+
+def use_game_modules():
+    """Добавляет папку game в sys.path; вызывать перед импортом sim, orders и т.п."""
+    if GAME_DIR not in sys.path:
+        sys.path.insert(0, GAME_DIR)
+    return GAME_DIR
@@ -0,0 +1,410 @@
+import os
+import functools
+import gymnasium as gym
+from gymnasium import spaces
+import networkx as nx
+import numpy as np
+
+from moduls.env_compiler import compile_kitchen, compile_tile_kitchen, update_moves, TILE_MOVES
+from moduls.kitchen_map import bfs_grid, DistanceFields, fields_to_matrix
+from moduls.game_path import GAME_DIR, use_game_modules
+
+use_game_modules()
+from sim import SimLevel
+from entities import Player
+from recipes import ENGINE
+from map_cache import map_cache
+
+STATION_NAMES = ["fridge", "sink", "table", "gas-stove", "oven", "order"]
+
+
+def station_access(level, spawn):
+    """
+    Станции карты по порядку объектов: (имя, номер объекта, клетки (y, x),
+    стоя на которых повар смотрит на станцию). Берем только клетки, куда можно
+    дойти от точки появления (x, y): стойка может делить кухню на части.
+    """
+    walkable = ~level.blocked & (bfs_grid(~level.blocked, [(spawn[1], spawn[0])]) >= 0)
+    stations = []
+    for i, obj in enumerate(level.interactive_objects):
+        if obj["name"] not in STATION_NAMES:
+            continue
+        # Объект, перекрытый другим (дубликат), не владеет ни одним тайлом
+        owned = level.object_grid == i
+        if not owned.any():
+            continue
+        near = np.zeros_like(owned)
+        near[1:, :] |= owned[:-1, :]
+        near[:-1, :] |= owned[1:, :]
+        near[:, 1:] |= owned[:, :-1]
+        near[:, :-1] |= owned[:, 1:]
+        stations.append((obj["name"], i, [tuple(c) for c in np.argwhere(near & walkable)]))
+    return stations
+
+
+class MapLayout:
+    """
+    Станции карты и расстояния между ними в тайлах.
+    Узел 0 — точка появления повара, дальше станции в порядке объектов карты.
+    """
+
+    def __init__(self, names, distances, map_size):
+        self.names = names
+        self.distances = distances
+        self.map_size = map_size
+
+    @classmethod
+    def build(cls, level, spawn):
+        walkable = ~level.blocked
+        height, width = walkable.shape
+
+        stations = station_access(level, spawn)
+        names = ["player"] + [name for name, _, _ in stations]
+        starts = [[(spawn[1], spawn[0])]] + [cells for _, _, cells in stations]
+
+        count = len(names)
+        distances = np.full((count, count), -1, dtype=np.int32)
+        for i in range(count):
+            if not starts[i]:
+                continue
+            dist = bfs_grid(walkable, starts[i])
+            for j in range(count):
+                if starts[j]:
+                    near = dist[tuple(np.array(starts[j]).T)]
+                    near = near[near >= 0]
+                    if near.size:
+                        distances[i, j] = near.min()
+        # Точка появления может стоять на занятой клетке: путь туда берем обратным
+        distances = np.maximum(distances, distances.T)
+
+        return cls(names, distances, (width, height))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_layout(map_name, mtime):
+    level = SimLevel()
+    path = level.map_path(map_name)
+    cached = map_cache.load(path, "layout")
+    if cached is not None:
+        arrays, meta = cached
+        return MapLayout(meta["names"], np.array(arrays["distances"]), tuple(meta["map_size"]))
+
+    player = Player()
+    if not level.load_map(map_name, player):
+        raise ValueError(f"Карта не загружена: {map_name}")
+    layout = MapLayout.build(level, (player.cell_x, player.cell_y))
+    map_cache.save(path, "layout", {"distances": layout.distances},
+                   {"names": layout.names, "map_size": layout.map_size})
+    return layout
+
+
+def load_layout(map_name):
+    """
+    Разбор карты и расстояния кешируются в процессе (по mtime файла)
+    и на диске (по хешу содержимого, общий кеш для всех воркеров)
+    """
+    path = SimLevel().map_path(map_name)
+    return _load_layout(map_name, os.path.getmtime(path))
+
+
+class LiveLayout(MapLayout):
+    """
+    Раскладка, которую можно менять посреди эпизода: препятствие на тайле
+    (block_cell / unblock_cell) и перенос станции (move_station).
+    Держит поле BFS от каждого узла и чинит его локально, матрица расстояний
+    собирается из полей. Уровень получает свои копии сеток (кешированные
+    раскладки и mmap-массивы других сред не трогаются).
+    Каждая правка возвращает узлы, у которых поменялись расстояния, —
+    их отдают в GridKitchenEnv.update_layout.
+    """
+
+    def __init__(self, level, spawn):
+        self.level = level
+        self.spawn = spawn
+        level._writable()
+        stations = station_access(level, spawn)
+        self.objects = [None] + [i for _, i, _ in stations]
+        self.near = [None] + [self._near(i) for i in self.objects[1:]]
+        self.fields = DistanceFields(~level.blocked, [[(spawn[1], spawn[0])]] + [cells for _, _, cells in stations])
+        self.version = 0
+        super().__init__(["player"] + [name for name, _, _ in stations], self._distances(), level.map_size)
+
+    @classmethod
+    def load(cls, map_name):
+        level = SimLevel()
+        player = Player()
+        if not level.load_map(map_name, player):
+            raise ValueError(f"Карта не загружена: {map_name}")
+        return cls(level, (player.cell_x, player.cell_y))
+
+    def _near(self, obj):
+        """Клетки рядом со станцией (без учета проходимости)"""
+        owned = self.level.object_grid == obj
+        near = np.zeros_like(owned)
+        near[1:, :] |= owned[:-1, :]
+        near[:-1, :] |= owned[1:, :]
+        near[:, 1:] |= owned[:, :-1]
+        near[:, :-1] |= owned[:, 1:]
+        return near
+
+    def _distances(self):
+        targets = [tuple(np.array(cells, dtype=np.int64).reshape(-1, 2).T) for cells in self.fields.sources]
+        distances = fields_to_matrix(self.fields.fields, targets)
+        # Станция без клеток подхода недостижима даже из самой себя, как в MapLayout
+        for k, cells in enumerate(self.fields.sources):
+            if not cells:
+                distances[k, k] = -1
+        # Точка появления может стоять на занятой клетке: путь туда берем обратным
+        return np.maximum(distances, distances.T)
+
+    def _sync_access(self):
+        """
+        Клетки подхода — только в части кухни, достижимой от точки появления
+        (как в station_access), поэтому после правки сверяем их с полем узла 0
+        и пересчитываем поля только тех станций, у которых они изменились
+        """
+        reach = self.fields.fields[0] >= 0
+        for k in range(1, len(self.objects)):
+            cells = [tuple(c) for c in np.argwhere(self.near[k] & self.fields.walkable & reach)]
+            if cells != self.fields.sources[k]:
+                self.fields.reseed(k, cells)
+
+    def _commit(self):
+        self._sync_access()
+        old, self.distances = self.distances, self._distances()
+        self.version += 1
+        return set(np.flatnonzero((old != self.distances).any(axis=1)).tolist())
+
+    def block_cell(self, x, y):
+        if not self.level.set_blocked(x, y, True):
+            return set()
+        self.fields.block((y, x))
+        return self._commit()
+
+    def unblock_cell(self, x, y):
+        if not self.level.set_blocked(x, y, False):
+            return set()
+        self.fields.unblock((y, x))
+        return self._commit()
+
+    def move_station(self, node, x, y):
+        """Станцию узла node ставим левым верхним углом на тайл (x, y)"""
+        freed, taken = self.level.move_object(self.objects[node], x, y)
+        for cell in taken:
+            self.fields.block(cell)
+        for cell in freed:
+            self.fields.unblock(cell)
+        # Станция могла накрыть чужие тайлы или открыть те, что были под ней
+        self.near = [None] + [self._near(i) for i in self.objects[1:]]
+        return self._commit() | {node}
+
+
+class GridKitchenEnv(gym.Env):
+    """
+    Макро-действия: действие — станция, куда идти (или взаимодействие),
+    весь путь по тайлам проходится за один шаг и списывается сразу.
+    Пошаговый режим на той же карте — TileKitchenEnv.
+    """
+    metadata = {"render_modes": ["human"]}
+    # Сюда TrajectoryRecorder собирает переходы: индекс состояния и действие подряд
+    trace = None
+
+    @staticmethod
+    def count_nodes(map_name):
+        return len(load_layout(map_name).names)
+
+    def __init__(self, map_name="map_1", order="fried", move_cost=0.1, num_nodes=None, max_recipe_steps=None,
+                 layout=None):
+        """
+        num_nodes и max_recipe_steps позволяют дополнить пространства до общего
+        размера, чтобы разные карты и рецепты можно было смешивать в одном VecEnv
+        (лишние узлы без ребер, туда не пройти).
+        layout — своя раскладка (LiveLayout), если кухня будет меняться на ходу
+        """
+        super().__init__()
+
+        self.map_name = map_name
+        self.order = order
+        self.move_cost = move_cost
+        self.layout = layout or load_layout(map_name)
+        self.names = self.layout.names
+        self.num_nodes = max(num_nodes or 0, len(self.names))
+
+        # Полный граф между станциями, вес — путь по тайлам
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(range(self.num_nodes))
+        self._set_edges(range(len(self.names)))
+
+        # Рецепт: станции из движка рецептов (картошка или любое из блюд) -> сдача заказа
+        self.chain = ENGINE.station_chain(order)
+        self.max_recipe_steps = max(max_recipe_steps or 0, len(self.chain))
+
+        self.observation_space = spaces.MultiDiscrete([
+            self.num_nodes,
+            self.max_recipe_steps + 1,
+            2
+        ])
+
+        # Действия: 0..num_nodes-1 (движение к станции), num_nodes (взаимодействие)
+        self.ACTION_INTERACT = self.num_nodes
+        self.action_space = spaces.Discrete(self.num_nodes + 1)
+
+        stages = []
+        for k, station in enumerate(self.chain):
+            last = k == len(self.chain) - 1
+            for node, name in enumerate(self.names):
+                if name == station:
+                    stages.append({"step": k, "action": self.ACTION_INTERACT, "node": node,
+                                   "reward": -0.1 + (50 if last else 10),
+                                   "take": k == 0, "done": last})
+        self.tables = compile_kitchen(self.graph, self.num_nodes, self.max_recipe_steps,
+                                      self.action_space.n, stages, wall_penalty=5, fail_penalty=2)
+
+        self.max_steps = 100
+        self.reset()
+
+    def _set_edges(self, nodes):
+        distances = self.layout.distances
+        for a in nodes:
+            for b in range(len(self.names)):
+                if a == b:
+                    continue
+                if distances[a, b] >= 0:
+                    self.graph.add_edge(a, b, weight=distances[a, b] * self.move_cost)
+                elif self.graph.has_edge(a, b):
+                    self.graph.remove_edge(a, b)
+
+    def update_layout(self, nodes):
+        """
+        Раскладка изменилась (LiveLayout): перестраиваем ребра узлов nodes
+        и только те строки и столбцы таблиц, что описывают ходы к ним и из них
+        """
+        if not nodes:
+            return
+        self._set_edges(nodes)
+        update_moves(self.tables, self.graph, nodes)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.current_node = 0
+        self.recipe_step = 0
+        self.has_item = 0
+        self.current_step = 0
+        return self._get_obs(), {}
+
+    def _get_obs(self):
+        return np.array([self.current_node, self.recipe_step, self.has_item], dtype=np.int32)
+
+    def step(self, action):
+        action = int(np.asarray(action).item())
+        self.current_step += 1
+
+        s = self.tables.encode(self.current_node, self.recipe_step, self.has_item)
+        trace = self.trace
+        if trace is not None:
+            trace.append(s)
+            trace.append(action)
+        reward = self.tables.reward[s, action]
+        terminated = bool(self.tables.terminated[s, action])
+        self.current_node, self.recipe_step, self.has_item = (int(v) for v in self.tables.obs[self.tables.next_state[s, action]])
+
+        truncated = self.current_step >= self.max_steps
+
+        return self._get_obs(), reward, terminated, truncated, {}
+
+    def render(self):
+        done = ", ".join(self.chain[:self.recipe_step]) or "—"
+        print(f"Шаг: {self.current_step} | {self.map_name} | {self.names[self.current_node]} #{self.current_node} | Сделано: {done}")
+
+
+class TileKitchenEnv(gym.Env):
+    """
+    Та же карта и тот же рецепт, что в GridKitchenEnv, но без макро-действий:
+    повар ходит по тайлам (действия 0-3 — TILE_MOVES) и взаимодействует (4),
+    стоя рядом со станцией. Наблюдение то же: [узел, этап, предмет],
+    только узел — тайл y * ширина + x. Эпизоды в разы длиннее.
+    """
+    metadata = {"render_modes": ["human"]}
+    # Сюда TrajectoryRecorder собирает переходы: индекс состояния и действие подряд
+    trace = None
+
+    @staticmethod
+    def count_nodes(map_name):
+        width, height = load_layout(map_name).map_size
+        return width * height
+
+    def __init__(self, map_name="map_1", order="fried", move_cost=0.1, num_nodes=None, max_recipe_steps=None,
+                 max_steps=1000):
+        super().__init__()
+        self.map_name = map_name
+        self.order = order
+
+        level, player = SimLevel(), Player()
+        if not level.load_map(map_name, player):
+            raise ValueError(f"Карта не загружена: {map_name}")
+        self.width, self.height = level.map_size
+        self.num_nodes = max(num_nodes or 0, self.width * self.height)
+        self.start_node = player.cell_y * self.width + player.cell_x
+        stations = station_access(level, (player.cell_x, player.cell_y))
+
+        self.chain = ENGINE.station_chain(order)
+        self.max_recipe_steps = max(max_recipe_steps or 0, len(self.chain))
+
+        self.observation_space = spaces.MultiDiscrete([
+            self.num_nodes,
+            self.max_recipe_steps + 1,
+            2
+        ])
+        self.ACTION_INTERACT = len(TILE_MOVES)
+        self.action_space = spaces.Discrete(len(TILE_MOVES) + 1)
+
+        # Этап выполняется на любой клетке подхода к станции нужного типа
+        stages = []
+        for k, station in enumerate(self.chain):
+            tiles = [y * self.width + x for name, _, cells in stations if name == station for y, x in cells]
+            if tiles:
+                last = k == len(self.chain) - 1
+                stages.append({"step": k, "action": self.ACTION_INTERACT, "node": tiles,
+                               "reward": -0.1 + (50 if last else 10), "take": k == 0, "done": last})
+        self.tables = compile_tile_kitchen(~level.blocked, self.num_nodes, self.max_recipe_steps, stages,
+                                           move_cost=move_cost, fail_penalty=2)
+
+        self.max_steps = max_steps
+        self.reset()
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.current_node = self.start_node
+        self.recipe_step = 0
+        self.has_item = 0
+        self.current_step = 0
+        return self._get_obs(), {}
+
+    def _get_obs(self):
+        return np.array([self.current_node, self.recipe_step, self.has_item], dtype=np.int32)
+
+    def step(self, action):
+        action = int(np.asarray(action).item())
+        self.current_step += 1
+
+        s = self.tables.encode(self.current_node, self.recipe_step, self.has_item)
+        trace = self.trace
+        if trace is not None:
+            trace.append(s)
+            trace.append(action)
+        reward = self.tables.reward[s, action]
+        terminated = bool(self.tables.terminated[s, action])
+        self.current_node, self.recipe_step, self.has_item = (int(v) for v in self.tables.obs[self.tables.next_state[s, action]])
+
+        truncated = self.current_step >= self.max_steps
+
+        return self._get_obs(), reward, terminated, truncated, {}
+
+    def render(self):
+        y, x = divmod(self.current_node, self.width)
+        done = ", ".join(self.chain[:self.recipe_step]) or "—"
+        print(f"Шаг: {self.current_step} | {self.map_name} | Тайл ({x}, {y}) | Сделано: {done}")
+
+
+# Режимы действий для одной и той же карты
+ENV_MODES = {"macro": GridKitchenEnv, "tile": TileKitchenEnv}
@@ -0,0 +1,228 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from stable_baselines3 import PPO
+
+# Границы корзин гистограммы задержек, мс
+LATENCY_BINS_MS = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+DEFAULT_ADDRESS = ("127.0.0.1", 6006)
+DEFAULT_AUTHKEY = b"kitchen"
+
+
+class PolicyServer:
+    """
+    Сервис предсказаний: модель загружается один раз, запросы из многих сред
+    (потоков, окон игры, клиентов сокета) собираются в один батч.
+    Батч уходит в модель, как только набралось max_batch наблюдений
+    или первый запрос ждет дольше max_wait_ms (бюджет задержки).
+    """
+
+    def __init__(self, model, max_batch=256, max_wait_ms=2.0, deterministic=True):
+        self.model = PPO.load(model, device="cpu") if isinstance(model, str) else model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.deterministic = deterministic
+        self.requests = queue.Queue()
+        self.batch_sizes = []
+        self.latencies = []
+        self._lock = threading.Lock()
+        # Проверка "сервис запущен" и постановка в очередь — атомарно со stop()
+        self._state_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._state_lock:
+            if self._running:
+                return self
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._state_lock:
+            if not self._running:
+                return
+            self._running = False
+            self.requests.put(None)
+        self._thread.join()
+        # Запросы, оставшиеся в очереди (в том числе за None), больше никто не обработает
+        while True:
+            try:
+                item = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set_exception(RuntimeError("PolicyServer остановлен"))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Клиентская часть ---
+    def submit(self, obs):
+        """
+        obs — одно наблюдение или пачка (первая ось — номер среды).
+        Возвращает Future с действием (или массивом действий для пачки).
+        """
+        obs = np.asarray(obs)
+        single = obs.shape == self.model.observation_space.shape
+        future = Future()
+        with self._state_lock:
+            if not self._running:
+                raise RuntimeError("PolicyServer не запущен: вызовите start()")
+            self.requests.put((obs[None] if single else obs, single, future, time.perf_counter()))
+        return future
+
+    def predict(self, obs):
+        return self.submit(obs).result()
+
+    # --- Цикл батчинга ---
+    def _collect(self):
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch, size = [first], len(first[0])
+        deadline = first[3] + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _loop(self):
+        while self._running:
+            batch = self._collect()
+            if batch is None:
+                break
+            try:
+                actions, _ = self.model.predict(np.concatenate([b[0] for b in batch]), deterministic=self.deterministic)
+            except Exception as e:
+                for b in batch:
+                    b[2].set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            start = 0
+            for obs, single, future, t in batch:
+                part = actions[start:start + len(obs)]
+                start += len(obs)
+                future.set_result(part[0] if single else part)
+            with self._lock:
+                self.batch_sizes.append(len(actions))
+                self.latencies.extend((now - b[3]) * 1000 for b in batch)
+
+    # --- Статистика ---
+    def stats(self):
+        """Гистограммы размеров батча и задержки запроса (мс)"""
+        with self._lock:
+            sizes = np.array(self.batch_sizes, dtype=np.int64)
+            latencies = np.array(self.latencies)
+        if not sizes.size:
+            return {"batches": 0, "requests": 0}
+        bins = [0] + LATENCY_BINS_MS + [np.inf]
+        counts, _ = np.histogram(latencies, bins=bins)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "batches": int(sizes.size),
+            "requests": int(latencies.size),
+            "mean_batch": float(sizes.mean()),
+            "batch_hist": {int(k): int(v) for k, v in enumerate(np.bincount(sizes)) if v},
+            "latency_p50_ms": float(p50),
+            "latency_p95_ms": float(p95),
+            "latency_p99_ms": float(p99),
+            "latency_hist_ms": {f"<{b}": int(c) for b, c in zip(bins[1:], counts)},
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        if not s["batches"]:
+            print("Запросов не было")
+            return
+        print(f"Батчей: {s['batches']} | Запросов: {s['requests']} | Средний батч: {s['mean_batch']:.1f}")
+        print(f"Задержка p50/p95/p99: {s['latency_p50_ms']:.2f} / {s['latency_p95_ms']:.2f} / {s['latency_p99_ms']:.2f} мс")
+        for name, count in s["latency_hist_ms"].items():
+            if count:
+                print(f"  {name:>8} мс: {count}")
+
+
+# --- Локальный сокет: тот же сервис для других процессов ---
+def serve_socket(server, address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY):
+    """
+    Принимаем клиентов в фоновом потоке, у каждого клиента свой поток,
+    все запросы сходятся в один батчер. Возвращает Listener (close() — остановить).
+    """
+    listener = Listener(address, authkey=authkey)
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    obs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(server.predict(obs))
+
+    def accept():
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    server.start()
+    threading.Thread(target=accept, daemon=True).start()
+    return listener
+
+
+class PolicyClient:
+    """Клиент сервиса в другом процессе: тот же интерфейс predict(obs)"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY):
+        self.conn = Client(address, authkey=authkey)
+
+    def predict(self, obs):
+        self.conn.send(np.asarray(obs))
+        return self.conn.recv()
+
+    def close(self):
+        self.conn.close()
+
+
+def evaluate_envs(server, envs, episodes=1):
+    """
+    Каждая среда в своем потоке спрашивает сервис по одному наблюдению,
+    сервис склеивает запросы в батчи. Возвращает список возвратов.
+    """
+    returns = [[] for _ in envs]
+
+    def run(i, env):
+        for _ in range(episodes):
+            obs, _ = env.reset()
+            total, done = 0.0, False
+            while not done:
+                obs, reward, term, trunc, _ = env.step(server.predict(obs))
+                total += reward
+                done = term or trunc
+            returns[i].append(total)
+
+    threads = [threading.Thread(target=run, args=(i, env)) for i, env in enumerate(envs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [r for env_returns in returns for r in env_returns]
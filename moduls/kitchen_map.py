@@ -1,11 +1,15 @@
+import heapq
+from collections import deque
 import numpy as np
 import networkx as nx
-from collections import deque
 
 # 0 — пусто
 # 1 — стол
 # 2 — плита
 # 3 — мойка
+# 9 — препятствие (стена, пролитое и т.п.)
+# Любая ненулевая клетка непроходима, к станции подходим с соседней клетки
+OBSTACLE = 9
 
 KITCHEN_MATRIX = np.array([
     [0, 1, 0, 0, 0],
@@ -18,7 +22,8 @@ KITCHEN_MATRIX = np.array([
 
 class KitchenMap:
     def __init__(self, matrix: np.ndarray):
-        self.matrix = matrix
+        # Своя копия: кухню можно менять на ходу (block_cell, move_station)
+        self.matrix = np.array(matrix)
         self.height, self.width = matrix.shape
 
         self.STOL = 0
@@ -33,54 +38,274 @@ class KitchenMap:
         Находим координаты объектов кухни
         """
         positions = {}
-        for y in range(self.height):
-            for x in range(self.width):
-                cell = self.matrix[y, x]
-                if cell == 1:
-                    positions[self.STOL] = (y, x)
-                elif cell == 2:
-                    positions[self.PLITA] = (y, x)
-                elif cell == 3:
-                    positions[self.MOYKA] = (y, x)
+        for node, cell in [(self.STOL, 1), (self.PLITA, 2), (self.MOYKA, 3)]:
+            found = np.argwhere(self.matrix == cell)
+            if len(found):
+                positions[node] = tuple(int(v) for v in found[-1])
         return positions
 
     def _build_graph(self):
         """
         Строим граф, вес ребра = расстояние по клеткам
         """
-        g = nx.Graph()
+        nodes = list(self.node_positions)
+        # Поле BFS от каждой станции: по нему расстояния чинятся локально при смене стен
+        self.fields = DistanceFields(self.matrix == 0, [[self.node_positions[n]] for n in nodes])
+        self.distances = self._distances()
 
-        for a in self.node_positions:
-            for b in self.node_positions:
+        g = nx.Graph()
+        for i, a in enumerate(nodes):
+            for j, b in enumerate(nodes):
                 if a != b:
-                    dist = self._bfs_distance(
-                        self.node_positions[a],
-                        self.node_positions[b]
-                    )
-                    g.add_edge(a, b, weight=dist)
+                    if self.distances[i, j] < 0:
+                        raise ValueError("Путь между объектами не найден")
+                    g.add_edge(a, b, weight=int(self.distances[i, j]))
 
         return g
 
-    def _bfs_distance(self, start, goal):
-        """
-        Кратчайший путь по клеткам (4-направления)
-        """
-        q = deque([(start, 0)])
-        visited = {start}
-
-        while q:
-            (y, x), d = q.popleft()
-            if (y, x) == goal:
-                return d
-
-            for dy, dx in [(-1,0),(1,0),(0,-1),(0,1)]:
-                ny, nx = y + dy, x + dx
-                if (
-                    0 <= ny < self.height and
-                    0 <= nx < self.width and
-                    (ny, nx) not in visited
-                ):
-                    visited.add((ny, nx))
-                    q.append(((ny, nx), d + 1))
-
-        raise ValueError("Путь между объектами не найден")
+    def _distances(self):
+        positions = [self.node_positions[n] for n in self.node_positions]
+        neighbours = station_neighbours(positions, self.matrix.shape)
+        return fields_to_matrix(self.fields.fields, neighbours, 1)
+
+    def _sync_graph(self):
+        """Пересчет матрицы и ребер, у которых поменялось расстояние; возвращает затронутые узлы"""
+        old = self.distances
+        self.distances = self._distances()
+        nodes = list(self.node_positions)
+        changed = set()
+        for i, j in zip(*np.nonzero(np.triu(old != self.distances, 1))):
+            a, b = nodes[i], nodes[j]
+            if self.distances[i, j] >= 0:
+                self.graph.add_edge(a, b, weight=int(self.distances[i, j]))
+            elif self.graph.has_edge(a, b):
+                self.graph.remove_edge(a, b)
+            changed.update((a, b))
+        return changed
+
+    # --- Изменение кухни на ходу (разлили, передвинули станцию) ---
+    def block_cell(self, y, x):
+        if self.matrix[y, x] != 0:
+            return set()
+        self.matrix[y, x] = OBSTACLE
+        self.fields.block((y, x))
+        return self._sync_graph()
+
+    def unblock_cell(self, y, x):
+        if self.matrix[y, x] != OBSTACLE:
+            return set()
+        self.matrix[y, x] = 0
+        self.fields.unblock((y, x))
+        return self._sync_graph()
+
+    def move_station(self, node, y, x):
+        """Переносим станцию на пустую клетку; возвращает узлы с изменившимися расстояниями"""
+        if self.matrix[y, x] != 0:
+            raise ValueError(f"Клетка ({y}, {x}) занята")
+        old = self.node_positions[node]
+        self.matrix[y, x], self.matrix[old] = self.matrix[old], 0
+        self.node_positions[node] = (y, x)
+        k = list(self.node_positions).index(node)
+        self.fields.block((y, x))
+        self.fields.unblock(old)
+        self.fields.reseed(k, [(y, x)])
+        return self._sync_graph() | {node}
+
+
+def bfs_grid(walkable, starts):
+    """
+    BFS по клеткам (4-направления) сразу от всех стартовых клеток.
+    Фронт хранится массивом индексов, стены (False в walkable) не проходимы.
+    Возвращает массив расстояний, -1 — клетка недостижима.
+    """
+    height, width = walkable.shape
+    # Рамка из стен вокруг карты избавляет от проверок границ
+    padded = np.zeros((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = walkable
+    flat_walkable = padded.ravel()
+    row = width + 2
+    offsets = np.array([-row, row, -1, 1])
+
+    dist = np.full(padded.size, -1, dtype=np.int32)
+    slot = np.empty(padded.size, dtype=np.int64)
+    frontier = np.array([(y + 1) * row + x + 1 for y, x in starts], dtype=np.int64)
+    dist[frontier] = 0
+
+    d = 0
+    while frontier.size:
+        d += 1
+        nb = (frontier[:, None] + offsets).ravel()
+        nb = nb[flat_walkable[nb] & (dist[nb] < 0)]
+        # Убираем дубликаты без сортировки: остаётся последняя запись клетки
+        slot[nb] = np.arange(nb.size)
+        frontier = nb[slot[nb] == np.arange(nb.size)]
+        dist[frontier] = d
+
+    return dist.reshape(padded.shape)[1:-1, 1:-1]
+
+
+def station_neighbours(positions, shape):
+    """Соседние клетки каждой станции (без выхода за границы) для индексации поля"""
+    height, width = shape
+    neighbours = []
+    for y, x in positions:
+        cells = [(ny, nx) for ny, nx in [(y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)]
+                 if 0 <= ny < height and 0 <= nx < width]
+        neighbours.append(tuple(np.array(cells).T))
+    return neighbours
+
+
+def fields_to_matrix(fields, targets, step=0):
+    """
+    Матрица расстояний из полей BFS: от источника i до ближайшей клетки targets[j]
+    плюс step (шаг на саму станцию). Диагональ — 0, -1 — пути нет.
+    """
+    count = len(targets)
+    result = np.full((count, count), -1, dtype=np.int32)
+    for i in range(count):
+        for j in range(count):
+            if i == j:
+                result[i, j] = 0
+                continue
+            if not len(targets[j]) or not targets[j][0].size:
+                continue
+            near = fields[i][targets[j]]
+            near = near[near >= 0]
+            if near.size:
+                result[i, j] = near.min() + step
+    return result
+
+
+def distance_matrix(walkable, positions):
+    """
+    Полная матрица расстояний между станциями: один BFS на станцию.
+    Станция стоит на непроходимой клетке, до неё идём до соседней клетки и +1.
+    """
+    fields = []
+    for start in positions:
+        dist = bfs_grid(walkable, [start])
+        dist[start] = 0
+        fields.append(dist)
+    return fields_to_matrix(fields, station_neighbours(positions, walkable.shape), 1)
+
+
+# --- Динамические кратчайшие пути на сетке ---
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def _around(cell, shape):
+    y, x = cell
+    for dy, dx in NEIGHBOURS:
+        ny, nx = y + dy, x + dx
+        if 0 <= ny < shape[0] and 0 <= nx < shape[1]:
+            yield ny, nx
+
+
+def repair_unblock(dist, walkable, cell):
+    """
+    Клетка стала проходимой: расстояния могут только уменьшиться,
+    волна BFS идет от нее и заходит лишь туда, где стало короче.
+    """
+    near = [dist[c] for c in _around(cell, dist.shape) if dist[c] >= 0]
+    if not near or 0 <= dist[cell] <= min(near) + 1:
+        return
+    dist[cell] = min(near) + 1
+    queue = deque([cell])
+    while queue:
+        u = queue.popleft()
+        d = dist[u] + 1
+        for v in _around(u, dist.shape):
+            if walkable[v] and (dist[v] < 0 or dist[v] > d):
+                dist[v] = d
+                queue.append(v)
+
+
+def repair_block(dist, cell, limit):
+    """
+    Клетка стала стеной (Рамалингам-Репс для BFS): ищем клетки, у которых
+    все кратчайшие пути шли через нее, и пересчитываем только их —
+    Дейкстрой от границы с нетронутой частью поля.
+    False — затронуто больше limit клеток, дешевле пересчитать поле целиком.
+    """
+    if dist[cell] < 0:
+        return True
+    affected = {cell}
+    queue = deque([cell])
+    # Очередь идет по возрастанию расстояния, поэтому к проверке клетки
+    # все затронутые клетки предыдущего слоя уже помечены
+    while queue:
+        u = queue.popleft()
+        for v in _around(u, dist.shape):
+            if v in affected or dist[v] != dist[u] + 1:
+                continue
+            if not any(dist[p] == dist[v] - 1 and p not in affected for p in _around(v, dist.shape)):
+                affected.add(v)
+                queue.append(v)
+                if len(affected) > limit:
+                    return False
+
+    for v in affected:
+        dist[v] = -1
+    heap = []
+    for v in affected:
+        if v == cell:
+            continue
+        near = [dist[p] for p in _around(v, dist.shape) if dist[p] >= 0]
+        if near:
+            heap.append((min(near) + 1, v))
+    heapq.heapify(heap)
+    while heap:
+        d, u = heapq.heappop(heap)
+        if 0 <= dist[u] <= d:
+            continue
+        dist[u] = d
+        for v in _around(u, dist.shape):
+            if v in affected and v != cell and (dist[v] < 0 or dist[v] > d + 1):
+                heapq.heappush(heap, (d + 1, v))
+    return True
+
+
+class DistanceFields:
+    """
+    Поля BFS от нескольких групп источников на одной сетке.
+    При смене стены каждое поле чинится локально (repair_block / repair_unblock);
+    если затронута большая часть поля, оно просто пересчитывается заново.
+    """
+
+    def __init__(self, walkable, sources, repair_limit=None):
+        self.walkable = np.array(walkable, dtype=bool)
+        self.sources = [list(s) for s in sources]
+        self.repair_limit = repair_limit or self.walkable.size // 4
+        self.rebuilds = 0
+        self.fields = np.stack([self._bfs(s) for s in self.sources]) if self.sources \
+            else np.zeros((0,) + self.walkable.shape, dtype=np.int32)
+
+    def _bfs(self, sources):
+        if not sources:
+            return np.full(self.walkable.shape, -1, dtype=np.int32)
+        dist = bfs_grid(self.walkable, sources)
+        # Источник может стоять на стене (станция) — он все равно на расстоянии 0
+        for c in sources:
+            dist[c] = 0
+        return dist
+
+    def reseed(self, k, sources):
+        """Новые источники поля k: пересчет только этого поля"""
+        self.sources[k] = list(sources)
+        self.fields[k] = self._bfs(self.sources[k])
+        self.rebuilds += 1
+
+    def block(self, cell):
+        self.walkable[cell] = False
+        for k, field in enumerate(self.fields):
+            # Источник на стене остается источником (как станция в KitchenMap)
+            if cell in self.sources[k]:
+                continue
+            if not repair_block(field, cell, self.repair_limit):
+                self.fields[k] = self._bfs(self.sources[k])
+                self.rebuilds += 1
+
+    def unblock(self, cell):
+        self.walkable[cell] = True
+        for field in self.fields:
+            repair_unblock(field, self.walkable, cell)
@@ -0,0 +1,255 @@
+import random
+import numpy as np
+from gymnasium import spaces
+
+from moduls.grid_env import load_layout, ENGINE
+from moduls.game_path import use_game_modules
+
+use_game_modules()
+from orders import OrderStream, PoissonArrivals, TraceArrivals
+
+# Состояние повара
+IDLE, MOVING, WAITING, WORKING = 0, 1, 2, 3
+
+
+class MultiKitchenEnv:
+    """
+    Несколько поваров на одной карте (параллельный API в стиле PettingZoo).
+
+    Повара ходят между станциями карты, путь занимает столько тиков, сколько
+    в нем тайлов. Станция обслуживает одного повара за раз и занята на время
+    процесса из рецепта; остальные ждут в очереди у станции (первым пришел —
+    первым обслужен). Всё состояние — массивы по поварам, шаг без цикла по агентам.
+
+    Без потока заказов повар после сдачи сразу получает новый случайный заказ.
+    С orders_per_hour (пуассоновский поток) или trace (JSON [[мс, заказ], ...])
+    заказы приходят на общую доску OrderStream, свободный повар берет самый старый.
+    """
+    metadata = {"render_modes": ["human"], "name": "multi_kitchen_v0"}
+
+    def __init__(self, map_name="map_1", num_agents=4, orders=("fried", "baked"), tick_ms=500,
+                 step_cost=0.01, stage_bonus=10, order_bonus=50, fail_penalty=1, max_ticks=500,
+                 orders_per_hour=None, trace=None, queue_capacity=8, deadline_ms=120000):
+        self.map_name = map_name
+        self.layout = load_layout(map_name)
+        self.names = self.layout.names
+        self.num_nodes = len(self.names)
+        self.orders = list(orders)
+        self.order_ids = {order: i for i, order in enumerate(self.orders)}
+        self.step_cost = step_cost
+        self.stage_bonus = stage_bonus
+        self.order_bonus = order_bonus
+        self.fail_penalty = fail_penalty
+        self.max_ticks = max_ticks
+        self.tick_ms = tick_ms
+        self.orders_per_hour = orders_per_hour
+        self.trace = trace
+        self.queue_capacity = queue_capacity
+        self.deadline_ms = deadline_ms
+        self.stream = None
+
+        # Путь в тиках (1 тайл за тик); недостижимые узлы помечены -1
+        self.distances = self.layout.distances
+
+        # Рецепты: какая станция и сколько тиков на каждом этапе, по заказам.
+        # Последняя строка — "нет заказа": ни одна станция не подходит, сдать нечего
+        chains = [ENGINE.station_chain(o) for o in self.orders]
+        self.NO_ORDER = len(chains)
+        self.max_stages = max(len(c) for c in chains)
+        self.chain_len = np.array([len(c) for c in chains] + [self.max_stages + 1])
+        self.stage_station = np.full((len(chains) + 1, self.max_stages), -1, dtype=np.int32)
+        self.stage_ticks = np.zeros((len(chains) + 1, self.max_stages), dtype=np.int64)
+        station_ids = {name: i for i, name in enumerate(sorted(set(self.names)))}
+        self.node_station = np.array([station_ids[name] for name in self.names])
+        for o, order in enumerate(self.orders):
+            for k, (station, ms) in enumerate(zip(chains[o], ENGINE.stage_times(order))):
+                if station not in station_ids:
+                    raise ValueError(f"На карте {map_name} нет станции {station} для заказа {order}")
+                self.stage_station[o, k] = station_ids[station]
+                self.stage_ticks[o, k] = -(-ms // tick_ms)
+
+        self.possible_agents = [f"chef_{i}" for i in range(num_agents)]
+        self.agents = []
+        self._obs_space = spaces.MultiDiscrete([self.num_nodes, self.max_stages + 1, len(self.orders) + 1, 4])
+        # Действия: 0..num_nodes-1 — идти к узлу, num_nodes — работать на станции.
+        # NO_ACTION (-1) вне пространства действий: повар стоит, штрафа нет
+        self.ACTION_INTERACT = self.num_nodes
+        self.NO_ACTION = -1
+        self._act_space = spaces.Discrete(self.num_nodes + 1)
+        self.rng = np.random.default_rng()
+
+    @property
+    def num_agents(self):
+        return len(self.possible_agents)
+
+    def observation_space(self, agent):
+        return self._obs_space
+
+    def action_space(self, agent):
+        return self._act_space
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        n = self.num_agents
+        self.agents = list(self.possible_agents)
+        self.tick = 0
+        self.node = np.zeros(n, dtype=np.int64)
+        self.travel = np.zeros(n, dtype=np.int64)         # тиков пути осталось
+        self.work = np.full(n, -1, dtype=np.int64)        # тиков работы осталось, -1 — не работает
+        self.waiting = np.zeros(n, dtype=bool)
+        self.wait_since = np.zeros(n, dtype=np.int64)
+        self.stage = np.zeros(n, dtype=np.int64)
+        self.order = self.rng.integers(len(self.orders), size=n)
+        self.delivered = np.zeros(n, dtype=np.int64)
+        # Тик, с которого станция (узел) свободна
+        self.free_at = np.zeros(self.num_nodes, dtype=np.int64)
+
+        self.tickets = [None] * n
+        self.stream = self._make_stream(seed)
+        if self.stream:
+            self.order[:] = self.NO_ORDER
+            self._take_orders()
+        return self._dict(self._get_obs()), {a: {} for a in self.agents}
+
+    def _make_stream(self, seed):
+        if self.trace is not None:
+            arrivals = TraceArrivals.load(self.trace) if isinstance(self.trace, str) else TraceArrivals(self.trace)
+            unknown = sorted({order for _, order in arrivals.events} - set(self.order_ids))
+            if unknown:
+                raise ValueError(f"В потоке заказов есть блюда, которых нет в orders среды: {unknown}; "
+                                 f"orders={self.orders}")
+        elif self.orders_per_hour:
+            arrivals = PoissonArrivals(self.orders, self.orders_per_hour, random.Random(seed))
+        else:
+            return None
+        return OrderStream(arrivals, self.queue_capacity, self.deadline_ms)
+
+    def _take_orders(self):
+        """Свободные повара по порядку берут самые старые заказы с доски"""
+        self.stream.update(self.tick * self.tick_ms)
+        for i in np.flatnonzero(self.order == self.NO_ORDER):
+            ticket = self.stream.claim()
+            if ticket is None:
+                break
+            self.tickets[i] = ticket
+            self.order[i] = self.order_ids[ticket.order]
+
+    def metrics(self):
+        """Пропускная способность и время тикетов (только с потоком заказов)"""
+        return self.stream.metrics() if self.stream else {"served": int(self.delivered.sum())}
+
+    def status(self):
+        status = np.full(self.num_agents, IDLE)
+        status[self.travel > 0] = MOVING
+        status[self.waiting] = WAITING
+        status[self.work >= 0] = WORKING
+        return status
+
+    def _get_obs(self):
+        return np.stack([self.node, self.stage, self.order, self.status()], axis=1).astype(np.int32)
+
+    def _dict(self, values):
+        return {a: values[i] for i, a in enumerate(self.possible_agents)}
+
+    def queue_lengths(self):
+        """Сколько поваров ждет у каждого узла"""
+        return np.bincount(self.node[self.waiting], minlength=self.num_nodes)
+
+    def _complete(self, rewards):
+        done = self.work == 0
+        if not done.any():
+            return
+        self.work[done] = -1
+        self.stage[done] += 1
+        rewards[done] += self.stage_bonus
+
+        served = done & (self.stage >= self.chain_len[self.order])
+        rewards[served] += self.order_bonus
+        self.delivered[served] += 1
+        self.stage[served] = 0
+        if self.stream:
+            for i in np.flatnonzero(served):
+                self.stream.serve(self.tickets[i], self.tick * self.tick_ms)
+                self.tickets[i] = None
+            self.order[served] = self.NO_ORDER
+        else:
+            self.order[served] = self.rng.integers(len(self.orders), size=served.sum())
+
+    def _assign_stations(self):
+        """Свободная станция берет того, кто ждет дольше всех (при равенстве — меньший номер)"""
+        cand = np.flatnonzero(self.waiting & (self.free_at[self.node] <= self.tick))
+        if not cand.size:
+            return
+        cand = cand[np.lexsort((cand, self.wait_since[cand], self.node[cand]))]
+        _, first = np.unique(self.node[cand], return_index=True)
+        winners = cand[first]
+
+        ticks = self.stage_ticks[self.order[winners], self.stage[winners]]
+        self.waiting[winners] = False
+        self.work[winners] = ticks
+        self.free_at[self.node[winners]] = self.tick + ticks
+
+    def step_arrays(self, actions):
+        """Шаг по массиву действий всех поваров, возвращает массивы"""
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.num_agents)
+        rewards = np.full(self.num_agents, -self.step_cost)
+        self._complete(rewards)
+        if self.stream:
+            self._take_orders()
+
+        idle = (self.travel == 0) & (self.work < 0) & ~self.waiting
+        # Движение: путь начинается сразу, повар числится в точке назначения
+        move = idle & (actions >= 0) & (actions < self.num_nodes)
+        dist = self.distances[self.node[move], actions[move]]
+        reachable = dist >= 0
+        movers = np.flatnonzero(move)[reachable]
+        self.travel[movers] = dist[reachable]
+        self.node[movers] = actions[movers]
+        rewards[np.flatnonzero(move)[~reachable]] -= self.fail_penalty
+
+        # Работа: нужная станция — встаем в очередь, иначе штраф
+        use = idle & (actions == self.ACTION_INTERACT)
+        right = self.node_station[self.node] == self.stage_station[self.order, self.stage]
+        self.waiting[use & right] = True
+        self.wait_since[use & right] = self.tick
+        rewards[use & ~right] -= self.fail_penalty
+
+        self._assign_stations()
+        # Мгновенные этапы (холодильник, сдача) завершаются в тот же тик
+        self._complete(rewards)
+
+        self.travel[self.travel > 0] -= 1
+        self.work[self.work > 0] -= 1
+        self.tick += 1
+
+        truncated = self.tick >= self.max_ticks
+        terminated = np.zeros(self.num_agents, dtype=bool)
+        return self._get_obs(), rewards, terminated, np.full(self.num_agents, truncated)
+
+    def step(self, actions):
+        """actions — словарь agent -> действие, как в PettingZoo"""
+        index = {a: i for i, a in enumerate(self.possible_agents)}
+        # Повара без действия в словаре (заняты или без заказа) просто стоят
+        array = np.full(self.num_agents, self.NO_ACTION, dtype=np.int64)
+        for agent, action in actions.items():
+            array[index[agent]] = action
+        obs, rewards, terminated, truncated = self.step_arrays(array)
+
+        infos = {a: {"delivered": int(self.delivered[i])} for i, a in enumerate(self.possible_agents)}
+        if truncated.any():
+            for info in infos.values():
+                info["metrics"] = self.metrics()
+        result = (self._dict(obs), self._dict(rewards.tolist()), self._dict(terminated.tolist()),
+                  self._dict(truncated.tolist()), infos)
+        if truncated.any():
+            self.agents = []
+        return result
+
+    def render(self):
+        status = ["ждет", "идет", "в очереди", "работает"]
+        print(f"Тик: {self.tick} | {self.map_name} | Сдано: {int(self.delivered.sum())}")
+        for i, a in enumerate(self.possible_agents):
+            order = self.orders[self.order[i]] if self.order[i] != self.NO_ORDER else "без заказа"
+            print(f"  {a}: {self.names[self.node[i]]} #{self.node[i]} | {status[self.status()[i]]} | "
+                  f"{order} этап {self.stage[i]}")
@@ -0,0 +1,173 @@
+import heapq
+import numpy as np
+import networkx as nx
+from moduls.env_compiler import edge_weight_matrix
+
+
+def hop_weight(hop_cost):
+    """Вес ребра с учетом штрафа за каждый шаг (в средах это -0.1 за действие)"""
+    return lambda u, v, d: d["weight"] + hop_cost
+
+
+def all_pairs_distances(graph, num_nodes, hop_cost=0.0):
+    """
+    Кратчайшие расстояния между всеми узлами графа кухни (inf — пути нет)
+    """
+    dist = np.nan_to_num(edge_weight_matrix(graph, num_nodes) + hop_cost, nan=np.inf)
+    np.fill_diagonal(dist, 0.0)
+    # Флойд-Уоршелл: один векторный шаг на каждый промежуточный узел
+    for k in range(num_nodes):
+        dist = np.minimum(dist, dist[:, k, None] + dist[None, k, :])
+    return dist
+
+
+def macro_graph(graph, num_nodes, step_cost=0.1):
+    """
+    Макро-действия "идти к узлу X": ребро между любыми связанными узлами —
+    кратчайший путь исходного графа (он лежит в атрибуте path). Вес подобран так,
+    что один макро-шаг (step_cost + вес) стоит столько же, сколько весь путь
+    по ребрам, где каждый ход стоит step_cost плюс вес ребра.
+    """
+    dist = all_pairs_distances(graph, num_nodes, hop_cost=step_cost)
+    macro = nx.Graph()
+    macro.add_nodes_from(range(num_nodes))
+    for a in range(num_nodes):
+        for b in range(a + 1, num_nodes):
+            if np.isfinite(dist[a, b]):
+                path = nx.shortest_path(graph, a, b, weight=hop_weight(step_cost))
+                macro.add_edge(a, b, weight=dist[a, b] - step_cost, path=path)
+    return macro
+
+
+def stage_nodes_from_tables(tables, count=None):
+    """
+    Узлы, где можно выполнить каждый этап рецепта, и действие этапа.
+    count — число этапов рецепта, если последним этапам не нашлось узлов
+    """
+    count = max([s["step"] + 1 for s in tables.stages] + [count or 0])
+    nodes = [[] for _ in range(count)]
+    actions = [None] * count
+    for stage in tables.stages:
+        nodes[stage["step"]].append(stage["node"])
+        actions[stage["step"]] = stage["action"]
+    return nodes, actions
+
+
+def cost_to_go(dist, stage_nodes, stations=None):
+    """
+    ctg[k][p] — минимальная длина маршрута, чтобы из узла p выполнить этапы k..конец.
+    Считается назад по этапам, это точное значение для одного заказа.
+    stations — имена станций этапов, только для сообщения об ошибке.
+    """
+    for k, nodes in enumerate(stage_nodes):
+        if len(nodes) == 0:
+            station = f"станции {stations[k]!r}" if stations else "станции"
+            raise ValueError(f"Этап {k} рецепта невозможно выполнить: на карте нет {station}")
+    ctg = [np.zeros(len(dist))]
+    for nodes in reversed(stage_nodes):
+        nodes = np.asarray(nodes)
+        ctg.append((dist[:, nodes] + ctg[-1][nodes]).min(axis=1))
+    return ctg[::-1]
+
+
+class Plan:
+    def __init__(self, cost, visits):
+        self.cost = cost
+        # Посещения по порядку: (узел, номер заказа, этап)
+        self.visits = visits
+
+
+def plan_orders(dist, orders, start, stations=None):
+    """
+    A* по состояниям (позиция, активный заказ, этап, выполненные заказы).
+    Повар несет один заказ за раз, заказы можно брать в любом порядке.
+    Эвристика допустима: точный остаток активного заказа плюс
+    внутренняя длина каждого не начатого заказа.
+    stations — имена станций этапов каждого заказа (для сообщений об ошибках)
+    """
+    stations = stations or [None] * len(orders)
+    ctg = [cost_to_go(dist, stages, names) for stages, names in zip(orders, stations)]
+    # Длина заказа без подхода к первому этапу
+    inner = [min(c[1][q] for q in stages[0]) for c, stages in zip(ctg, orders)]
+    full = (1 << len(orders)) - 1
+
+    def h(pos, active, stage, done):
+        rest = sum(inner[o] for o in range(len(orders)) if not done >> o & 1 and o != active)
+        return rest + (ctg[active][stage][pos] if active >= 0 else 0)
+
+    start_state = (start, -1, 0, 0)
+    best = {start_state: 0.0}
+    parent = {start_state: None}
+    heap = [(h(*start_state), 0, 0.0, start_state)]
+    counter = 0
+
+    while heap:
+        _, _, g, state = heapq.heappop(heap)
+        if g > best[state]:
+            continue
+        pos, active, stage, done = state
+        if done == full:
+            visits = []
+            while parent[state] is not None:
+                state, visit = parent[state]
+                visits.append(visit)
+            return Plan(g, visits[::-1])
+
+        if active >= 0:
+            moves = [(active, stage)]
+        else:
+            moves = [(o, 0) for o in range(len(orders)) if not done >> o & 1]
+
+        for o, k in moves:
+            for q in orders[o][k]:
+                cost = g + dist[pos, q]
+                if k + 1 == len(orders[o]):
+                    nxt = (q, -1, 0, done | 1 << o)
+                else:
+                    nxt = (q, o, k + 1, done)
+                if cost < best.get(nxt, np.inf):
+                    best[nxt] = cost
+                    parent[nxt] = (state, (q, o, k))
+                    counter += 1
+                    heapq.heappush(heap, (cost + h(*nxt), counter, cost, nxt))
+
+    raise ValueError("Заказы невозможно выполнить на этой кухне")
+
+
+def expert_actions(env, orders=1):
+    """
+    Оптимальная последовательность действий для среды с графом и
+    скомпилированными таблицами (1.py, logic.py, GridKitchenEnv)
+    """
+    dist = all_pairs_distances(env.graph, env.num_nodes, hop_cost=0.1)
+    chain = getattr(env, "chain", None)
+    stage_nodes, stage_actions = stage_nodes_from_tables(env.tables, len(chain) if chain else None)
+    # Этапы, которые уже пройдены в текущем эпизоде, пропускаем
+    todo = stage_nodes[env.recipe_step:]
+    names = chain[env.recipe_step:] if chain else None
+    plan = plan_orders(dist, [todo] * orders, env.current_node, [names] * orders)
+
+    actions, pos = [], env.current_node
+    for node, _, k in plan.visits:
+        if node != pos:
+            path = nx.shortest_path(env.graph, pos, node, weight=hop_weight(0.1))
+            actions.extend(path[1:])
+            pos = node
+        actions.append(stage_actions[env.recipe_step + k])
+    return actions
+
+
+def collect_demonstrations(env, episodes=100, seed=None):
+    """
+    Демонстрации эксперта (obs, action) для предобучения политики
+    """
+    observations, actions = [], []
+    for i in range(episodes):
+        obs, _ = env.reset(seed=None if seed is None else seed + i)
+        for action in expert_actions(env):
+            observations.append(obs)
+            actions.append(action)
+            obs, _, term, trunc, _ = env.step(action)
+            if term or trunc:
+                break
+    return np.array(observations), np.array(actions)
@@ -1,4 +1,4 @@
-self.recipes = [
+RECIPES = [
     {
         "name": "Хот-дог",
         "steps": [
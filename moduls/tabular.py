@@ -0,0 +1,156 @@
+import os
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.vec_env import DummyVecEnv
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+# Больше ячеек Q-таблицы (состояния x действия) — уже нейросеть
+TABULAR_MAX_ENTRIES = 1_000_000
+
+
+def _tables(env):
+    """Скомпилированные таблицы среды (KitchenTables), если есть"""
+    tables = getattr(env, "tables", None)
+    if tables is None and isinstance(env, DummyVecEnv):
+        tables = getattr(env.envs[0].unwrapped, "tables", None)
+    return tables
+
+
+class TabularQ:
+    """
+    Q-таблица NumPy, индекс — наблюдение MultiDiscrete (через ravel_multi_index).
+    Интерфейс как у моделей SB3: learn / predict / save / load.
+
+    Если у среды есть скомпилированные таблицы (KitchenTables), learn решает
+    задачу точно итерацией значений — за миллисекунды. Иначе обычный
+    Q-learning с epsilon-жадным исследованием на пачке сред.
+    """
+
+    def __init__(self, env=None, gamma=0.99, learning_rate=0.5, epsilon=0.1, verbose=0,
+                 observation_space=None, action_space=None):
+        self.env = None if env is None else self._wrap(env)
+        self.observation_space = observation_space or self.env.observation_space
+        self.action_space = action_space or self.env.action_space
+        self.nvec = tuple(int(n) for n in self.observation_space.nvec)
+        self.gamma = gamma
+        self.learning_rate = learning_rate
+        self.epsilon = epsilon
+        self.verbose = verbose
+        self.num_timesteps = 0
+        self.q = np.zeros((int(np.prod(self.nvec)), self.action_space.n))
+        self.rng = np.random.default_rng()
+
+    @staticmethod
+    def _wrap(env):
+        return env if isinstance(env, VecEnv) else DummyVecEnv([lambda: env])
+
+    def set_env(self, env):
+        self.env = self._wrap(env)
+
+    def _index(self, obs):
+        obs = np.asarray(obs, dtype=np.int64)
+        return np.ravel_multi_index(obs.reshape(-1, len(self.nvec)).T, self.nvec)
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        single = np.asarray(obs).ndim == 1
+        actions = self.q[self._index(obs)].argmax(axis=1)
+        return (actions[0] if single else actions), None
+
+    # --- Обучение ---
+    def learn(self, total_timesteps, callback=None, reset_num_timesteps=True, **kwargs):
+        tables = _tables(self.env)
+        if tables is not None and tables.num_states == self.q.shape[0]:
+            self._value_iteration(tables)
+        else:
+            self._q_learning(total_timesteps)
+        return self
+
+    def _value_iteration(self, tables, tol=1e-6, max_iters=10000):
+        """Порядок состояний KitchenTables совпадает с ravel_multi_index наблюдения"""
+        alive = ~tables.terminated
+        for i in range(max_iters):
+            q = tables.reward + self.gamma * alive * self.q.max(axis=1)[tables.next_state]
+            delta = np.abs(q - self.q).max()
+            self.q = q
+            if delta < tol:
+                break
+        if self.verbose:
+            print(f"Итерация значений: {i + 1} проходов, невязка {delta:.2e}")
+
+    def _q_learning(self, total_timesteps):
+        env = self.env
+        n = env.num_envs
+        obs = env.reset()
+        for _ in range(-(-total_timesteps // n)):
+            s = self._index(obs)
+            actions = self.q[s].argmax(axis=1)
+            explore = self.rng.random(n) < self.epsilon
+            actions[explore] = self.rng.integers(self.action_space.n, size=int(explore.sum()))
+            obs, rewards, dones, infos = env.step(actions)
+
+            # После конца эпизода obs — уже новый эпизод, берем последнее наблюдение из info
+            nxt = np.array(obs, copy=True)
+            bootstrap = np.ones(n)
+            for i in np.flatnonzero(dones):
+                nxt[i] = infos[i]["terminal_observation"]
+                bootstrap[i] = float(infos[i].get("TimeLimit.truncated", False))
+            target = rewards + self.gamma * bootstrap * self.q[self._index(nxt)].max(axis=1)
+            # Одинаковые (s, a) в пачке обновляем одним шагом к средней цели
+            cells, inverse = np.unique(s * self.q.shape[1] + actions, return_inverse=True)
+            error = np.bincount(inverse, weights=target - self.q[s, actions]) / np.bincount(inverse)
+            self.q.flat[cells] += self.learning_rate * error
+            self.num_timesteps += n
+        if self.verbose:
+            print(f"Q-learning: {self.num_timesteps} шагов")
+
+    # --- Сохранение ---
+    def save(self, path):
+        target = path if path.endswith(".npz") else path + ".npz"
+        tmp = target + ".tmp.npz"
+        np.savez(tmp, q=self.q, nvec=np.array(self.nvec), n_actions=self.action_space.n,
+                 params=np.array([self.gamma, self.learning_rate, self.epsilon]))
+        os.replace(tmp, target)
+
+    @classmethod
+    def load(cls, path, env=None, **kwargs):
+        data = np.load(path if path.endswith(".npz") else path + ".npz")
+        gamma, learning_rate, epsilon = data["params"]
+        model = cls(env, gamma, learning_rate, epsilon,
+                    observation_space=spaces.MultiDiscrete(data["nvec"]),
+                    action_space=spaces.Discrete(int(data["n_actions"])), **kwargs)
+        model.q = data["q"]
+        return model
+
+
+# --- Выбор бэкенда ---
+def tabular_size(observation_space, action_space):
+    """Размер Q-таблицы; None — пространство не дискретное, таблица невозможна"""
+    if not isinstance(observation_space, spaces.MultiDiscrete) or not isinstance(action_space, spaces.Discrete):
+        return None
+    return int(np.prod(observation_space.nvec, dtype=np.float64)) * int(action_space.n)
+
+
+def make_model(env, max_entries=TABULAR_MAX_ENTRIES, verbose=1, **ppo_kwargs):
+    """
+    Маленькая кухня — Q-таблица, большая — PPO с MlpPolicy (ppo_kwargs уходят туда)
+    """
+    size = tabular_size(env.observation_space, env.action_space)
+    if size is not None and size <= max_entries:
+        if verbose:
+            print(f"Бэкенд: Q-таблица ({size} ячеек)")
+        return TabularQ(env, verbose=verbose)
+    if verbose:
+        print(f"Бэкенд: PPO (таблица была бы {size} ячеек, порог {max_entries})")
+    return PPO("MlpPolicy", env, verbose=verbose, **ppo_kwargs)
+
+
+def model_exists(path):
+    return os.path.exists(path + ".npz") or os.path.exists(path + ".zip")
+
+
+def load_model(path, env=None):
+    """Загружаем тем бэкендом, которым модель была сохранена"""
+    if os.path.exists(path + ".npz"):
+        return TabularQ.load(path, env=env)
+    return PPO.load(path, env=env)
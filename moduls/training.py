@@ -0,0 +1,328 @@
+import os
+import threading
+import traceback
+import multiprocessing as mp
+import gymnasium as gym
+from gymnasium import spaces
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from moduls.grid_env import ENV_MODES, ENGINE
+
+
+class RandomKitchenEnv(gym.Env):
+    """
+    Кухня со случайной картой и заказом на каждый reset.
+    В наблюдение добавлены номер заказа и номер карты, иначе агент не знает, что готовить.
+    """
+    metadata = {"render_modes": ["human"]}
+
+    def __init__(self, maps, orders, mode="macro"):
+        """mode — macro (станция за шаг, GridKitchenEnv) или tile (по тайлам, TileKitchenEnv)"""
+        super().__init__()
+        self.maps = list(maps)
+        self.orders = list(orders)
+        env_cls = ENV_MODES[mode]
+        num_nodes = max(env_cls.count_nodes(m) for m in self.maps)
+        max_steps = max(len(ENGINE.station_chain(o)) for o in self.orders)
+        self.envs = {(m, o): env_cls(m, o, num_nodes=num_nodes, max_recipe_steps=max_steps)
+                     for m in self.maps for o in self.orders}
+
+        self.observation_space = spaces.MultiDiscrete([num_nodes, max_steps + 1, 2, len(self.orders), len(self.maps)])
+        self.action_space = next(iter(self.envs.values())).action_space
+        self.env = None
+        self.ids = (0, 0)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        m = int(self.np_random.integers(len(self.maps)))
+        o = int(self.np_random.integers(len(self.orders)))
+        self.env = self.envs[(self.maps[m], self.orders[o])]
+        self.ids = (o, m)
+        obs, info = self.env.reset()
+        return self._wrap(obs), info
+
+    def _wrap(self, obs):
+        return np.concatenate([obs, self.ids]).astype(np.int32)
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        return self._wrap(obs), reward, terminated, truncated, info
+
+    def render(self):
+        self.env.render()
+
+
+def make_env(rank, seed, maps, orders, mode="macro"):
+    """Фабрика среды для воркера: у каждого свой сид"""
+    def _init():
+        env = RandomKitchenEnv(maps, orders, mode)
+        env.reset(seed=seed + rank)
+        return env
+    return _init
+
+
+# --- Общая память ---
+CMD_STEP, CMD_RESET, CMD_CALL, CMD_CLOSE = 0, 1, 2, 3
+# Сколько секунд ждать воркеров на барьере, прежде чем считать их зависшими
+SHM_TIMEOUT = 300
+
+
+def _views(raw, obs_shape):
+    """numpy-обертки над общей памятью (в каждом процессе свои)"""
+    return (
+        np.frombuffer(raw[0], dtype=np.int32).reshape(obs_shape),
+        np.frombuffer(raw[1], dtype=np.int64),
+        np.frombuffer(raw[2], dtype=np.float32),
+        np.frombuffer(raw[3], dtype=np.int8),
+        np.frombuffer(raw[4], dtype=np.int8),
+        np.frombuffer(raw[5], dtype=np.int32).reshape(obs_shape),
+    )
+
+
+def _shm_worker(index, env_fn, raw, obs_shape, cmd, start, end, pipe):
+    try:
+        _shm_loop(index, env_fn, raw, obs_shape, cmd, start, end, pipe)
+    except threading.BrokenBarrierError:
+        # Барьеры сломал родитель или другой воркер — ошибка уже не наша
+        return
+    except Exception:
+        # Ошибку отдаем родителю и ломаем барьеры, чтобы он не ждал вечно
+        pipe.send(("error", traceback.format_exc()))
+        start.abort()
+        end.abort()
+
+
+def _shm_loop(index, env_fn, raw, obs_shape, cmd, start, end, pipe):
+    env = env_fn()
+    obs_buf, act_buf, rew_buf, done_buf, trunc_buf, term_obs_buf = _views(raw, obs_shape)
+    while True:
+        start.wait()
+        c = cmd.value
+        if c == CMD_STEP:
+            obs, reward, terminated, truncated, _ = env.step(int(act_buf[index]))
+            done = terminated or truncated
+            if done:
+                term_obs_buf[index] = obs
+                obs, _ = env.reset()
+            obs_buf[index] = obs
+            rew_buf[index] = reward
+            done_buf[index] = done
+            trunc_buf[index] = truncated and not terminated
+        elif c == CMD_RESET:
+            seed, options = pipe.recv()
+            obs_buf[index], info = env.reset(seed=seed, **({"options": options} if options else {}))
+            pipe.send(("ok", info))
+        elif c == CMD_CALL:
+            msg = pipe.recv()
+            if msg is None:
+                pipe.send(("ok", None))
+            else:
+                kind, name, args, kwargs = msg
+                attr = getattr(env, name)
+                pipe.send(("ok", attr(*args, **kwargs) if kind == "call" else attr))
+        end.wait()
+        if c == CMD_CLOSE:
+            break
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Воркеры в отдельных процессах пишут obs/reward/done прямо в общую память.
+    На шаг — только две синхронизации через барьер, без сериализации данных.
+    Наблюдения должны быть целочисленными (int32), как во всех кухонных средах.
+
+    Упавший воркер присылает traceback и ломает барьеры, а барьеры ждут не дольше
+    timeout секунд (на случай, если процесс умер молча) — в обоих случаях
+    родитель поднимает RuntimeError, как SubprocVecEnv, а не зависает.
+    """
+
+    def __init__(self, env_fns, start_method=None, timeout=SHM_TIMEOUT):
+        template = env_fns[0]()
+        super().__init__(len(env_fns), template.observation_space, template.action_space)
+        template.close()
+
+        ctx = mp.get_context(start_method)
+        n = self.num_envs
+        obs_shape = (n,) + self.observation_space.shape
+        obs_size = int(np.prod(obs_shape))
+        self._raw = [
+            ctx.RawArray("i", obs_size), ctx.RawArray("q", n), ctx.RawArray("f", n),
+            ctx.RawArray("b", n), ctx.RawArray("b", n), ctx.RawArray("i", obs_size),
+        ]
+        (self.obs_buf, self.act_buf, self.rew_buf,
+         self.done_buf, self.trunc_buf, self.term_obs_buf) = _views(self._raw, obs_shape)
+
+        self.timeout = timeout
+        self.cmd = ctx.Value("i", CMD_RESET, lock=False)
+        self.start = ctx.Barrier(n + 1)
+        self.end = ctx.Barrier(n + 1)
+        self.pipes = []
+        self.processes = []
+        for i, fn in enumerate(env_fns):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_shm_worker, daemon=True, args=(
+                i, fn, self._raw, obs_shape, self.cmd, self.start, self.end, child))
+            proc.start()
+            # Свой конец child родителю не нужен: без этого смерть воркера не дает EOF
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(proc)
+        self.closed = False
+        self.broken = False
+
+    def _wait(self, barrier):
+        try:
+            barrier.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            self._fail()
+
+    def _send(self, i, msg):
+        try:
+            self.pipes[i].send(msg)
+        except OSError:
+            self._fail(f"воркер {i} умер")
+
+    def _recv(self, i):
+        # Копии концов pipe могут остаться у других воркеров (fork), тогда EOF не придет — ждем не дольше timeout
+        try:
+            if not self.pipes[i].poll(self.timeout):
+                self._fail(f"воркер {i}: нет ответа за {self.timeout} с")
+            status, payload = self.pipes[i].recv()
+        except (EOFError, OSError):
+            self._fail(f"воркер {i} умер")
+        if status == "error":
+            self._fail(f"воркер {i}:\n{payload}")
+        return payload
+
+    def _fail(self, error=None):
+        """Собираем ошибки воркеров, гасим остальных и поднимаем исключение"""
+        self.broken = self.closed = True
+        self.start.abort()
+        self.end.abort()
+        errors = [error] if error else []
+        for i, (pipe, proc) in enumerate(zip(self.pipes, self.processes)):
+            while pipe.poll(0.1):
+                try:
+                    status, payload = pipe.recv()
+                except (EOFError, OSError):
+                    break
+                if status == "error":
+                    errors.append(f"воркер {i}:\n{payload}")
+            if not proc.is_alive() and proc.exitcode:
+                errors.append(f"воркер {i} завершился с кодом {proc.exitcode}")
+        for proc in self.processes:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self.processes:
+            proc.join(1)
+        raise RuntimeError("Воркер SharedMemoryVecEnv упал или завис\n" +
+                           ("\n".join(errors) or f"нет ответа за {self.timeout} с"))
+
+    def _check(self):
+        if self.broken:
+            raise RuntimeError("SharedMemoryVecEnv сломан: один из воркеров упал")
+
+    def _run(self, command):
+        self._check()
+        self.cmd.value = command
+        self._wait(self.start)
+        self._wait(self.end)
+
+    def reset(self):
+        self._check()
+        # Сиды и опции из seed()/set_options() уходят воркерам один раз, как в SubprocVecEnv
+        for i in range(self.num_envs):
+            self._send(i, (self._seeds[i], self._options[i]))
+        self.cmd.value = CMD_RESET
+        self._wait(self.start)
+        self.reset_infos = [self._recv(i) for i in range(self.num_envs)]
+        self._wait(self.end)
+        self._reset_seeds()
+        self._reset_options()
+        return self.obs_buf.copy()
+
+    def step_async(self, actions):
+        self.act_buf[:] = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        self._run(CMD_STEP)
+        dones = self.done_buf.astype(bool)
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self.term_obs_buf[i].copy()
+            infos[i]["TimeLimit.truncated"] = bool(self.trunc_buf[i])
+        return self.obs_buf.copy(), self.rew_buf.copy(), dones, infos
+
+    def close(self):
+        if self.closed:
+            return
+        self._run(CMD_CLOSE)
+        for proc in self.processes:
+            proc.join()
+        self.closed = True
+
+    def _call(self, kind, name, args, kwargs, indices):
+        # Редкие вызовы идут через pipe: все воркеры просыпаются, отвечают только нужные
+        self._check()
+        indices = list(self._get_indices(indices))
+        self.cmd.value = CMD_CALL
+        for i in range(self.num_envs):
+            self._send(i, (kind, name, args, kwargs) if i in indices else None)
+        self._wait(self.start)
+        results = [self._recv(i) for i in range(self.num_envs)]
+        self._wait(self.end)
+        return [results[i] for i in indices]
+
+    def get_attr(self, attr_name, indices=None):
+        return self._call("get", attr_name, (), {}, indices)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call("call", "__setattr__", (attr_name, value), {}, indices)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._call("call", method_name, method_args, method_kwargs, indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+def make_vec_env(n_workers, seed, maps, orders, transport="shm", start_method=None, mode="macro"):
+    """transport: "shm" — общая память, "pipe" — стандартный SubprocVecEnv"""
+    env_fns = [make_env(rank, seed, maps, orders, mode) for rank in range(n_workers)]
+    if transport == "shm":
+        return SharedMemoryVecEnv(env_fns, start_method)
+    if transport == "pipe":
+        return SubprocVecEnv(env_fns, start_method)
+    raise ValueError(f"Неизвестный транспорт: {transport}")
+
+
+def atomic_save(model, path):
+    """
+    Сохраняем во временный файл и подменяем одним rename:
+    при падении на диске остается либо старая, либо новая модель
+    """
+    target = path if path.endswith(".zip") else path + ".zip"
+    tmp = target + ".tmp.zip"
+    model.save(tmp)
+    os.replace(tmp, target)
+
+
+class AtomicCheckpoint(BaseCallback):
+    """Периодическое атомарное сохранение модели во время обучения"""
+
+    def __init__(self, path, every_steps):
+        super().__init__()
+        self.path = path
+        self.every_steps = every_steps
+        self.last = 0
+
+    def _on_step(self):
+        if self.num_timesteps - self.last >= self.every_steps:
+            self.last = self.num_timesteps
+            atomic_save(self.model, self.path)
+            if self.verbose:
+                print(f"--- Чекпоинт: {self.num_timesteps} шагов ---")
+        return True
@@ -0,0 +1,585 @@
+import io
+import json
+import os
+import numpy as np
+import gymnasium as gym
+from stable_baselines3.common.vec_env.base_vec_env import VecEnvWrapper
+
+# Флаги в колонке done
+TERMINATED, TRUNCATED = 1, 2
+INDEX_FILE = "index.json"
+
+
+def obs_columns(obs):
+    """Колонки обычной записи: наблюдение как есть, действие, награда, флаги"""
+    obs = np.asarray(obs)
+    return {"obs": (obs.dtype, obs.shape), "action": (np.int64, ()), "reward": (np.float32, ()),
+            "done": (np.int8, ())}
+
+
+def state_columns(tables):
+    """
+    Колонки табличной записи: индекс состояния, действие и флаги, наблюдение
+    и награда восстанавливаются при чтении (см. add_state_tables). Состояние
+    и действие — самыми узкими типами: каждый байт строки — это новые
+    страницы файла, а их первое касание дороже самой записи
+    """
+    return {"state": (np.min_scalar_type(tables.num_states - 1), ()),
+            "action": (np.min_scalar_type(tables.num_actions - 1), ()),
+            "done": (np.int8, ())}
+
+
+def add_state_tables(writer, tables, names=("obs", "reward")):
+    """obs — tables.obs[state], reward — tables.reward[state, action]"""
+    if "obs" in names:
+        writer.add_table("obs", ("state",), tables.obs)
+    if "reward" in names:
+        writer.add_table("reward", ("state", "action"), tables.reward.astype(np.float32))
+
+
+def shrink_npy(path, steps):
+    """
+    Обрезаем .npy до первых steps строк на месте: переписываем форму в заголовке
+    и длину файла. False — заголовок не влез в прежнее место, нужна копия
+    """
+    with open(path, "r+b") as f:
+        if np.lib.format.read_magic(f) != (1, 0):
+            return False
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                      "fortran_order": fortran_order,
+                                                      "shape": (steps,) + shape[1:]})
+        if header.tell() != offset:
+            return False
+        f.seek(0)
+        f.write(header.getvalue())
+        f.truncate(offset + steps * dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64)))
+    return True
+
+
+class ShardWriter:
+    """
+    Запись шардами по chunk_size строк. Колонка шарда — .npy формы
+    (шаги, num_envs, ...), открытый через open_memmap: рекордеры пишут шаги
+    прямо в файл, и шард закрывается без копирования — переименованием и
+    обновлением index.json. Последний неполный шард обрезается на месте.
+
+    В строке лежит наблюдение (или индекс состояния), из которого сделано
+    действие, само действие, награда и флаги конца эпизода после него.
+    Читатель видит запись плоско: строка = шаг * num_envs + номер кухни,
+    эпизоды разделяются флагами done.
+    """
+
+    def __init__(self, path, chunk_size=1 << 20, num_envs=1, meta=None):
+        self.path = path
+        self.num_envs = num_envs
+        # Шард — целое число шагов пакета
+        self.chunk_steps = max(chunk_size // num_envs, 1)
+        self.count = 0  # шагов в текущем шарде
+        self.columns = None
+        self.buffers = None
+        os.makedirs(path, exist_ok=True)
+        self.index = {"version": 2, "num_envs": num_envs, "columns": {}, "decode": {}, "shards": [], "steps": 0,
+                      "episodes": 0, "meta": meta or {}}
+
+    def allocate(self, columns):
+        """columns — {имя: (dtype, форма на одну кухню)}, см. obs_columns и state_columns"""
+        self.columns = {name: (np.dtype(dtype), tuple(shape)) for name, (dtype, shape) in columns.items()}
+        self.index["columns"] = {name: {"dtype": dtype.str, "shape": list(shape)}
+                                 for name, (dtype, shape) in self.columns.items()}
+        self._open()
+
+    def add_table(self, name, columns, table):
+        """
+        Колонка name не пишется, а восстанавливается при чтении как table[columns...].
+        Повторный вызов — новая версия таблицы, она действует со следующей строки
+        """
+        entry = self.index["decode"].setdefault(name, {"columns": list(columns), "tables": []})
+        versions = entry["tables"]
+        start = self.index["steps"] + self.count * self.num_envs
+        if versions and versions[-1]["start"] == start:
+            # Прошлая версия не успела описать ни одной строки
+            versions.pop()
+        file = f"{name}.{len(versions)}.table.npy"
+        np.save(os.path.join(self.path, file), table)
+        versions.append({"start": start, "table": file})
+
+    def _target(self, name):
+        return os.path.join(self.path, f"{len(self.index['shards']):05d}.{name}.npy")
+
+    def _open(self):
+        shape = (self.chunk_steps, self.num_envs)
+        # Обычный ndarray поверх отображения: срезы и ufunc без обвязки подкласса memmap
+        self.buffers = {name: np.asarray(np.lib.format.open_memmap(self._target(name) + ".tmp", mode="w+",
+                                                                   dtype=dtype, shape=shape + cshape))
+                        for name, (dtype, cshape) in self.columns.items()}
+        self.count = 0
+
+    def flush(self, episodes, last=False):
+        """Закрываем текущий шард; last — больше шардов не будет"""
+        if self.buffers is None:
+            return
+        count = self.count
+        # Отображения закрываем до переименования и обрезки файлов.
+        # Без msync: читатель видит страницы из кеша ОС, а ждать диска на шаге записи нельзя
+        self.buffers = None
+        for name in self.columns:
+            tmp = self._target(name) + ".tmp"
+            if not count:
+                os.remove(tmp)
+                continue
+            # Неполный шард бывает только последним: файл должен быть ровно по числу шагов
+            if count < self.chunk_steps and not shrink_npy(tmp, count):
+                np.save(tmp + ".npy", np.load(tmp, mmap_mode="r")[:count])
+                os.replace(tmp + ".npy", tmp)
+            os.replace(tmp, self._target(name))
+        if count:
+            rows = count * self.num_envs
+            self.index["shards"].append({"name": f"{len(self.index['shards']):05d}", "start": self.index["steps"],
+                                         "steps": rows})
+            self.index["steps"] += rows
+        self.index["episodes"] = episodes
+        self._write_index()
+        if not last:
+            self._open()
+
+    def close(self, episodes):
+        if self.buffers is not None:
+            self.flush(episodes, last=True)
+        else:
+            # Пустая запись тоже должна открываться: индекс без шардов
+            self.index["episodes"] = episodes
+            self._write_index()
+
+    def _write_index(self):
+        tmp = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, INDEX_FILE))
+
+
+def env_meta(env, meta):
+    """Что нужно реплею: тип записи, карта и заказ (если среда на настоящей карте с одним заказом)"""
+    meta = dict(meta or {})
+    meta.setdefault("kind", "graph")
+    if getattr(env, "map_name", None):
+        meta.setdefault("map", env.map_name)
+    if isinstance(getattr(env, "order", None), str):
+        meta.setdefault("order", env.order)
+    return meta
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Запись эпизодов любой кухонной среды в шарды (см. ShardWriter).
+
+    Табличные среды (1.py, logic.py, GridKitchenEnv, TileKitchenEnv) делают шаг
+    за единицы микросекунд, поэтому обертка на их шаге не участвует вовсе:
+    среда сама добавляет в env.trace индекс состояния и действие.
+    На reset, если набралось block шагов, они переводятся в массивы, а флаги
+    берутся из таблиц сразу для всего блока: конец — tables.terminated и лимит
+    max_steps, как в самой среде. Наблюдения и награды при чтении
+    восстанавливаются через tables.obs и tables.reward. Если таблицы меняются
+    на ходу (LiveLayout), накопленный блок пишется до изменения, а дальше
+    награды читаются по новой таблице. Без reset шаги копятся в памяти — как
+    и положено gym, эпизоды нужно сбрасывать.
+
+    Остальные среды пишутся как есть: наблюдения хранятся ссылками до
+    копирования блока, поэтому среда должна возвращать новый массив на каждом шаге.
+    """
+
+    def __init__(self, env, path, chunk_size=1 << 20, meta=None, block=1024):
+        super().__init__(env)
+        core = env.unwrapped
+        self.writer = ShardWriter(path, chunk_size, meta=env_meta(core, meta))
+        self.block = max(block, 1)
+        self.core = core
+        self.tables = getattr(core, "tables", None) if hasattr(core, "trace") else None
+        self.max_steps = getattr(core, "max_steps", None)
+        self.episodes = 0
+        self.last_obs = None
+        self.pending = []  # табличная запись: state, action подряд; иначе (obs, action, reward, terminated, truncated)
+        self.ends = []  # номера шагов pending, после которых эпизод брошен сбросом
+        self.starts = []  # номера шагов pending, с которых начался новый эпизод
+        self.episode_steps = 0  # шагов текущего эпизода до pending
+        self.reward_stale = False  # таблицы поменялись, а снимок награды еще старый
+        if self.tables is not None:
+            self.tables.listeners.append(self._tables_changing)
+            core.trace = self.pending
+            # Шаг записывает сама среда: без лишнего вызова Python на каждом шаге
+            self.step = self.env.step
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        w = self.writer
+        if w.columns is None:
+            if self.tables is not None:
+                w.allocate(state_columns(self.tables))
+                add_state_tables(w, self.tables)
+            else:
+                w.allocate(obs_columns(obs))
+        # Эпизод, брошенный без конца, все равно закрываем
+        steps = self._pending_steps()
+        if steps:
+            self.ends.append(steps - 1)
+            self.starts.append(steps)
+            if self.tables is not None and steps >= self.block:
+                self._spill()
+        else:
+            self.episode_steps = 0
+            if w.count and not w.buffers["done"][w.count - 1, 0]:
+                w.buffers["done"][w.count - 1, 0] = TRUNCATED
+                self.episodes += 1
+        self.last_obs = obs
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        pending = self.pending
+        pending.append((self.last_obs, action, reward, terminated, truncated))
+        self.last_obs = obs
+        if len(pending) >= self.block:
+            self._spill()
+        return obs, reward, terminated, truncated, info
+
+    def _pending_steps(self):
+        return len(self.pending) // 2 if self.tables is not None else len(self.pending)
+
+    def _tables_changing(self):
+        """update_moves сейчас перепишет таблицы: шаги по старым пишем до этого"""
+        self._spill()
+        self.reward_stale = True
+
+    def _spill(self):
+        """Переводит накопленные шаги в массивы и пишет их в шарды"""
+        n = self._pending_steps()
+        if not n:
+            return
+        if self.reward_stale:
+            add_state_tables(self.writer, self.tables, ("reward",))
+            self.reward_stale = False
+        columns = self._table_block(n) if self.tables is not None else self._obs_block(n)
+        flags = columns["done"]
+        flags[self.ends] = np.where(flags[self.ends] == 0, TRUNCATED, flags[self.ends])
+        self.pending.clear()
+        self.ends, self.starts = [], []
+
+        w, start = self.writer, 0
+        while start < n:
+            # Полный шард закрывается только перед следующей записью: до нее reset еще может пометить брошенный эпизод
+            if w.count == w.chunk_steps:
+                w.flush(self.episodes)
+            take = min(n - start, w.chunk_steps - w.count)
+            rows, part = slice(w.count, w.count + take), slice(start, start + take)
+            for name, column in columns.items():
+                w.buffers[name][rows, 0] = column[part]
+            self.episodes += int(np.count_nonzero(flags[part]))
+            w.count += take
+            start += take
+
+    def _table_block(self, n):
+        flat = None
+        if self.writer.columns["state"][0] == np.uint8 and self.writer.columns["action"][0] == np.uint8:
+            # Маленькие таблицы: bytearray разбирает список в разы быстрее np.fromiter
+            try:
+                flat = np.frombuffer(bytearray(self.pending), np.uint8)
+            except ValueError:
+                pass
+        if flat is None:
+            flat = np.fromiter(self.pending, np.int64, len(self.pending))
+        states, actions = flat[0::2], flat[1::2]
+        # Плоский индекс: take по нему в разы быстрее выборки по паре массивов
+        index = np.multiply(states, self.tables.num_actions, dtype=np.int64) + actions
+        flags = self.tables.terminated.take(index).astype(np.int8)
+        # Эпизоды блока: [begin, end), первый продолжает эпизод прошлого блока
+        begin = [0] + self.starts
+        if self.max_steps:
+            # Лимит шагов считаем, как среда: с шага max_steps от сброса эпизод обрезан.
+            # Как у обычной записи, на последнем шаге он может быть и закончен, и обрезан.
+            # Эпизодов в блоке десятки: обычные числа Python здесь дешевле цепочки вызовов numpy
+            cut, offset = [], self.episode_steps
+            for b, e in zip(begin, self.starts + [n]):
+                cut.extend(range(max(b + self.max_steps - 1 - offset, b), e))
+                offset = 0
+            if cut:
+                flags[cut] += TRUNCATED
+        self.episode_steps = n - begin[-1] + (self.episode_steps if len(begin) == 1 else 0)
+        return {"state": states, "action": actions, "done": flags}
+
+    def _obs_block(self, n):
+        obs, actions, rewards, terminated, truncated = zip(*self.pending)
+        shape = self.writer.columns["obs"][1]
+        if shape:
+            # Склейка заметно дешевле np.stack на множестве маленьких массивов
+            obs = np.concatenate(obs).reshape((n,) + shape)
+        flags = np.array(terminated, dtype=np.int8) + np.array(truncated, dtype=np.int8) * TRUNCATED
+        # Награды часто numpy-скаляры: через float64 они разбираются в разы быстрее
+        return {"obs": obs, "action": self._as_int(actions), "reward": np.array(rewards, dtype=np.float64),
+                "done": flags}
+
+    @staticmethod
+    def _as_int(values):
+        try:
+            return np.fromiter(values, np.int64, len(values))
+        except (TypeError, ValueError):
+            # Действия от модели приходят массивами формы (1,)
+            return np.array([int(np.asarray(v).item()) for v in values], dtype=np.int64)
+
+    def close(self):
+        self._spill()
+        if self.tables is not None:
+            self.core.trace = None
+            if self._tables_changing in self.tables.listeners:
+                self.tables.listeners.remove(self._tables_changing)
+        self.writer.close(self.episodes)
+        super().close()
+
+
+class StepTrace(io.BytesIO):
+    """
+    Шаги VecKitchenEnv байтами: на каждом шаге среда дописывает массивы
+    состояний, действий и done. Набрав limit байт, среда сама зовет spill
+    """
+
+    def __init__(self, limit, spill):
+        super().__init__()
+        self.limit = limit
+        self.spill = spill
+
+
+class VecTrajectoryRecorder(VecEnvWrapper):
+    """
+    Запись пакетной среды. VecKitchenEnv (таблицы и env.trace) записывает шаги
+    сама, без обертки: байты массивов состояний, действий и done копятся в
+    StepTrace, а раз в block шагов переносятся в шард одним копированием;
+    флаг TERMINATED берется из таблиц. Наблюдения и награды восстанавливаются
+    при чтении через таблицы, как у TrajectoryRecorder. Остальные пакетные
+    среды пишутся копированием срезов на каждом шаге.
+    """
+
+    def __init__(self, venv, path, chunk_size=1 << 20, meta=None, block=1024):
+        super().__init__(venv)
+        core = venv.unwrapped
+        template = getattr(core, "template", None)
+        self.writer = ShardWriter(path, chunk_size, venv.num_envs, env_meta(template, meta))
+        self.block = max(min(block, self.writer.chunk_steps), 1)
+        self.core = core
+        self.tables = getattr(core, "tables", None) if hasattr(core, "trace") else None
+        self.episodes = 0
+        self.last_obs = None
+        self.actions = None
+        self.pending = None
+        self.reward_stale = False
+        if self.tables is not None:
+            self.tables.listeners.append(self._tables_changing)
+            # Строка StepTrace — то, что среда пишет за шаг
+            n = venv.num_envs
+            self.layout = np.dtype([("state", core.states.dtype, (n,)), ("action", core.actions.dtype, (n,)),
+                                    ("done", np.bool_, (n,))])
+            self.pending = core.trace = StepTrace(self.block * self.layout.itemsize, self._spill)
+            # Шаг записывает сама среда: обертка на шаге не участвует
+            self.step = venv.step
+
+    def reset(self):
+        obs = self.venv.reset()
+        w = self.writer
+        if w.columns is None:
+            if self.tables is not None:
+                w.allocate(state_columns(self.tables))
+                add_state_tables(w, self.tables)
+            else:
+                w.allocate(obs_columns(obs[0]))
+        self.last_obs = obs
+        return obs
+
+    def step_async(self, actions):
+        self.actions = actions
+        self.venv.step_async(actions)
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        if self.tables is not None:
+            # Шаг уже в env.trace
+            return obs, rewards, dones, infos
+
+        w = self.writer
+        # Полный шард закрываем перед записью: в этот момент на его файлы нет ссылок
+        if w.count == w.chunk_steps:
+            w.flush(self.episodes)
+        i, b = w.count, w.buffers
+        b["obs"][i] = self.last_obs
+        b["action"][i] = np.reshape(self.actions, self.num_envs)
+        b["reward"][i] = rewards
+        b["done"][i] = dones
+        w.count = i + 1
+
+        # count_nonzero заметно дешевле any() на маленьких массивах
+        ended = np.count_nonzero(dones)
+        if ended:
+            self.episodes += int(ended)
+            for k in np.flatnonzero(dones):
+                if infos[k].get("TimeLimit.truncated"):
+                    b["done"][i, k] = TRUNCATED
+        self.last_obs = obs
+        return obs, rewards, dones, infos
+
+    def _tables_changing(self):
+        """update_moves сейчас перепишет таблицы: шаги по старым пишем до этого"""
+        self._spill()
+        self.reward_stale = True
+
+    def _spill(self):
+        pending = self.pending
+        n = pending.tell() // self.layout.itemsize
+        if not n:
+            return
+        w = self.writer
+        if w.count == w.chunk_steps:
+            w.flush(self.episodes)
+        if self.reward_stale:
+            add_state_tables(w, self.tables, ("reward",))
+            self.reward_stale = False
+        i, b = w.count, w.buffers
+        rows = slice(i, i + n)
+        steps = np.frombuffer(pending.getbuffer(), self.layout, n)
+        state, action, done = b["state"][rows], b["action"][rows], b["done"][rows]
+        np.copyto(state, steps["state"], casting="unsafe")
+        np.copyto(action, steps["action"], casting="unsafe")
+        np.copyto(done, steps["done"], casting="unsafe")
+        # Буфер StepTrace нельзя перезаписывать, пока на него смотрит массив
+        del steps
+        pending.seek(0)
+        # Среда сообщает только done: закончен эпизод или обрезан лимитом, видно по таблице.
+        # Строки шарда смежные, так что плоские виды — без копий; nonzero по bool в разы быстрее, чем по int8
+        done, state, action = done.reshape(-1), state.reshape(-1), action.reshape(-1)
+        ends = np.flatnonzero(done.view(np.bool_))
+        done[ends] = np.where(self.tables.terminated[state[ends], action[ends]], TERMINATED, TRUNCATED)
+        self.episodes += len(ends)
+        w.count = i + n
+        # Блок не должен перескакивать границу шарда
+        pending.limit = min(self.block, w.chunk_steps - w.count or w.chunk_steps) * self.layout.itemsize
+
+    def close(self):
+        if self.tables is not None:
+            self._spill()
+            self.core.trace = None
+            if self._tables_changing in self.tables.listeners:
+                self.tables.listeners.remove(self._tables_changing)
+        self.writer.close(self.episodes)
+        self.venv.close()
+
+
+class TrajectoryReader:
+    """
+    Чтение записи по шардам через mmap: в памяти только то, что реально читается.
+    Строки плоские (шаг * num_envs + кухня); колонки из decode (наблюдения
+    и награды табличных записей) восстанавливаются на лету через свои таблицы.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.shards = self.index["shards"]
+        self.decode = self.index.get("decode", {})
+        self.columns = list(self.index["columns"]) + list(self.decode)
+        self.num_envs = self.index["num_envs"]
+        self.meta = self.index.get("meta", {})
+        self.starts = np.array([s["start"] for s in self.shards], dtype=np.int64)
+        self._cache = {}
+        self._tables = {}
+
+    def _table(self, file):
+        if file not in self._tables:
+            self._tables[file] = np.load(os.path.join(self.path, file))
+        return self._tables[file]
+
+    def _decode(self, column, keys, start):
+        """Колонка из decode по колонкам-ключам keys строк с start: у каждой версии таблицы свои строки"""
+        versions = self.decode[column]["tables"]
+        first = self._table(versions[0]["table"])
+        if len(versions) == 1:
+            return first[tuple(keys)]
+        out = np.empty((len(keys[0]),) + first.shape[len(keys):], dtype=first.dtype)
+        stop = start + len(out)
+        for k, version in enumerate(versions):
+            end = versions[k + 1]["start"] if k + 1 < len(versions) else stop
+            lo, hi = max(version["start"], start) - start, min(end, stop) - start
+            if lo < hi:
+                out[lo:hi] = self._table(version["table"])[tuple(key[lo:hi] for key in keys)]
+        return out
+
+    def rows(self, column, start, stop):
+        """Строки колонки [start, stop) по всей записи, читаются только нужные шарды"""
+        if column in self.decode:
+            keys = [self.rows(c, start, stop) for c in self.decode[column]["columns"]]
+            return self._decode(column, keys, start)
+        parts = []
+        i = max(int(np.searchsorted(self.starts, start, side="right")) - 1, 0)
+        while start < stop and i < len(self.shards):
+            shard_start = self.starts[i]
+            end = min(stop, shard_start + self.shards[i]["steps"])
+            if end > start:
+                data = self._column(i, column)
+                parts.append(data[start - shard_start:end - shard_start])
+                start = end
+            i += 1
+        if not parts:
+            col = self.index["columns"][column]
+            return np.empty([0] + col["shape"], dtype=np.dtype(col["dtype"]))
+        return np.concatenate(parts) if len(parts) != 1 else parts[0]
+
+    def _load(self, i, column):
+        """Колонка шарда плоско: (шаги * num_envs, ...) — это вид, без копии"""
+        name = self.shards[i]["name"]
+        data = np.load(os.path.join(self.path, f"{name}.{column}.npy"), mmap_mode="r")
+        return data.reshape((-1,) + tuple(self.index["columns"][column]["shape"]))
+
+    def _column(self, i, column):
+        key = (i, column)
+        if key not in self._cache:
+            self._cache[key] = self._load(i, column)
+        return self._cache[key]
+
+    def __len__(self):
+        return self.index["steps"]
+
+    def load_shard(self, i, columns=None):
+        shard = {}
+        for c in columns or self.columns:
+            if c in self.decode:
+                keys = [self._load(i, key) for key in self.decode[c]["columns"]]
+                shard[c] = self._decode(c, keys, int(self.starts[i]))
+            else:
+                shard[c] = self._load(i, c)
+        return shard
+
+    def iter_shards(self, columns=None):
+        for i in range(len(self.shards)):
+            yield self.load_shard(i, columns)
+
+    def iter_episodes(self):
+        """
+        Эпизоды целиком: по шардам, внутри шарда — по кухням. Недописанные
+        эпизоды переходят в следующий шард, поэтому в памяти только они.
+        """
+        carry = [None] * self.num_envs
+        for shard in self.iter_shards():
+            for k in range(self.num_envs):
+                rows = {c: shard[c][k::self.num_envs] for c in self.columns}
+                ends = np.flatnonzero(rows["done"]) + 1
+                start = 0
+                for end in ends:
+                    part = {c: rows[c][start:end] for c in self.columns}
+                    if carry[k] is not None:
+                        part = {c: np.concatenate([carry[k][c], part[c]]) for c in self.columns}
+                        carry[k] = None
+                    yield part
+                    start = end
+                if start < len(rows["done"]):
+                    rest = {c: np.array(rows[c][start:]) for c in self.columns}
+                    if carry[k] is not None:
+                        rest = {c: np.concatenate([carry[k][c], rest[c]]) for c in self.columns}
+                    carry[k] = rest
@@ -0,0 +1,140 @@
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+from moduls.env_compiler import KitchenTables, encode_state
+
+
+def build_tables(env):
+    """
+    Берём скомпилированные таблицы среды, а если их нет —
+    прогоняем скалярную среду по всем состояниям и действиям,
+    поэтому пакетная среда повторяет скалярную один в один.
+    """
+    if getattr(env, "tables", None) is not None:
+        return env.tables
+
+    num_steps = env.max_recipe_steps + 1
+    num_states = env.num_nodes * num_steps * 2
+    num_actions = env.action_space.n
+
+    next_state = np.zeros((num_states, num_actions), dtype=np.int64)
+    reward = np.zeros((num_states, num_actions), dtype=np.float64)
+    terminated = np.zeros((num_states, num_actions), dtype=bool)
+
+    for node in range(env.num_nodes):
+        for recipe_step in range(num_steps):
+            for has_item in range(2):
+                s = encode_state(node, recipe_step, has_item, num_steps)
+                for a in range(num_actions):
+                    env.current_node = node
+                    env.recipe_step = recipe_step
+                    env.has_item = has_item
+                    env.current_step = 0
+                    obs, r, term, _, _ = env.step(a)
+                    next_state[s, a] = encode_state(*obs, num_steps)
+                    reward[s, a] = r
+                    terminated[s, a] = term
+
+    return KitchenTables(next_state, reward, terminated, env.num_nodes, num_steps)
+
+
+class VecKitchenEnv(VecEnv):
+    """
+    N кухонь в одном процессе: всё состояние хранится в массивах NumPy,
+    шаг — это одна выборка из таблицы переходов без цикла по средам
+    """
+    # Сюда VecTrajectoryRecorder пишет шаги байтами: состояния, действия и done (см. StepTrace)
+    trace = None
+
+    def __init__(self, env_fn, n_envs=8):
+        template = env_fn()
+        super().__init__(n_envs, template.observation_space, template.action_space)
+
+        self.template = template
+        self.num_steps = template.max_recipe_steps + 1
+        self.max_steps = template.max_steps
+        self.tables = build_tables(template)
+        self.next_state = self.tables.next_state
+        self.reward = self.tables.reward.astype(np.float32)
+        self.terminated = self.tables.terminated
+        self.obs_table = self.tables.obs
+
+        obs, _ = template.reset()
+        self.start_state = encode_state(*obs, self.num_steps)
+
+        self.states = np.full(n_envs, self.start_state, dtype=np.int64)
+        self.steps = np.zeros(n_envs, dtype=np.int64)
+        self.actions = np.zeros(n_envs, dtype=np.int64)
+
+    # --- Состояние в виде массивов ---
+    @property
+    def position(self):
+        return self.obs_table[self.states, 0]
+
+    @property
+    def recipe_step(self):
+        return self.obs_table[self.states, 1]
+
+    @property
+    def has_item(self):
+        return self.obs_table[self.states, 2]
+
+    def reset(self):
+        self.states[:] = self.start_state
+        self.steps[:] = 0
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self.obs_table[self.states].copy()
+
+    def step_async(self, actions):
+        # Смежный массив: его байты пишутся в trace как есть
+        self.actions = np.ascontiguousarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        s, a = self.states, self.actions
+        rewards = self.reward[s, a]
+        terminated = self.terminated[s, a]
+        self.states = self.next_state[s, a]
+        self.steps += 1
+
+        truncated = self.steps >= self.max_steps
+        dones = terminated | truncated
+        obs = self.obs_table[self.states]
+
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = obs[i].copy()
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+
+        trace = self.trace
+        if trace is not None:
+            # Копируем байты сразу, пока массивы еще в кеше
+            trace.write(s)
+            trace.write(a)
+            trace.write(dones)
+            if trace.tell() >= trace.limit:
+                trace.spill()
+
+        # Автосброс закончившихся кухонь
+        self.states[dones] = self.start_state
+        self.steps[dones] = 0
+        obs[dones] = self.obs_table[self.start_state]
+
+        return obs, rewards.copy(), dones, infos
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.template, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self.template, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        method = getattr(self.template, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def get_images(self):
+        return [None for _ in range(self.num_envs)]
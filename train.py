@@ -0,0 +1,47 @@
+import argparse
+import os
+from stable_baselines3 import PPO
+from moduls.training import make_vec_env, atomic_save, AtomicCheckpoint
+from moduls.grid_env import ENGINE
+
+# ===============================
+# ПАРАЛЛЕЛЬНОЕ ОБУЧЕНИЕ НА КАРТАХ ИГРЫ
+# ===============================
+MODEL_PATH = "grid_kitchen_model"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Обучение повара на нескольких ядрах")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов со средами")
+    parser.add_argument("--transport", choices=["shm", "pipe"], default="shm", help="общая память или pipe")
+    parser.add_argument("--maps", nargs="+", default=["map_1", "map_2", "map_3"])
+    parser.add_argument("--orders", nargs="+", default=["fried", "baked"], help="заказы (или all — все блюда)")
+    parser.add_argument("--mode", choices=["macro", "tile"], default="macro",
+                        help="macro — станция за один шаг, tile — ходьба по тайлам")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timesteps", type=int, default=200000)
+    parser.add_argument("--checkpoint-every", type=int, default=20000, help="шагов между чекпоинтами")
+    parser.add_argument("--model", default=MODEL_PATH)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    orders = list(ENGINE.orders) if args.orders == ["all"] else args.orders
+
+    env = make_vec_env(args.workers, args.seed, args.maps, orders, args.transport, mode=args.mode)
+
+    if os.path.exists(args.model + ".zip"):
+        print(f"--- Продолжаем обучение модели '{args.model}' ---")
+        model = PPO.load(args.model, env=env)
+    else:
+        print("--- Начинаем обучение с нуля ---")
+        model = PPO("MlpPolicy", env, verbose=1, learning_rate=1e-3, ent_coef=0.02, seed=args.seed)
+
+    print(f"Обучение: {args.workers} воркеров ({args.transport}), карты {args.maps}, заказов {len(orders)}, "
+          f"режим {args.mode}")
+    model.learn(total_timesteps=args.timesteps, callback=AtomicCheckpoint(args.model, args.checkpoint_every),
+                reset_num_timesteps=False)
+    atomic_save(model, args.model)
+    env.close()
+    print(f"--- Модель сохранена в '{args.model}.zip' ---")